@@ -0,0 +1,372 @@
+# core/instrumentation.py
+"""
+Query and latency instrumentation: per-request query counts, DB time and
+duplicate-query fingerprints, timings for signal receivers and model saves,
+and an in-process metrics registry served as JSON or Prometheus text.
+"""
+import functools
+import hmac
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.dispatch import receiver as django_receiver
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+# Fingerprints kept in the registry; the least repeated are dropped first.
+MAX_FINGERPRINTS = 200
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_DUPLICATE_THRESHOLD = 5
+
+IN_LIST_PATTERN = re.compile(r'\bIN \((?:%s, )*%s\)')
+VALUES_PATTERN = re.compile(r'(\((?:%s, )*%s\))(?:, \((?:%s, )*%s\))+')
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+_current = ContextVar('instrumentation_recorder', default=None)
+
+
+def enabled():
+    return getattr(settings, 'INSTRUMENTATION_ENABLED', False)
+
+
+def sampled():
+    return random.random() < getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    Reduce ``sql`` to its shape: literals become ?, IN lists and multi-row VALUES collapse.
+    """
+    sql = IN_LIST_PATTERN.sub('IN (...)', sql)
+    sql = VALUES_PATTERN.sub(r'\1, ...', sql)
+    return LITERAL_PATTERN.sub('?', sql)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and summaries (count, sum, max) keyed by name and labels.
+
+    Lives in process memory; every worker process reports its own numbers.
+    """
+
+    def __init__(self, max_fingerprints=MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._summaries = {}
+            self._fingerprints = {}
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    def record_duplicates(self, source, duplicates):
+        """
+        Remember repeated query shapes seen in one request or block.
+        """
+        with self._lock:
+            for shape, count, example in duplicates:
+                entry = self._fingerprints.get(shape)
+                if entry is None:
+                    if len(self._fingerprints) >= self.max_fingerprints:
+                        rarest = min(self._fingerprints, key=lambda key: self._fingerprints[key]['occurrences'])
+                        del self._fingerprints[rarest]
+                    entry = self._fingerprints[shape] = {
+                        'fingerprint': shape, 'example': example, 'occurrences': 0, 'worst': 0, 'sources': set(),
+                    }
+                entry['occurrences'] += 1
+                entry['worst'] = max(entry['worst'], count)
+                entry['sources'].add(source)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                'summaries': [
+                    {'name': name, 'labels': dict(labels), 'count': count, 'sum': total, 'max': peak}
+                    for (name, labels), (count, total, peak) in sorted(self._summaries.items())
+                ],
+                'duplicate_queries': sorted(
+                    (dict(entry, sources=sorted(entry['sources'])) for entry in self._fingerprints.values()),
+                    key=lambda entry: -entry['occurrences'],
+                ),
+            }
+
+    def prometheus(self):
+        """
+        Render the counters and summaries in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines, typed = [], set()
+        for counter in snapshot['counters']:
+            if counter['name'] not in typed:
+                lines.append(f"# TYPE {counter['name']} counter")
+                typed.add(counter['name'])
+            lines.append(f"{counter['name']}{prometheus_labels(counter['labels'])} {counter['value']}")
+        families = {}
+        for summary in snapshot['summaries']:
+            families.setdefault(summary['name'], []).append(summary)
+        for name, summaries in families.items():
+            lines.append(f"# TYPE {name} summary")
+            for summary in summaries:
+                labels = prometheus_labels(summary['labels'])
+                lines.append(f"{name}_count{labels} {summary['count']}")
+                lines.append(f"{name}_sum{labels} {summary['sum']}")
+            lines.append(f"# TYPE {name}_max gauge")
+            lines.extend(f"{name}_max{prometheus_labels(summary['labels'])} {summary['max']}" for summary in summaries)
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+registry = MetricsRegistry()
+
+
+class QueryRecorder:
+    """
+    execute_wrapper that counts queries, sums their time and groups them by fingerprint.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.examples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.count += 1
+            shape = fingerprint(sql)
+            self.shapes[shape] += 1
+            self.examples.setdefault(shape, sql)
+
+    def duplicates(self, threshold=None):
+        """
+        Return ``(fingerprint, count, example)`` for shapes run at least ``threshold`` times.
+
+        The same statement repeated with different parameters is the usual
+        sign of an N+1 loop.
+        """
+        if threshold is None:
+            threshold = getattr(settings, 'INSTRUMENTATION_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD)
+        return [
+            (shape, count, self.examples[shape])
+            for shape, count in self.shapes.most_common() if count >= threshold
+        ]
+
+
+def _start_recording(recorder):
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+@contextmanager
+def record_queries(label=None):
+    """
+    Record every query run inside the block on this thread's connections.
+
+    Receivers and saves inside the block also report their own query
+    counts. With ``label``, the totals and duplicates go to the registry.
+    """
+    recorder = QueryRecorder()
+    token = _current.set(recorder)
+    try:
+        with _start_recording(recorder):
+            yield recorder
+    finally:
+        _current.reset(token)
+        if label:
+            report(recorder, 'block', block=label)
+
+
+def report(recorder, metric, **labels):
+    """
+    Add a recorder's totals to the registry as ``<metric>_queries`` and ``<metric>_db_seconds``.
+    """
+    registry.observe(f'{metric}_queries', recorder.count, **labels)
+    registry.observe(f'{metric}_db_seconds', recorder.db_time, **labels)
+    duplicates = recorder.duplicates()
+    if duplicates:
+        registry.increment('duplicate_query_shapes_total', len(duplicates), **labels)
+        registry.record_duplicates(next(iter(labels.values())), duplicates)
+
+
+def timed(metric, label_name, label):
+    """
+    Wrap a callable so each call records its duration and, when a recorder is active, its queries.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            recorder = _current.get()
+            queries = recorder.count if recorder else 0
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(f'{metric}_seconds', time.perf_counter() - start, **{label_name: label})
+                if recorder:
+                    registry.observe(f'{metric}_queries', recorder.count - queries, **{label_name: label})
+        wrapper.__wrapped_by_instrumentation__ = True
+        return wrapper
+    return decorator
+
+
+def receiver(signal, **kwargs):
+    """
+    Drop-in for django.dispatch.receiver that times every call of the receiver.
+
+    The decorated function itself is returned unchanged; stacked decorators
+    share one timed wrapper, which is kept alive on the function.
+    """
+    def decorator(func):
+        wrapper = getattr(func, '_timed_receiver', None)
+        if wrapper is None:
+            wrapper = func._timed_receiver = timed('signal_receiver', 'receiver', f'{func.__module__}.{func.__qualname__}')(func)
+        django_receiver(signal, **kwargs)(wrapper)
+        return func
+    return decorator
+
+
+def instrument_model_saves(app_labels):
+    """
+    Time ``save()`` of every concrete model in ``app_labels``, including nested saves and receivers.
+    """
+    for app_label in app_labels:
+        for model in apps.get_app_config(app_label).get_models():
+            if getattr(model.save, '__wrapped_by_instrumentation__', False):
+                continue
+            model.save = timed('model_save', 'model', model._meta.label)(model.save)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match._func_path) if match else 'unresolved'
+
+
+def server_timing(response, recorder):
+    response['Server-Timing'] = f'db;dur={recorder.db_time * 1000:.1f};desc="{recorder.count} queries"'
+
+
+class InstrumentationMiddleware:
+    """
+    Time every request; record queries, DB time and duplicates for a sample of them.
+
+    Sampled responses carry a Server-Timing header with the query count.
+    Async requests record their queries on the thread the ORM runs them on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        start = time.perf_counter()
+        if sampled():
+            with record_queries() as recorder:
+                response = self.get_response(request)
+            self.finish(request, response, start, recorder)
+        else:
+            response = self.get_response(request)
+            self.finish(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        start = time.perf_counter()
+        if not sampled():
+            response = await self.get_response(request)
+            self.finish(request, response, start)
+            return response
+        recorder = QueryRecorder()
+        token = _current.set(recorder)
+        # Thread-sensitive sync_to_async calls of one request share a thread, so the wrapper sees them.
+        stack = await sync_to_async(_start_recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        self.finish(request, response, start, recorder)
+        return response
+
+    def finish(self, request, response, start, recorder=None):
+        view = view_label(request)
+        registry.observe('http_request_seconds', time.perf_counter() - start, view=view, method=request.method)
+        registry.increment('http_responses_total', view=view, status=response.status_code)
+        if recorder is not None:
+            report(recorder, 'http_request', view=view)
+            server_timing(response, recorder)
+
+
+@never_cache
+@require_GET
+def metrics_view(request):
+    """
+    The registry as JSON, or Prometheus text with ``?format=prometheus``.
+
+    Staff only; scrapers can send ``Authorization: Bearer <INSTRUMENTATION_METRICS_TOKEN>`` instead.
+    """
+    token = getattr(settings, 'INSTRUMENTATION_METRICS_TOKEN', None)
+    offered = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    user = getattr(request, 'user', None)
+    if not (user and user.is_active and user.is_staff) and not (token and hmac.compare_digest(offered, token)):
+        return HttpResponse(status=403)
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(registry.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    return JsonResponse(registry.snapshot())
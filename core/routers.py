@@ -0,0 +1,155 @@
+# core/routers.py
+"""
+Primary/replica routing. Reads of the catalog models in REPLICA_MODELS go
+to the replica; every write, every read inside a transaction and every read
+after a write in the same request (or shortly after, via a cookie) go to
+the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_REPLICA = 'replica'
+DEFAULT_PIN_SECONDS = 5
+PIN_COOKIE = 'db_primary'
+
+
+class RoutingState:
+    """
+    Whether reads in the current request, task or thread must see the primary.
+    """
+    __slots__ = ('sticky', 'wrote', 'forced')
+
+    def __init__(self, sticky=False):
+        # Set from the pin cookie: a recent request of this client wrote.
+        self.sticky = sticky
+        self.wrote = False
+        self.forced = 0
+
+    @property
+    def pinned(self):
+        return self.sticky or self.wrote or self.forced > 0
+
+
+_state = ContextVar('db_routing', default=None)
+
+
+def routing_state():
+    """
+    Return the routing state of the current context, creating it outside requests.
+
+    Outside the middleware (commands, job workers) the state lives as long
+    as the thread, so once it has written it keeps reading the primary.
+    """
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def replica_alias():
+    """
+    Return the replica's alias, or None when no replica is configured.
+    """
+    alias = getattr(settings, 'REPLICA_DATABASE', DEFAULT_REPLICA)
+    return alias if alias in settings.DATABASES else None
+
+
+def replicated(model):
+    return model._meta.label in getattr(settings, 'REPLICA_MODELS', ())
+
+
+@contextmanager
+def use_primary():
+    """
+    Send every read in the block to the primary.
+    """
+    state = routing_state()
+    state.forced += 1
+    try:
+        yield
+    finally:
+        state.forced -= 1
+
+
+class PrimaryReplicaRouter:
+    """
+    Route catalog reads to the replica and everything else to the primary.
+
+    Without a replica in DATABASES it routes everything to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = replica_alias()
+        if replica is None or not replicated(model):
+            return DEFAULT_DB_ALIAS
+        # Inside a transaction the replica could contradict rows just locked or written.
+        if routing_state().pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if replicated(model) and replica_alias() is not None:
+            routing_state().wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary; it gets its schema from there.
+        if db == replica_alias():
+            return False
+        return None
+
+
+class PinPrimaryMiddleware:
+    """
+    Give each request its own routing state.
+
+    A request that writes catalog rows sets a short-lived cookie, so the
+    client's next requests (the redirect after a POST, say) read the primary
+    until the replica has caught up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(sticky=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(sticky=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def finish(self, state, response):
+        if state.wrote and replica_alias() is not None:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS),
+                httponly=True, samesite='Lax',
+            )
+        return response
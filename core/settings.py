@@ -21,6 +21,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 import os
 
+from core.db import sqlite_database
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY =  'django-insecure-j7d(qrn-dij(e#6(afzv&qr$c-*8%6go=1)s1eif+oj5ugk@*+'
 
@@ -41,10 +43,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'inventory'
+    'inventory',
+    'orders',
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
+    'core.routers.PinPrimaryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +83,61 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite runs in WAL mode with tuned pragmas and persistent connections
+# (core.db). Setting DATABASE_REPLICA_PATH adds a read replica: catalog reads
+# go there and everything else stays on the primary (core.routers). Locally a
+# second SQLite file works as the replica; `manage.py sync_replica` copies the
+# primary into it.
+
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', '60'))
+
 DATABASES = {
+    'default': sqlite_database(
+        os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'), conn_max_age=DATABASE_CONN_MAX_AGE,
+    ),
+}
+
+if os.environ.get('DATABASE_REPLICA_PATH'):
+    DATABASES['replica'] = sqlite_database(
+        os.environ['DATABASE_REPLICA_PATH'], conn_max_age=DATABASE_CONN_MAX_AGE,
+        # Tests read and write one database; the replica points at it.
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+REPLICA_DATABASE = 'replica'
+# Read-mostly catalog models whose reads the replica can serve.
+REPLICA_MODELS = [
+    'inventory.Category',
+    'inventory.CategoryNode',
+    'inventory.Subcategory',
+    'inventory.Product',
+    'inventory.ProductVariant',
+    'inventory.ProductImage',
+    'inventory.ProductShipping',
+    'inventory.ProductReview',
+    'inventory.ProductReviewStats',
+    'inventory.EffectivePrice',
+]
+# Seconds a client reads the primary after a request of theirs wrote catalog rows.
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at e.g.
+# django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379 in production.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'ecommerce'),
     }
 }
 
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -122,6 +175,34 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Resized WebP renditions of uploaded images, built by the job workers.
+IMAGE_RENDITIONS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
+
+# Minutes a pending order holds its stock before release_expired_orders returns it.
+ORDER_RESERVATION_MINUTES = 15
+
+# Callable that deliver_stock_alerts hands each batch of low-stock alerts to.
+STOCK_ALERT_HANDLER = 'inventory.alerts.log_alerts'
+
+# Side effects are queued as jobs for `manage.py run_workers`. True runs every
+# job type in-process after commit instead; a list runs just those names.
+JOBS_RUN_INLINE = False
+
+# Query and timing instrumentation (core.instrumentation). Every request,
+# receiver and model save is timed; query counts, DB time and duplicate-query
+# fingerprints are recorded for the sampled share of requests. Metrics are
+# served to staff at /admin/metrics/, or to a scraper sending METRICS_TOKEN.
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', '0.1'))
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 5
+INSTRUMENTATION_METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,123 @@
+# core/tests.py
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db import SQLITE_PRAGMAS, sqlite_init_command
+from core.instrumentation import MetricsRegistry, fingerprint, record_queries, registry
+from core.routers import PIN_COOKIE, PinPrimaryMiddleware, PrimaryReplicaRouter, RoutingState, _state, use_primary
+from inventory.models import Product
+from orders.models import Order
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(fingerprint('INSERT INTO t VALUES (%s, %s), (%s, %s)'), 'INSERT INTO t VALUES (%s, %s), ...')
+
+    @override_settings(INSTRUMENTATION_DUPLICATE_THRESHOLD=3)
+    def test_repeated_queries_are_reported_as_duplicates(self):
+        with record_queries('loop') as recorder, connection.cursor() as cursor:
+            for value in range(4):
+                cursor.execute('SELECT %s', [value])
+        self.assertEqual(recorder.count, 4)
+        [(_, count, example)] = recorder.duplicates()
+        self.assertEqual(count, 4)
+        self.assertIn('SELECT', example)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['duplicate_queries'][0]['sources'], ['loop'])
+        self.assertIn(
+            {'name': 'block_queries', 'labels': {'block': 'loop'}, 'count': 1, 'sum': 4, 'max': 4},
+            snapshot['summaries'],
+        )
+
+    def test_prometheus_output(self):
+        metrics = MetricsRegistry()
+        metrics.increment('hits_total', view='home')
+        metrics.observe('latency_seconds', 0.5, view='home')
+        metrics.observe('latency_seconds', 1.5, view='home')
+        text = metrics.prometheus()
+        self.assertIn('# TYPE hits_total counter\nhits_total{view="home"} 1\n', text)
+        self.assertIn('latency_seconds_count{view="home"} 2\nlatency_seconds_sum{view="home"} 2.0\n', text)
+        self.assertIn('latency_seconds_max{view="home"} 1.5\n', text)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_sampled_requests_carry_server_timing(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('queries', response['Server-Timing'])
+        self.assertIn(
+            {'name': 'http_responses_total', 'labels': {'view': 'metrics', 'status': 403}, 'value': 1},
+            registry.snapshot()['counters'],
+        )
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN='secret')
+    def test_metrics_need_staff_or_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(url, {'format': 'prometheus'}, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.client.force_login(get_user_model().objects.create_user('staff', password='x', is_staff=True))
+        self.assertIn('counters', self.client.get(url).json())
+
+
+# TestCase wraps each test in a transaction, which already pins reads to the primary.
+@mock.patch('core.routers.replica_alias', return_value='replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        token = _state.set(RoutingState())
+        self.addCleanup(_state.reset, token)
+        self.router = PrimaryReplicaRouter()
+
+    def test_catalog_reads_go_to_the_replica(self, replica_alias):
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+        self.assertEqual(self.router.db_for_read(Order), 'default')
+
+    def test_reads_after_a_write_stay_on_the_primary(self, replica_alias):
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_forced_reads_and_transactions_use_the_primary(self, replica_alias):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_writing_requests_pin_the_client(self, replica_alias):
+        def view(request):
+            PrimaryReplicaRouter().db_for_write(Product)
+            return HttpResponse()
+        response = PinPrimaryMiddleware(view)(RequestFactory().post('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        reads = []
+        def reading_view(request):
+            reads.append(PrimaryReplicaRouter().db_for_read(Product))
+            return HttpResponse()
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertNotIn(PIN_COOKIE, PinPrimaryMiddleware(reading_view)(request).cookies)
+        PinPrimaryMiddleware(reading_view)(RequestFactory().get('/'))
+        self.assertEqual(reads, ['default', 'replica'])
+
+
+class SQLiteSettingsTests(TestCase):
+    def test_connections_apply_the_pragmas(self):
+        self.assertEqual(
+            sqlite_init_command({'journal_mode': 'WAL', 'busy_timeout': 10}),
+            'PRAGMA journal_mode = WAL; PRAGMA busy_timeout = 10',
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], SQLITE_PRAGMAS['busy_timeout'])
@@ -15,8 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from core.instrumentation import metrics_view
 
 urlpatterns = [
+    # Ahead of the admin, whose catch-all would otherwise swallow it.
+    path('admin/metrics/', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
+    path('api/catalog/', include('inventory.urls')),
 ]
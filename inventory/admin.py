@@ -1,17 +1,167 @@
 from django.contrib import admin
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import (
-    Category, Subcategory, Product, ProductVariant, ProductReview,
+    Category, CategoryNode, Subcategory, Product, ProductVariant, ProductReview,
     ProductShipping, ProductImage, ReviewImage, Discount, DiscountHistory,
-    PriceHistory, InventoryTransaction, Coupon, CouponUsage
+    PriceHistory, InventoryTransaction, Coupon, CouponUsage, DailyStockMovement, DailyPriceChange, HistoryArchive, VariantSnapshot,
+    ReorderPoint, StockAlert, Job
 )
+from .search import matching_products
+
+# Relations each model's __str__ follows; changelists join them in.
+STR_RELATED = {
+    Subcategory: ('category',),
+    ProductVariant: ('product',),
+    ProductReview: ('product', 'user'),
+    ProductShipping: ('product',),
+    ProductImage: ('product',),
+    ReviewImage: ('review__product', 'review__user'),
+    Discount: ('product_variant',),
+    DiscountHistory: ('discount__product_variant',),
+    PriceHistory: ('product_variant',),
+    InventoryTransaction: ('product_variant',),
+    CouponUsage: ('coupon', 'user'),
+    DailyStockMovement: ('product_variant',),
+    DailyPriceChange: ('product_variant',),
+    VariantSnapshot: ('product_variant',),
+    StockAlert: ('product_variant',),
+}
+
+# Unfiltered changelists above this size show an estimated row count.
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def estimate_row_count(model, using):
+    """
+    Return the planner's row estimate for the model's table, or None if unavailable.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # sqlite_stat1 exists once ANALYZE has run; its first number is the row count.
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL", [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+            cursor.execute(f"SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) FROM {connection.ops.quote_name(table)}")
+            row = cursor.fetchone()
+            return row[0] if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the table estimate instead of COUNT(*) for large unfiltered lists.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class RelatedSearchFilter(admin.SimpleListFilter):
+    """
+    Text box filter on a related field, instead of listing every related row as a choice.
+    """
+    template = 'admin/inventory/related_search_filter.html'
+    field_path = None
+    search_field = 'name'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(**{f'{self.field_path}__pk': value})
+        return queryset.filter(**{f'{self.field_path}__{self.search_field}__icontains': value})
+
+    def choices(self, changelist):
+        yield {
+            'value': self.value() or '',
+            'parameter_name': self.parameter_name,
+            'hidden_params': [(name, value) for name, value in changelist.params.items() if name != self.parameter_name],
+            'reset_query_string': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+def related_search_filter(field_path, search_field='name', title=None):
+    """
+    Build a RelatedSearchFilter for ``field_path``, matching by pk or ``search_field``.
+    """
+    return type(f'{field_path.title().replace("_", "")}SearchFilter', (RelatedSearchFilter,), {
+        'title': title or field_path.replace('__', ' ').replace('_', ' '),
+        'parameter_name': f'{field_path}_search',
+        'field_path': field_path,
+        'search_field': search_field,
+    })
+
+
+class PerformanceModelAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin that joins in every relation the changelist renders.
+
+    list_select_related is derived from foreign keys in list_display plus the
+    relations their __str__ follows (STR_RELATED), so changelists run a fixed
+    number of queries instead of one per row.
+    """
+
+    def get_list_select_related(self, request):
+        if self.list_select_related:
+            return self.list_select_related
+        paths = set()
+        for name in self.get_list_display(request):
+            if name == '__str__':
+                paths.update(STR_RELATED.get(self.model, ()))
+                continue
+            try:
+                field = self.model._meta.get_field(name)
+            except (FieldDoesNotExist, TypeError):
+                continue
+            if field.many_to_one or field.one_to_one:
+                paths.add(name)
+                paths.update(f'{name}__{path}' for path in STR_RELATED.get(field.related_model, ()))
+        return sorted(paths) or False
+
+
+class LargeTableAdmin(PerformanceModelAdmin):
+    """
+    Admin for append-heavy tables: estimated counts and no second full COUNT(*).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 class ProductVariantInline(admin.TabularInline):
     model = ProductVariant
     extra = 1
+    # Stock only moves through inventory transactions.
+    readonly_fields = ('stock_quantity',)
 
 class ProductReviewInline(admin.TabularInline):
     model = ProductReview
     extra = 1
+    autocomplete_fields = ('user',)
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
@@ -29,7 +179,7 @@ class InventoryTransactionInline(admin.TabularInline):
     model = InventoryTransaction
     extra = 1
 
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(PerformanceModelAdmin):
     list_display = ('name', 'slug', 'description', 'seo_meta_title', 'created_at')
     search_fields = ('name', 'slug', 'description')
     list_filter = ('created_at', 'updated_at')
@@ -41,10 +191,11 @@ class CategoryAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('created_at', 'updated_at')
 
-class SubcategoryAdmin(admin.ModelAdmin):
+class SubcategoryAdmin(PerformanceModelAdmin):
     list_display = ('name', 'category', 'slug', 'description', 'seo_meta_title', 'created_at')
     search_fields = ('name', 'slug', 'description')
-    list_filter = ('category', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('category'), 'created_at', 'updated_at')
+    autocomplete_fields = ('category',)
     prepopulated_fields = {'slug': ('name',)}
     fieldsets = (
         (None, {'fields': ('category', 'name', 'slug', 'description')}),
@@ -53,148 +204,263 @@ class SubcategoryAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('created_at', 'updated_at')
 
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug', 'sku', 'category', 'subcategory', 'stock_quantity', 'tax', 'created_at')
+class CategoryNodeAdmin(PerformanceModelAdmin):
+    list_display = ('name', 'slug', 'parent', 'depth', 'product_count', 'path')
+    search_fields = ('name', 'slug', 'description')
+    list_filter = ('depth', 'created_at', 'updated_at')
+    autocomplete_fields = ('parent',)
+    prepopulated_fields = {'slug': ('name',)}
+    # Path order lists the tree depth first.
+    ordering = ('path',)
+    fieldsets = (
+        (None, {'fields': ('name', 'slug', 'parent', 'description')}),
+        ('Tree', {'fields': ('path', 'depth', 'product_count', 'category', 'subcategory')}),
+        ('Dates', {'fields': ('created_at', 'updated_at')}),
+    )
+    readonly_fields = ('path', 'depth', 'product_count', 'category', 'subcategory', 'created_at', 'updated_at')
+
+class ProductAdmin(PerformanceModelAdmin):
+    list_display = ('name', 'slug', 'sku', 'category', 'subcategory', 'stock_quantity', 'min_price', 'max_price', 'tax', 'created_at')
     search_fields = ('name', 'slug', 'sku', 'description')
-    list_filter = ('category', 'subcategory', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('category'), related_search_filter('subcategory'), 'created_at', 'updated_at')
+    autocomplete_fields = ('category', 'subcategory', 'node')
     prepopulated_fields = {'slug': ('name',)}
     inlines = [ProductVariantInline, ProductReviewInline, ProductImageInline]
     fieldsets = (
-        (None, {'fields': ('name', 'slug', 'sku', 'description', 'category', 'subcategory', 'stock_quantity', 'tax')}),
+        (None, {'fields': ('name', 'slug', 'sku', 'description', 'category', 'subcategory', 'node', 'tax')}),
+        ('Variant rollups', {'fields': ('stock_quantity', 'min_price', 'max_price')}),
         ('SEO', {'fields': ('seo_meta_title', 'seo_meta_description', 'seo_meta_keywords', 'additional_seo')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('stock_quantity', 'min_price', 'max_price', 'created_at', 'updated_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Search the full-text index; search_fields (icontains) are used where there is none or it is still empty.
+        matches = matching_products(search_term)
+        if matches is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=matches), False
 
 
-class ProductVariantAdmin(admin.ModelAdmin):
+class ProductVariantAdmin(PerformanceModelAdmin):
     list_display = ('product', 'name', 'sku', 'price', 'stock_quantity', 'created_at')
     search_fields = ('product__name', 'name', 'sku')
-    list_filter = ('product', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('product'), 'created_at', 'updated_at')
+    autocomplete_fields = ('product',)
     fieldsets = (
         (None, {'fields': ('product', 'name', 'sku', 'price', 'stock_quantity')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
-    readonly_fields = ('created_at', 'updated_at')
+    # Stock only moves through inventory transactions.
+    readonly_fields = ('stock_quantity', 'created_at', 'updated_at')
 
-class ProductReviewAdmin(admin.ModelAdmin):
+class ProductReviewAdmin(PerformanceModelAdmin):
     list_display = ('product', 'user', 'rating', 'is_verified', 'created_at')
     search_fields = ('product__name', 'user__username', 'rating')
-    list_filter = ('product', 'rating', 'is_verified', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('product'), 'rating', 'is_verified', 'created_at', 'updated_at')
+    autocomplete_fields = ('product', 'user')
     fieldsets = (
         (None, {'fields': ('product', 'user', 'rating', 'is_verified', 'comment')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
     readonly_fields = ('created_at', 'updated_at')
 
-class ProductShippingAdmin(admin.ModelAdmin):
+class ProductShippingAdmin(PerformanceModelAdmin):
     list_display = ('product', 'shipping_method', 'local_shipping_cost', 'regional_shipping_cost', 'national_shipping_cost', 'created_at')
     search_fields = ('product__name', 'shipping_method')
-    list_filter = ('product', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('product'), 'created_at', 'updated_at')
+    autocomplete_fields = ('product',)
     fieldsets = (
         (None, {'fields': ('product', 'shipping_method', 'local_shipping_cost', 'regional_shipping_cost', 'national_shipping_cost', 'shipping_cost_multiply_quantity', 'estimated_delivery_time', 'additional_shipping_info')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
     readonly_fields = ('created_at', 'updated_at')
 
-class ProductImageAdmin(admin.ModelAdmin):
+class ProductImageAdmin(PerformanceModelAdmin):
     list_display = ('product', 'is_main', 'created_at')
     search_fields = ('product__name', 'is_main')
-    list_filter = ('product', 'is_main', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('product'), 'is_main', 'created_at', 'updated_at')
+    autocomplete_fields = ('product',)
     fieldsets = (
         (None, {'fields': ('product', 'image', 'is_main')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
     readonly_fields = ('created_at', 'updated_at')
 
-class ReviewImageAdmin(admin.ModelAdmin):
+class ReviewImageAdmin(PerformanceModelAdmin):
     list_display = ('review', 'uploaded_at')
     search_fields = ('review__product__name', 'review__user__username')
-    list_filter = ('review', 'uploaded_at')
+    list_filter = (related_search_filter('review__product', title='product'), 'uploaded_at')
+    autocomplete_fields = ('review',)
     fieldsets = (
         (None, {'fields': ('review', 'image')}),
         ('Dates', {'fields': ('uploaded_at',)}),
     )
     readonly_fields = ('uploaded_at',)
 
-class DiscountAdmin(admin.ModelAdmin):
+class DiscountAdmin(PerformanceModelAdmin):
     list_display = ('product_variant', 'discount_type', 'discount_value', 'start_date', 'end_date', 'created_at')
     search_fields = ('product_variant__name', 'discount_type', 'discount_value')
-    list_filter = ('product_variant', 'discount_type', 'start_date', 'end_date', 'created_at', 'updated_at')
+    list_filter = (related_search_filter('product_variant', title='product variant'), 'discount_type', 'start_date', 'end_date', 'created_at', 'updated_at')
+    autocomplete_fields = ('product_variant',)
     fieldsets = (
         (None, {'fields': ('product_variant', 'discount_type', 'discount_value', 'start_date', 'end_date')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
     readonly_fields = ('created_at', 'updated_at')
 
-class DiscountHistoryAdmin(admin.ModelAdmin):
-    list_display = ('discount', 'old_discount_type', 'old_discount_value', 'new_discount_type', 'new_discount_value', 'created_at', 'updated_at')
-    search_fields = ('discount__code', 'old_discount_type', 'new_discount_type')
-    list_filter = ('created_at', 'updated_at')
-    readonly_fields = ('applied_at', 'created_at', 'updated_at')
+class DiscountHistoryAdmin(LargeTableAdmin):
+    list_display = ('discount', 'old_discount_type', 'old_discount_value', 'new_discount_type', 'new_discount_value', 'applied_at')
+    search_fields = ('discount__product_variant__name', 'old_discount_type', 'new_discount_type')
+    list_filter = ('applied_at',)
+    autocomplete_fields = ('discount',)
+    readonly_fields = ('applied_at',)
     fieldsets = (
         (None, {
             'fields': ('discount', 'old_discount_type', 'old_discount_value', 'new_discount_type', 'new_discount_value')
         }),
         ('Dates', {
-            'fields': ('applied_at', 'created_at', 'updated_at'),
+            'fields': ('applied_at',),
             'classes': ('collapse',),
         }),
     )
 
-class PriceHistoryAdmin(admin.ModelAdmin):
-    list_display = ('product_variant', 'old_price', 'new_price', 'changed_at', 'created_at', 'updated_at')
+class PriceHistoryAdmin(LargeTableAdmin):
+    list_display = ('product_variant', 'old_price', 'new_price', 'changed_at')
     search_fields = ('product_variant__product__name', 'old_price', 'new_price')
-    list_filter = ('changed_at', 'created_at', 'updated_at')
-    readonly_fields = ('changed_at', 'created_at', 'updated_at')
+    list_filter = ('changed_at',)
+    autocomplete_fields = ('product_variant',)
+    readonly_fields = ('changed_at',)
     fieldsets = (
         (None, {
             'fields': ('product_variant', 'old_price', 'new_price')
         }),
         ('Dates', {
-            'fields': ('changed_at', 'created_at', 'updated_at'),
+            'fields': ('changed_at',),
             'classes': ('collapse',),
         }),
     )
 
-class InventoryTransactionAdmin(admin.ModelAdmin):
-    list_display = ('product_variant', 'transaction_type', 'quantity', 'description', 'created_at', 'updated_at')
+class InventoryTransactionAdmin(LargeTableAdmin):
+    list_display = ('product_variant', 'transaction_type', 'quantity', 'description', 'transaction_date')
     search_fields = ('product_variant__product__name', 'transaction_type', 'description')
-    list_filter = ('transaction_type', 'created_at', 'updated_at')
-    readonly_fields = ('transaction_date', 'created_at', 'updated_at')
+    list_filter = ('transaction_type', 'transaction_date')
+    autocomplete_fields = ('product_variant',)
+    readonly_fields = ('transaction_date',)
     fieldsets = (
         (None, {
             'fields': ('product_variant', 'transaction_type', 'quantity', 'description')
         }),
         ('Dates', {
-            'fields': ('transaction_date', 'created_at', 'updated_at'),
+            'fields': ('transaction_date',),
             'classes': ('collapse',),
         }),
     )
 
-class CouponAdmin(admin.ModelAdmin):
-    list_display = ('code', 'discount_type', 'discount_value', 'valid_from', 'valid_to', 'active', 'created_at')
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            # A recorded row has already moved stock; corrections are recorded as new rows.
+            return ('product_variant', 'transaction_type', 'quantity') + self.readonly_fields
+        return self.readonly_fields
+
+    def has_delete_permission(self, request, obj=None):
+        # Deleting a row would leave stock moved by a transaction the ledger no longer shows.
+        return False
+
+class CouponAdmin(PerformanceModelAdmin):
+    list_display = ('code', 'discount_type', 'discount_value', 'valid_from', 'valid_to', 'active', 'times_used', 'created_at')
     search_fields = ('code', 'discount_type', 'discount_value')
     list_filter = ('discount_type', 'valid_from', 'valid_to', 'active', 'created_at', 'updated_at')
+    autocomplete_fields = ('products',)
     fieldsets = (
         (None, {'fields': ('code', 'discount_type', 'discount_value', 'valid_from', 'valid_to', 'active')}),
         ('Products', {'fields': ('products',)}),
+        ('Limits', {'fields': ('max_uses', 'max_uses_per_user', 'times_used')}),
         ('Dates', {'fields': ('created_at', 'updated_at')}),
     )
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('times_used', 'created_at', 'updated_at')
 
-class CouponUsageAdmin(admin.ModelAdmin):
+class CouponUsageAdmin(LargeTableAdmin):
     list_display = ('coupon', 'user', 'product', 'used_at')
     search_fields = ('coupon__code', 'user__username', 'product__name')
-    list_filter = ('coupon', 'user', 'product', 'used_at')
+    list_filter = (
+        related_search_filter('coupon', search_field='code'),
+        related_search_filter('user', search_field='username'),
+        related_search_filter('product'),
+        'used_at',
+    )
+    autocomplete_fields = ('coupon', 'user', 'product')
     fieldsets = (
         (None, {'fields': ('coupon', 'user', 'product')}),
         ('Dates', {'fields': ('used_at',)}),
     )
     readonly_fields = ('used_at',)
 
+class DailyStockMovementAdmin(LargeTableAdmin):
+    list_display = ('product_variant', 'day', 'quantity_in', 'quantity_out', 'transaction_count')
+    search_fields = ('product_variant__name', 'product_variant__sku')
+    list_filter = (related_search_filter('product_variant', title='product variant'), 'day')
+    date_hierarchy = 'day'
+    readonly_fields = ('product_variant', 'day', 'quantity_in', 'quantity_out', 'transaction_count')
+
+class DailyPriceChangeAdmin(LargeTableAdmin):
+    list_display = ('product_variant', 'day', 'change_count', 'opening_price', 'closing_price', 'low_price', 'high_price')
+    search_fields = ('product_variant__name', 'product_variant__sku')
+    list_filter = (related_search_filter('product_variant', title='product variant'), 'day')
+    date_hierarchy = 'day'
+    readonly_fields = ('product_variant', 'day', 'change_count', 'opening_price', 'closing_price', 'low_price', 'high_price')
+
+class VariantSnapshotAdmin(LargeTableAdmin):
+    list_display = ('product_variant', 'taken_at', 'stock_quantity', 'price')
+    search_fields = ('product_variant__name', 'product_variant__sku')
+    list_filter = (related_search_filter('product_variant', title='product variant'), 'taken_at')
+    date_hierarchy = 'taken_at'
+    readonly_fields = ('product_variant', 'taken_at', 'stock_quantity', 'price')
+
+class HistoryArchiveAdmin(LargeTableAdmin):
+    list_display = ('table', 'day', 'row_count', 'first_id', 'last_id', 'created_at')
+    list_filter = ('table', 'day')
+    date_hierarchy = 'day'
+    # The compressed payload is left out; use inventory.archive.archived_rows() to read it.
+    fields = ('table', 'day', 'row_count', 'first_id', 'last_id', 'created_at')
+    readonly_fields = fields
+
+class ReorderPointAdmin(PerformanceModelAdmin):
+    list_display = ('product_variant', 'category', 'threshold', 'active', 'updated_at')
+    search_fields = ('product_variant__name', 'product_variant__sku', 'category__name')
+    list_filter = ('active', related_search_filter('category'))
+    autocomplete_fields = ('product_variant', 'category')
+    fieldsets = (
+        (None, {'fields': ('product_variant', 'category', 'threshold', 'active')}),
+        ('Dates', {'fields': ('created_at', 'updated_at')}),
+    )
+    readonly_fields = ('created_at', 'updated_at')
+
+class StockAlertAdmin(LargeTableAdmin):
+    list_display = ('product_variant', 'stock_quantity', 'threshold', 'created_at', 'delivered_at', 'resolved_at', 'attempts')
+    search_fields = ('product_variant__name', 'product_variant__sku')
+    list_filter = (related_search_filter('product_variant', title='product variant'), 'created_at', 'delivered_at', 'resolved_at')
+    readonly_fields = ('product_variant', 'threshold', 'stock_quantity', 'created_at', 'delivered_at', 'resolved_at', 'attempts', 'last_error')
+
+class JobAdmin(LargeTableAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'idempotency_key', 'created_at')
+    search_fields = ('name', 'idempotency_key')
+    list_filter = ('status', 'name')
+    readonly_fields = ('name', 'payload', 'idempotency_key', 'attempts', 'claimed_by', 'locked_until', 'last_error', 'created_at')
+    fields = ('name', 'status', 'run_after') + readonly_fields[1:]
+    actions = ('retry_jobs',)
+
+    @admin.action(description="Retry selected failed jobs")
+    def retry_jobs(self, request, queryset):
+        pending_keys = Job.objects.filter(status=Job.STATUS_PENDING, idempotency_key__isnull=False).values('idempotency_key')
+        retried = queryset.filter(status=Job.STATUS_FAILED).exclude(idempotency_key__in=pending_keys).update(
+            status=Job.STATUS_PENDING, attempts=0, run_after=timezone.now(), last_error=None,
+        )
+        self.message_user(request, f"Queued {retried} jobs for another attempt.")
+
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Subcategory, SubcategoryAdmin)
+admin.site.register(CategoryNode, CategoryNodeAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(ProductVariant, ProductVariantAdmin)
 admin.site.register(ProductReview, ProductReviewAdmin)
@@ -207,3 +473,10 @@ admin.site.register(PriceHistory, PriceHistoryAdmin)
 admin.site.register(InventoryTransaction, InventoryTransactionAdmin)
 admin.site.register(Coupon, CouponAdmin)
 admin.site.register(CouponUsage, CouponUsageAdmin)
+admin.site.register(DailyStockMovement, DailyStockMovementAdmin)
+admin.site.register(DailyPriceChange, DailyPriceChangeAdmin)
+admin.site.register(VariantSnapshot, VariantSnapshotAdmin)
+admin.site.register(HistoryArchive, HistoryArchiveAdmin)
+admin.site.register(ReorderPoint, ReorderPointAdmin)
+admin.site.register(StockAlert, StockAlertAdmin)
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,126 @@
+# inventory/alerts.py
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import enqueue_ids, job, payload_ids
+from .models import ProductVariant, ReorderPoint, StockAlert
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_BATCH_SIZE = 100
+MAX_DELIVERY_ATTEMPTS = 5
+
+
+def schedule_alert_check(deltas):
+    """
+    Queue a reorder point check for the variants in ``deltas``.
+
+    The write path only adds outbox rows, keyed per variant: the check reads
+    the stock current when it runs, so a variant with a check pending needs
+    no second one, however many writes move it in the meantime.
+    """
+    enqueue_ids('stock.alerts', [variant_id for variant_id, delta in deltas.items() if delta])
+
+
+@job('stock.alerts', batch_size=200)
+def alerts_job(payloads):
+    evaluate_stock_alerts(payload_ids(payloads))
+
+
+def reorder_thresholds(variants):
+    """
+    Return {variant_id: threshold} for ``variants`` ({variant_id: category_id}).
+
+    A variant's own reorder point wins over its category's.
+    """
+    points = ReorderPoint.objects.filter(active=True).filter(
+        Q(product_variant_id__in=list(variants)) | Q(category_id__in=set(variants.values()))
+    ).values_list('product_variant_id', 'category_id', 'threshold')
+    own, by_category = {}, {}
+    for variant_id, category_id, threshold in points:
+        if variant_id:
+            own[variant_id] = threshold
+        else:
+            by_category[category_id] = threshold
+    thresholds = {}
+    for variant_id, category_id in variants.items():
+        threshold = own.get(variant_id, by_category.get(category_id))
+        if threshold is not None:
+            thresholds[variant_id] = threshold
+    return thresholds
+
+
+def evaluate_stock_alerts(variant_ids):
+    """
+    Open or resolve alerts for variants whose stock just moved.
+
+    Only the variants named by ledger deltas are looked at, never the whole
+    table. Their current stock decides: at or below the reorder point opens
+    an alert (de-duplicated by the one-open-alert-per-variant constraint),
+    above it resolves any open one.
+    """
+    variants = {
+        pk: (stock, category_id)
+        for pk, stock, category_id in ProductVariant.objects.filter(pk__in=list(variant_ids))
+        .values_list('pk', 'stock_quantity', 'product__category_id')
+    }
+    if not variants:
+        return
+    thresholds = reorder_thresholds({pk: category_id for pk, (_, category_id) in variants.items()})
+    opened, recovered = [], []
+    for variant_id, threshold in thresholds.items():
+        stock = variants[variant_id][0]
+        if stock <= threshold:
+            opened.append(StockAlert(product_variant_id=variant_id, threshold=threshold, stock_quantity=stock))
+        else:
+            recovered.append(variant_id)
+    if opened:
+        StockAlert.objects.bulk_create(opened, ignore_conflicts=True)
+    if recovered:
+        StockAlert.objects.filter(product_variant_id__in=recovered, resolved_at__isnull=True).update(resolved_at=timezone.now())
+
+
+def log_alerts(alerts):
+    """
+    Default STOCK_ALERT_HANDLER: write each alert to the log.
+    """
+    for alert in alerts:
+        logger.warning(
+            "Low stock: %s (%s) is at %s, reorder point %s",
+            alert.product_variant.name, alert.product_variant.sku, alert.stock_quantity, alert.threshold,
+        )
+
+
+def alert_handler():
+    return import_string(getattr(settings, 'STOCK_ALERT_HANDLER', 'inventory.alerts.log_alerts'))
+
+
+def deliver_stock_alerts(batch_size=DELIVERY_BATCH_SIZE, max_attempts=MAX_DELIVERY_ATTEMPTS):
+    """
+    Hand one batch of undelivered alerts to the configured handler; returns how many were delivered.
+
+    Rows are claimed with SKIP LOCKED where the database supports it, so
+    several consumers can run side by side. A failing batch is retried on
+    later runs until it has been attempted ``max_attempts`` times.
+    """
+    with transaction.atomic():
+        queryset = StockAlert.objects.filter(delivered_at__isnull=True, attempts__lt=max_attempts).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True, of=('self',))
+        alerts = list(queryset.select_related('product_variant')[:batch_size])
+        if not alerts:
+            return 0
+        claimed = StockAlert.objects.filter(pk__in=[alert.pk for alert in alerts])
+        try:
+            alert_handler()(alerts)
+        except Exception as exc:
+            logger.exception("Could not deliver %d stock alerts", len(alerts))
+            claimed.update(attempts=F('attempts') + 1, last_error=str(exc))
+            return 0
+        claimed.update(attempts=F('attempts') + 1, delivered_at=timezone.now(), last_error=None)
+    return len(alerts)
@@ -6,4 +6,11 @@ class InventoryConfig(AppConfig):
     name = 'inventory'
 
     def ready(self):
-        import inventory.signals
\ No newline at end of file
+        from django.db.models.signals import post_migrate
+
+        import inventory.signals
+        from core.instrumentation import instrument_model_saves
+        from inventory.search import create_search_index
+
+        post_migrate.connect(create_search_index, sender=self)
+        instrument_model_saves([self.label])
@@ -0,0 +1,219 @@
+# inventory/archive.py
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ArchiveWatermark, DailyPriceChange, DailyStockMovement, DiscountHistory, HistoryArchive, InventoryTransaction,
+    PriceHistory
+)
+from .repricing import chunked
+
+ARCHIVE_BATCH_SIZE = 5000
+ROLLUP_BATCH_SIZE = 1000
+
+HistoryTable = namedtuple('HistoryTable', ['model', 'timestamp', 'rollup'])
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_bounds(value):
+    """
+    Return the [start, end) datetimes of the local day containing ``value``.
+    """
+    start = start_of_day(timezone.localtime(value).date())
+    return start, start_of_day(start.date() + timedelta(days=1))
+
+
+def rollup_stock(start, end):
+    """
+    Recompute DailyStockMovement for the whole days in [start, end) from the ledger.
+    """
+    rows = (
+        InventoryTransaction.objects.filter(transaction_date__gte=start, transaction_date__lt=end)
+        .annotate(day=TruncDate('transaction_date'))
+        .values('product_variant_id', 'day')
+        .annotate(
+            quantity_in=Sum('quantity', filter=Q(transaction_type='IN'), default=0),
+            quantity_out=Sum('quantity', filter=Q(transaction_type='OUT'), default=0),
+            transaction_count=Count('id'),
+        )
+        .order_by()
+    )
+    written = 0
+    for batch in chunked(rows.iterator(), ROLLUP_BATCH_SIZE):
+        DailyStockMovement.objects.bulk_create(
+            [DailyStockMovement(**row) for row in batch],
+            update_conflicts=True,
+            unique_fields=['product_variant', 'day'],
+            update_fields=['quantity_in', 'quantity_out', 'transaction_count'],
+        )
+        written += len(batch)
+    return written
+
+
+def rollup_prices(start, end):
+    """
+    Recompute DailyPriceChange for the whole days in [start, end) from PriceHistory.
+
+    Opening and closing prices depend on row order, so the rows are streamed
+    in (variant, time) order and folded in memory.
+    """
+    rows = (
+        PriceHistory.objects.filter(changed_at__gte=start, changed_at__lt=end)
+        .order_by('product_variant_id', 'changed_at', 'pk')
+        .values_list('product_variant_id', 'changed_at', 'old_price', 'new_price')
+    )
+
+    def days():
+        current = None
+        for variant_id, changed_at, old_price, new_price in rows.iterator():
+            day = timezone.localtime(changed_at).date()
+            if current is None or (current.product_variant_id, current.day) != (variant_id, day):
+                if current is not None:
+                    yield current
+                current = DailyPriceChange(
+                    product_variant_id=variant_id, day=day, change_count=0, opening_price=old_price,
+                    low_price=min(old_price, new_price), high_price=max(old_price, new_price),
+                )
+            current.change_count += 1
+            current.closing_price = new_price
+            current.low_price = min(current.low_price, new_price)
+            current.high_price = max(current.high_price, new_price)
+        if current is not None:
+            yield current
+
+    written = 0
+    for batch in chunked(days(), ROLLUP_BATCH_SIZE):
+        DailyPriceChange.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['product_variant', 'day'],
+            update_fields=['change_count', 'opening_price', 'closing_price', 'low_price', 'high_price'],
+        )
+        written += len(batch)
+    return written
+
+
+HISTORY_TABLES = {
+    'inventorytransaction': HistoryTable(InventoryTransaction, 'transaction_date', rollup_stock),
+    'pricehistory': HistoryTable(PriceHistory, 'changed_at', rollup_prices),
+    'discounthistory': HistoryTable(DiscountHistory, 'applied_at', None),
+}
+
+
+def archived_before(table):
+    """
+    Return the archive watermark for ``table``, or None if nothing was archived yet.
+    """
+    return ArchiveWatermark.objects.filter(table=table).values_list('archived_before', flat=True).first()
+
+
+def rollup_history(start, end=None):
+    """
+    Recompute the daily rollups for the days from ``start`` up to ``end`` (default: now).
+
+    Both ends are widened to day boundaries. Archived days are final and are
+    never recomputed, so the range starts no earlier than each table's watermark.
+    """
+    start = day_bounds(start)[0]
+    end = day_bounds(end or timezone.now())[1]
+    written = {}
+    for table, history in HISTORY_TABLES.items():
+        if history.rollup is None:
+            continue
+        watermark = archived_before(table)
+        written[table] = history.rollup(max(start, watermark) if watermark else start, end)
+    return written
+
+
+def archive_rows(table, queryset, day, batch_size):
+    """
+    Move the rows of ``queryset`` into compressed HistoryArchive chunks and delete them.
+    """
+    model = HISTORY_TABLES[table].model
+    fields = [field.attname for field in model._meta.concrete_fields]
+    moved = 0
+    for batch in chunked(queryset.order_by('pk').values_list(*fields).iterator(), batch_size):
+        payload = json.dumps({'fields': fields, 'rows': batch}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        HistoryArchive.objects.create(
+            table=table,
+            day=day,
+            first_id=batch[0][0],
+            last_id=batch[-1][0],
+            row_count=len(batch),
+            payload=zlib.compress(payload.encode(), 6),
+        )
+        model.objects.filter(pk__in=[row[0] for row in batch]).delete()
+        moved += len(batch)
+    return moved
+
+
+def compact_table(table, cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Roll up and archive ``table`` one day at a time, oldest first, up to ``cutoff``.
+
+    Each day is handled in one transaction that recomputes its rollup from
+    the live rows, archives and deletes them, and advances the watermark, so
+    rollups always cover exactly the rows that are no longer in the table.
+    """
+    history = HISTORY_TABLES[table]
+    model, timestamp = history.model, history.timestamp
+    moved = 0
+    while True:
+        watermark = archived_before(table)
+        live = model.objects.all()
+        if watermark:
+            live = live.filter(**{f'{timestamp}__gte': watermark})
+        oldest = live.aggregate(oldest=Min(timestamp))['oldest']
+        if oldest is None or oldest >= cutoff:
+            break
+        start, end = day_bounds(oldest)
+        if end > cutoff:
+            break
+        with transaction.atomic():
+            if history.rollup:
+                history.rollup(start, end)
+            day_rows = model.objects.filter(**{f'{timestamp}__gte': start, f'{timestamp}__lt': end})
+            moved += archive_rows(table, day_rows, start.date(), batch_size)
+            ArchiveWatermark.objects.update_or_create(table=table, defaults={'archived_before': end})
+    return moved
+
+
+def compact_history(older_than_days, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+    """
+    Archive history rows from days that ended at least ``older_than_days`` days ago.
+
+    Returns {table: rows moved}.
+    """
+    cutoff = day_bounds(now or timezone.now())[0] - timedelta(days=older_than_days)
+    return {table: compact_table(table, cutoff, batch_size) for table in HISTORY_TABLES}
+
+
+def archived_rows(table, start=None, end=None, **filters):
+    """
+    Yield archived rows of ``table`` timestamped in [start, end) and matching ``filters`` on attnames.
+
+    For example ``archived_rows('pricehistory', product_variant_id=5)``.
+    """
+    timestamp = HISTORY_TABLES[table].timestamp
+    archives = HistoryArchive.objects.filter(table=table).order_by('day', 'first_id')
+    if start:
+        archives = archives.filter(day__gte=timezone.localtime(start).date())
+    if end:
+        archives = archives.filter(day__lte=timezone.localtime(end).date())
+    for archive in archives.iterator(chunk_size=10):
+        for row in archive.rows():
+            if start and row[timestamp] < start or end and row[timestamp] >= end:
+                continue
+            if all(row[name] == value for name, value in filters.items()):
+                yield row
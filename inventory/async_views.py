@@ -0,0 +1,105 @@
+# inventory/async_views.py
+"""
+Async versions of the catalog read endpoints, for ASGI deployments.
+
+They return the same payloads as the views in views.py. Independent
+lookups are awaited together with asyncio.gather, and cache reads never
+block the event loop, so a worker can hold many slow requests at once.
+"""
+import asyncio
+
+from django.http import Http404
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .catalog_cache import acatalog_version, alist, aget_catalog_tree, aget_product_by_slug
+from .models import Product
+from .pricing import acurrent_effective_prices
+from .reviews import areview_stats_for
+from .views import (
+    assemble_summaries, category_payload, combine_validators, conditional_json, detail_querysets, detail_response,
+    find_taxonomy_id, keyset_rows, listing_queryset, listing_response, main_images, make_etag, not_modified, split_page,
+    summary_querysets, validator_aggregates,
+)
+
+
+async def acatalog_validators(rows, *parts):
+    """
+    Async catalog_validators(): the aggregates run concurrently.
+    """
+    pairs = validator_aggregates([row['id'] for row in rows], timezone.now())
+    *aggregates, version = await asyncio.gather(
+        *[queryset.aaggregate(**expressions) for queryset, expressions in pairs], acatalog_version(),
+    )
+    return combine_validators(rows, aggregates, version, *parts)
+
+
+async def aproduct_summaries(rows):
+    """
+    Async product_summaries(): variants, images and review stats load concurrently.
+    """
+    product_ids = [row['id'] for row in rows]
+    variant_queryset, image_queryset = summary_querysets(product_ids)
+    variant_rows, image_rows, stats = await asyncio.gather(
+        alist(variant_queryset), alist(image_queryset), areview_stats_for(product_ids),
+    )
+    effective = await acurrent_effective_prices(variant['id'] for variant in variant_rows)
+    return assemble_summaries(rows, variant_rows, effective, main_images(image_rows), stats)
+
+
+async def product_list_response(request, queryset):
+    rows, limit = keyset_rows(listing_queryset(request, queryset), request)
+    rows, next_cursor = split_page(await alist(rows), limit)
+    validators = await acatalog_validators(rows, next_cursor)
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    return listing_response(request, await aproduct_summaries(rows), next_cursor, validators)
+
+
+async def taxonomy_id(slug, subcategory=False):
+    return find_taxonomy_id(await aget_catalog_tree(), slug, subcategory)
+
+
+@require_GET
+async def category_list(request):
+    """
+    Categories with their subcategories, served from the catalog cache.
+    """
+    etag = make_etag('categories', await acatalog_version())
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return conditional_json(request, category_payload(await aget_catalog_tree()), etag=etag)
+
+
+@require_GET
+async def category_products(request, slug):
+    return await product_list_response(request, Product.objects.filter(category_id=await taxonomy_id(slug)))
+
+
+@require_GET
+async def subcategory_products(request, slug):
+    return await product_list_response(
+        request, Product.objects.filter(subcategory_id=await taxonomy_id(slug, subcategory=True))
+    )
+
+
+@require_GET
+async def product_detail(request, slug):
+    """
+    A product with its variants, images, shipping options and review stats.
+    """
+    product = await aget_product_by_slug(slug)
+    if product is None:
+        raise Http404("No product matches the given query.")
+    validators = await acatalog_validators([product])
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    variant_queryset, image_queryset, shipping_queryset = detail_querysets(product['id'])
+    variants, image_rows, shipping, stats = await asyncio.gather(
+        alist(variant_queryset), alist(image_queryset), alist(shipping_queryset), areview_stats_for([product['id']]),
+    )
+    effective = await acurrent_effective_prices(variant['id'] for variant in variants)
+    return detail_response(request, product, variants, effective, image_rows, shipping, stats, validators)
@@ -0,0 +1,296 @@
+# inventory/benchmarks.py
+import math
+import platform
+import random
+import subprocess
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .ledger import apply_transaction
+from .models import Category, InventoryTransaction, Product, ProductVariant
+from .pricing import current_effective_prices
+from .seeding import DEFAULT_PREFIX, NOUNS
+
+# Variants sampled per run; operations pick from these so runs stay repeatable.
+SAMPLE_SIZE = 2000
+LISTING_PAGE_SIZE = 24
+# Metrics compared between runs, and whether a higher value is worse.
+COMPARED_METRICS = ('p50_ms', 'p99_ms', 'ops_per_sec', 'queries_mean')
+HIGHER_IS_WORSE = {'p50_ms': True, 'p99_ms': True, 'ops_per_sec': False, 'queries_mean': True}
+
+Benchmark = namedtuple('Benchmark', ['name', 'run', 'description'])
+Comparison = namedtuple('Comparison', ['benchmark', 'metric', 'before', 'after', 'change', 'regression'])
+
+_benchmarks = {}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def benchmark(name):
+    """
+    Register ``run(context)`` as one timed operation called ``name``.
+    """
+    def decorator(run):
+        _benchmarks[name] = Benchmark(name, run, (run.__doc__ or '').strip())
+        return run
+    return decorator
+
+
+def available_benchmarks():
+    return dict(_benchmarks)
+
+
+class BenchmarkContext:
+    """
+    Data and clients shared by the operations of one run.
+
+    Everything random comes from one seeded generator, so two runs against
+    the same catalog perform the same operations in the same order.
+    """
+
+    def __init__(self, seed=0, prefix=DEFAULT_PREFIX):
+        self.rng = random.Random(seed)
+        self.variant_ids = list(ProductVariant.objects.order_by('pk').values_list('pk', flat=True)[:SAMPLE_SIZE])
+        if not self.variant_ids:
+            raise BenchmarkError("The catalog has no variants; run seed_catalog first.")
+        self.product_slugs = list(
+            Product.objects.filter(variants__pk__in=self.variant_ids).order_by('pk').values_list('slug', flat=True).distinct()
+        )
+        self.category_slugs = list(Category.objects.filter(products__isnull=False).order_by('pk').values_list('slug', flat=True).distinct())
+        admin, _ = get_user_model().objects.get_or_create(
+            username=f'{prefix}-admin', defaults={'is_staff': True, 'is_superuser': True},
+        )
+        self.client = Client()
+        self.client.force_login(admin)
+        self.pending_out = None
+        self.orders = []
+
+    def cleanup(self):
+        """
+        Undo what the write benchmarks left behind.
+        """
+        if self.pending_out:
+            apply_transaction(self.pending_out, 'OUT', 1, "Benchmark")
+            self.pending_out = None
+        if self.orders:
+            from orders.models import Order
+
+            Order.objects.filter(pk__in=self.orders).delete()
+            self.orders = []
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        if response.status_code != 200:
+            raise BenchmarkError(f"GET {url} returned {response.status_code}")
+        return response
+
+
+@benchmark('stock_transaction')
+def bench_stock_transaction(context):
+    """
+    One ledger row through InventoryTransaction.save(); IN and OUT alternate so stock stays level.
+    """
+    if context.pending_out:
+        apply_transaction(context.pending_out, 'OUT', 1, "Benchmark")
+        context.pending_out = None
+    else:
+        context.pending_out = context.rng.choice(context.variant_ids)
+        apply_transaction(context.pending_out, 'IN', 1, "Benchmark")
+
+
+@benchmark('checkout')
+def bench_checkout(context):
+    """
+    Place a three-line order, then cancel it to release the stock.
+    """
+    from orders.services import cancel_order, place_order
+
+    order = place_order({variant_id: 1 for variant_id in context.rng.sample(context.variant_ids, 3)})
+    cancel_order(order)
+    context.orders.append(order.pk)
+
+
+@benchmark('variant_price_save')
+def bench_variant_price_save(context):
+    """
+    Load a variant and save it with its price moved by a cent, with every receiver attached.
+    """
+    variant = ProductVariant.objects.get(pk=context.rng.choice(context.variant_ids))
+    step = Decimal('0.01')
+    variant.price += step if variant.price <= step or context.rng.random() < 0.5 else -step
+    variant.save()
+
+
+@benchmark('admin_product_changelist')
+def bench_admin_product_changelist(context):
+    """
+    The product changelist in the admin, first page.
+    """
+    context.get(reverse('admin:inventory_product_changelist'))
+
+
+@benchmark('admin_variant_changelist')
+def bench_admin_variant_changelist(context):
+    """
+    The variant changelist in the admin, searched for a product word.
+    """
+    context.get(reverse('admin:inventory_productvariant_changelist'), q=context.rng.choice(NOUNS))
+
+
+@benchmark('effective_prices')
+def bench_effective_prices(context):
+    """
+    Effective prices for one listing page of variants.
+    """
+    current_effective_prices(context.rng.sample(context.variant_ids, min(LISTING_PAGE_SIZE, len(context.variant_ids))))
+
+
+@benchmark('category_listing')
+def bench_category_listing(context):
+    """
+    A category listing page from the catalog API.
+    """
+    context.get(reverse('catalog:category-products', args=[context.rng.choice(context.category_slugs)]))
+
+
+@benchmark('product_detail')
+def bench_product_detail(context):
+    """
+    A product detail page from the catalog API.
+    """
+    context.get(reverse('catalog:product-detail', args=[context.rng.choice(context.product_slugs)]))
+
+
+@benchmark('product_search')
+def bench_product_search(context):
+    """
+    A faceted full-text search for a product word.
+    """
+    context.get(reverse('catalog:product-search'), q=context.rng.choice(NOUNS))
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(timings, queries, elapsed):
+    ordered = sorted(timings)
+    return {
+        'iterations': len(timings),
+        'mean_ms': round(1000 * sum(timings) / len(timings), 3),
+        'p50_ms': round(1000 * percentile(ordered, 0.50), 3),
+        'p90_ms': round(1000 * percentile(ordered, 0.90), 3),
+        'p99_ms': round(1000 * percentile(ordered, 0.99), 3),
+        'max_ms': round(1000 * ordered[-1], 3),
+        'ops_per_sec': round(len(timings) / elapsed, 2) if elapsed else None,
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def measure(bench, context, iterations, warmup):
+    """
+    Run ``bench`` ``warmup`` times untimed, then ``iterations`` times timed.
+    """
+    for _ in range(warmup):
+        bench.run(context)
+    timings, queries = [], []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            bench.run(context)
+            timings.append(time.perf_counter() - begin)
+        queries.append(len(captured))
+    return summarize(timings, queries, time.perf_counter() - started)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, iterations=200, warmup=20, seed=0, prefix=DEFAULT_PREFIX):
+    """
+    Measure the named benchmarks (default: all) and return a JSON-ready result.
+
+    Operations that write leave the catalog as they found it (stock moves
+    are reversed and orders deleted; prices drift by cents), so runs can be
+    repeated against the same seed.
+    """
+    unknown = set(names or ()) - _benchmarks.keys()
+    if unknown:
+        raise BenchmarkError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+    # The test client sends requests as "testserver".
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        context = BenchmarkContext(seed=seed, prefix=prefix)
+        try:
+            results = {
+                name: measure(_benchmarks[name], context, iterations, warmup)
+                for name in (names or _benchmarks)
+            }
+        finally:
+            context.cleanup()
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'seed': seed,
+            'catalog': {
+                'products': Product.objects.count(),
+                'variants': ProductVariant.objects.count(),
+                'transactions': InventoryTransaction.objects.count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """
+    Compare two run_benchmarks results metric by metric.
+
+    A metric regresses when it moves the wrong way by more than
+    ``threshold`` (a fraction); query counts regress on any increase.
+    """
+    comparisons = []
+    for name, after in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = change if HIGHER_IS_WORSE[metric] else -change
+            limit = 0 if metric == 'queries_mean' else threshold
+            comparisons.append(Comparison(name, metric, old, new, round(change, 4), worse > limit))
+    return comparisons
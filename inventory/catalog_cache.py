@@ -0,0 +1,255 @@
+# inventory/catalog_cache.py
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.routers import use_primary
+
+from .models import Category, Product, Subcategory
+
+TREE_VERSION_KEY = 'catalog:tree-version'
+PRODUCT_VERSION_KEY = 'catalog:product-version'
+STALE_TREE_KEY = 'catalog:tree:last'
+MISSING = 'missing'
+
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 0.05
+LOCK_RETRIES = 40
+
+
+def catalog_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _version(key):
+    cache = catalog_cache()
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never revives old entries.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+async def _aversion(key):
+    cache = catalog_cache()
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, int(time.time() * 1000), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(key):
+    cache = catalog_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def _read_through(key, build, stale_key=None):
+    """
+    Return the cached value for ``key``, building it under a lock on a miss.
+
+    Only one process rebuilds at a time; the others serve the last good copy
+    from ``stale_key`` if there is one, or wait for the builder to finish.
+    """
+    cache = catalog_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            # An entry built from a lagging replica would outlive the lag by the cache timeout.
+            with use_primary():
+                value = build()
+            cache.set(key, value, cache_timeout())
+            if stale_key:
+                cache.set(stale_key, value, None)
+        finally:
+            cache.delete(lock_key)
+        return value
+    if stale_key:
+        value = cache.get(stale_key)
+        if value is not None:
+            return value
+    for _ in range(LOCK_RETRIES):
+        time.sleep(LOCK_WAIT)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
+
+
+async def _aread_through(key, abuild, stale_key=None):
+    """
+    Async _read_through(): same lock and stale-copy protocol, waiting without blocking the event loop.
+    """
+    cache = catalog_cache()
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            with use_primary():
+                value = await abuild()
+            await cache.aset(key, value, cache_timeout())
+            if stale_key:
+                await cache.aset(stale_key, value, None)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+    if stale_key:
+        value = await cache.aget(stale_key)
+        if value is not None:
+            return value
+    for _ in range(LOCK_RETRIES):
+        await asyncio.sleep(LOCK_WAIT)
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+    return await abuild()
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+def _tree_querysets():
+    return (
+        Category.objects.order_by('name').values('id', 'name', 'slug', 'description', 'thumbnail'),
+        Subcategory.objects.order_by('name').values('id', 'category_id', 'name', 'slug', 'description'),
+        Product.objects.order_by('name').values('id', 'category_id', 'subcategory_id', 'name', 'slug', 'sku'),
+    )
+
+
+def _assemble_tree(category_rows, subcategory_rows, product_rows):
+    categories = {row['id']: dict(row, subcategories=[], products=[]) for row in category_rows}
+    subcategories = {}
+    for row in subcategory_rows:
+        if row['category_id'] in categories:
+            subcategories[row['id']] = node = dict(row, products=[])
+            categories[row['category_id']]['subcategories'].append(node)
+    for row in product_rows:
+        if row['subcategory_id'] in subcategories:
+            subcategories[row['subcategory_id']]['products'].append(row)
+        elif row['category_id'] in categories:
+            categories[row['category_id']]['products'].append(row)
+    return list(categories.values())
+
+
+def build_tree():
+    """
+    Load the category -> subcategory -> product tree in three queries.
+    """
+    return _assemble_tree(*_tree_querysets())
+
+
+async def abuild_tree():
+    """
+    Async build_tree(); the three queries run concurrently.
+    """
+    return _assemble_tree(*await asyncio.gather(*(
+        alist(queryset) for queryset in _tree_querysets()
+    )))
+
+
+def get_catalog_tree():
+    """
+    Return the cached category tree; warm reads run no queries.
+    """
+    key = f'catalog:tree:{_version(TREE_VERSION_KEY)}'
+    return _read_through(key, build_tree, stale_key=STALE_TREE_KEY)
+
+
+async def aget_catalog_tree():
+    """
+    Async get_catalog_tree().
+    """
+    key = f'catalog:tree:{await _aversion(TREE_VERSION_KEY)}'
+    return await _aread_through(key, abuild_tree, stale_key=STALE_TREE_KEY)
+
+
+def _product_key(slug, version=None):
+    return f'catalog:product:{version or _version(PRODUCT_VERSION_KEY)}:{slug}'
+
+
+def _product_queryset(slug):
+    return Product.objects.filter(slug=slug).values(
+        'id', 'name', 'slug', 'sku', 'description', 'tax',
+        'seo_meta_title', 'seo_meta_description', 'seo_meta_keywords', 'additional_seo',
+        'category_id', 'category__name', 'category__slug',
+        'subcategory_id', 'subcategory__name', 'subcategory__slug',
+        'created_at', 'updated_at',
+    )
+
+
+def build_product(slug):
+    # Cache misses too, so unknown slugs do not hit the database on every request.
+    return _product_queryset(slug).first() or MISSING
+
+
+async def abuild_product(slug):
+    return await _product_queryset(slug).afirst() or MISSING
+
+
+def get_product_by_slug(slug):
+    """
+    Return the cached product dict for ``slug``, or None if there is no such product.
+    """
+    product = _read_through(_product_key(slug), lambda: build_product(slug))
+    return None if product == MISSING else product
+
+
+async def aget_product_by_slug(slug):
+    """
+    Async get_product_by_slug().
+    """
+    key = _product_key(slug, await _aversion(PRODUCT_VERSION_KEY))
+    product = await _aread_through(key, lambda: abuild_product(slug))
+    return None if product == MISSING else product
+
+
+def catalog_version():
+    """
+    The tree and product cache versions, for validators of responses built from cached rows.
+    """
+    return f'{_version(TREE_VERSION_KEY)}.{_version(PRODUCT_VERSION_KEY)}'
+
+
+async def acatalog_version():
+    """
+    Async catalog_version().
+    """
+    return f'{await _aversion(TREE_VERSION_KEY)}.{await _aversion(PRODUCT_VERSION_KEY)}'
+
+
+def invalidate_tree():
+    _bump(TREE_VERSION_KEY)
+
+
+def invalidate_products(slugs=None):
+    """
+    Drop cached product lookups for ``slugs``, or all of them when no slugs are given.
+    """
+    if slugs is None:
+        _bump(PRODUCT_VERSION_KEY)
+        return
+    catalog_cache().delete_many([_product_key(slug) for slug in slugs if slug])
+
+
+def invalidate_catalog():
+    """
+    Drop everything; for bulk loads that bypass model signals.
+    """
+    invalidate_tree()
+    invalidate_products()
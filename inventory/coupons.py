@@ -0,0 +1,174 @@
+# inventory/coupons.py
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Coupon, CouponUsage, CouponUserUsage
+from .pricing import apply_offer, coupon_applies, offer_window_open
+
+DESCRIPTOR_TIMEOUT = 60 * 15
+MISSING = 'missing'
+RECOUNT_BATCH_SIZE = 500
+
+CouponDescriptor = namedtuple('CouponDescriptor', [
+    'id', 'code', 'discount_type', 'discount_value', 'valid_from', 'valid_to', 'active',
+    'product_ids', 'max_uses', 'max_uses_per_user',
+])
+
+
+class CouponError(Exception):
+    pass
+
+
+def _descriptor_key(code):
+    return f'coupon:{code}'
+
+
+def load_descriptor(code):
+    coupon = Coupon.objects.filter(code=code).values(
+        'id', 'code', 'discount_type', 'discount_value', 'valid_from', 'valid_to', 'active',
+        'max_uses', 'max_uses_per_user',
+    ).first()
+    if coupon is None:
+        return None
+    product_ids = frozenset(
+        Coupon.products.through.objects.filter(coupon_id=coupon['id']).values_list('product_id', flat=True)
+    )
+    return CouponDescriptor(product_ids=product_ids, **coupon)
+
+
+def get_coupon_descriptor(code):
+    """
+    Return the cached CouponDescriptor for ``code``, or None if there is no such coupon.
+    """
+    descriptor = cache.get(_descriptor_key(code))
+    if descriptor is None:
+        descriptor = load_descriptor(code) or MISSING
+        cache.set(_descriptor_key(code), descriptor, DESCRIPTOR_TIMEOUT)
+    return None if descriptor == MISSING else descriptor
+
+
+def invalidate_coupons(codes):
+    cache.delete_many([_descriptor_key(code) for code in codes if code])
+
+
+def check_coupon(code, product_id=None, at=None):
+    """
+    Validate a coupon code without touching the database once its descriptor is cached.
+
+    The window and the products a coupon applies to follow the same rules
+    as effective prices (pricing.offer_window_open() and coupon_applies()):
+    the coupon ends at valid_to, and a coupon with no linked products only
+    passes without a product. Usage limits are enforced atomically by
+    redeem().
+    """
+    descriptor = get_coupon_descriptor(code)
+    at = at or timezone.now()
+    if descriptor is None:
+        raise CouponError("This coupon code is not valid.")
+    if not descriptor.active or not offer_window_open(descriptor.valid_from, descriptor.valid_to, at):
+        raise CouponError("This coupon is not active.")
+    if product_id is not None and not coupon_applies(descriptor.product_ids, product_id):
+        raise CouponError("This coupon does not apply to this product.")
+    return descriptor
+
+
+def coupon_price(descriptor, price):
+    return apply_offer(price, descriptor.discount_type, descriptor.discount_value)
+
+
+def redeem(code, user, product=None):
+    """
+    Check and record one use of a coupon; returns the CouponUsage.
+
+    The global and per-user counters are bumped with conditional UPDATEs,
+    so limits hold under concurrent checkouts, and the CouponUsage row is
+    written in the same transaction.
+    """
+    product_id = product.pk if product is not None else None
+    descriptor = check_coupon(code, product_id)
+    with transaction.atomic():
+        coupons = Coupon.objects.filter(pk=descriptor.id)
+        if descriptor.max_uses is not None:
+            coupons = coupons.filter(times_used__lt=descriptor.max_uses)
+        if not coupons.update(times_used=F('times_used') + 1):
+            raise CouponError("This coupon has been fully redeemed.")
+        if not increment_user_usage(descriptor, user.pk):
+            raise CouponError("You have already used this coupon.")
+        usage = CouponUsage(coupon_id=descriptor.id, user=user, product_id=product_id)
+        # Counters are already updated; tell the post_save receiver not to count it again.
+        usage.counted = True
+        usage.save()
+    return usage
+
+
+def increment_user_usage(descriptor, user_id):
+    usages = CouponUserUsage.objects.filter(coupon_id=descriptor.id, user_id=user_id)
+    if descriptor.max_uses_per_user is not None:
+        if descriptor.max_uses_per_user < 1:
+            return False
+        if usages.filter(times_used__lt=descriptor.max_uses_per_user).update(times_used=F('times_used') + 1):
+            return True
+        if usages.exists():
+            return False
+    elif usages.update(times_used=F('times_used') + 1):
+        return True
+    try:
+        with transaction.atomic():
+            CouponUserUsage.objects.create(coupon_id=descriptor.id, user_id=user_id, times_used=1)
+    except IntegrityError:
+        # A concurrent first use created the row; retry the guarded increment.
+        return increment_user_usage(descriptor, user_id)
+    return True
+
+
+def adjust_usage_counters(coupon_id, user_id, delta):
+    """
+    Move both counters by ``delta`` for usages written or deleted outside redeem(), e.g. in the admin.
+
+    Decrements stop at zero, so deleting a usage the counters never saw
+    cannot take them negative.
+    """
+    times_used = F('times_used') + delta if delta > 0 else Greatest(F('times_used') + delta, 0)
+    Coupon.objects.filter(pk=coupon_id).update(times_used=times_used)
+    if not CouponUserUsage.objects.filter(coupon_id=coupon_id, user_id=user_id).update(times_used=times_used) and delta > 0:
+        CouponUserUsage.objects.get_or_create(coupon_id=coupon_id, user_id=user_id, defaults={'times_used': delta})
+
+
+def recompute_usage_counters(coupon_ids=None, batch_size=RECOUNT_BATCH_SIZE):
+    """
+    Rebuild Coupon.times_used and the per-user counters from the CouponUsage rows.
+
+    For the backfill of usages recorded before the counters existed, and for
+    repairs. Coupons are locked in primary key batches, so a concurrent
+    redeem() waits for its coupon's counts instead of racing the rebuild.
+    Returns the number of coupons processed.
+    """
+    coupons = Coupon.objects.order_by('pk')
+    if coupon_ids is not None:
+        coupons = coupons.filter(pk__in=list(coupon_ids))
+    usage_count = (
+        CouponUsage.objects.filter(coupon=OuterRef('pk')).order_by().values('coupon')
+        .annotate(count=Count('pk')).values('count')
+    )
+    last_pk, processed = 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(coupons.select_for_update().filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return processed
+            Coupon.objects.filter(pk__in=batch).update(times_used=Coalesce(Subquery(usage_count), 0))
+            CouponUserUsage.objects.filter(coupon_id__in=batch).delete()
+            CouponUserUsage.objects.bulk_create([
+                CouponUserUsage(coupon_id=coupon_id, user_id=user_id, times_used=count)
+                for coupon_id, user_id, count in (
+                    CouponUsage.objects.filter(coupon_id__in=batch).order_by().values('coupon_id', 'user_id')
+                    .annotate(count=Count('pk')).values_list('coupon_id', 'user_id', 'count')
+                )
+            ])
+        last_pk = batch[-1]
+        processed += len(batch)
@@ -0,0 +1,113 @@
+# inventory/identifiers.py
+import threading
+from collections import deque
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.text import slugify
+
+from .models import SkuSequence
+
+SKU_BLOCK_SIZE = 100
+SLUG_QUERY_CHUNK = 500
+# Room left at the end of a slug for a "-NNNNNN" suffix.
+SLUG_SUFFIX_ROOM = 8
+
+
+def format_sku(value):
+    # Ten decimal digits never collide with the legacy 8-hex-digit "SKU-XXXXXXXX" codes.
+    return f"SKU-{value:010d}"
+
+
+def allocate_block(name, size):
+    """
+    Advance the named sequence by ``size`` and return the reserved ``range``.
+    """
+    with transaction.atomic():
+        if not SkuSequence.objects.filter(name=name).update(next_value=F('next_value') + size):
+            SkuSequence.objects.get_or_create(name=name)
+            SkuSequence.objects.filter(name=name).update(next_value=F('next_value') + size)
+        end = SkuSequence.objects.filter(name=name).values_list('next_value', flat=True).get()
+    return range(end - size, end)
+
+
+class SkuAllocator:
+    """
+    Hand out SKUs from blocks reserved in the database.
+
+    Outside a transaction a whole block is reserved and served from memory,
+    so most SKUs cost no query. Inside a transaction only the numbers asked
+    for are reserved: a rollback also undoes the reservation, so cached
+    numbers could otherwise be handed out twice.
+    """
+
+    def __init__(self, name='product', block_size=SKU_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pending = deque()
+
+    def reserve(self, count):
+        with self._lock:
+            values = [self._pending.popleft() for _ in range(min(count, len(self._pending)))]
+            missing = count - len(values)
+            if missing:
+                if transaction.get_connection().in_atomic_block:
+                    values.extend(allocate_block(self.name, missing))
+                else:
+                    block = allocate_block(self.name, max(missing, self.block_size))
+                    values.extend(block[:missing])
+                    self._pending.extend(block[missing:])
+        return [format_sku(value) for value in values]
+
+
+_allocator = SkuAllocator()
+
+
+def reserve_skus(count):
+    """
+    Return ``count`` new, never-used product SKUs.
+    """
+    return _allocator.reserve(count)
+
+
+def unique_slugs(names, model, field='slug'):
+    """
+    Return a free slug for each name, de-duplicated against ``model`` and each other.
+
+    Taken slugs are read with one query per chunk of distinct bases, and
+    numeric suffixes are resolved in memory, so a bulk insert never hits a
+    unique-constraint error on the slug. Slugs in the model's
+    ``reserved_slugs`` are never handed out.
+
+    The suffixed slugs of a base are the range [base + '-', base + '.'),
+    '.' being the character after '-', so every base costs an index range
+    scan rather than a LIKE the slug index cannot serve.
+    """
+    max_length = model._meta.get_field(field).max_length
+    fallback = model._meta.model_name
+    bases = []
+    for name in names:
+        base = slugify(name or '') or fallback
+        if len(base) > max_length:
+            base = base[:max_length - SLUG_SUFFIX_ROOM].rstrip('-')
+        bases.append(base)
+
+    distinct = sorted(set(bases))
+    taken = set(getattr(model, 'reserved_slugs', ()))
+    for start in range(0, len(distinct), SLUG_QUERY_CHUNK):
+        chunk = distinct[start:start + SLUG_QUERY_CHUNK]
+        condition = Q(**{f'{field}__in': chunk})
+        for base in chunk:
+            condition |= Q(**{f'{field}__gte': f'{base}-', f'{field}__lt': f'{base}.'})
+        taken.update(model._default_manager.filter(condition).values_list(field, flat=True))
+
+    slugs = []
+    for base in bases:
+        slug, suffix = base, 2
+        while slug in taken:
+            slug = f'{base[:max_length - len(str(suffix)) - 1]}-{suffix}'
+            suffix += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
@@ -0,0 +1,146 @@
+# inventory/images.py
+import hashlib
+import logging
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from .jobs import enqueue, job
+from .models import Category, ProductImage, ReviewImage
+
+logger = logging.getLogger(__name__)
+
+RENDITION_FORMAT = 'WEBP'
+RENDITION_QUALITY = 80
+HASH_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# Image fields that get renditions. Each model stores the content hash in a
+# "<field>_digest" column, which is what tells every process the renditions exist.
+RENDITION_SOURCES = ((Category, 'thumbnail'), (ProductImage, 'image'), (ReviewImage, 'image'))
+
+def renditions():
+    return getattr(settings, 'IMAGE_RENDITIONS', {'thumbnail': (200, 200)})
+
+
+def content_hash(storage, name):
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rendition_path(digest, rendition):
+    return f'renditions/{digest[:2]}/{digest}/{rendition}.webp'
+
+
+def _hash_key(name):
+    return f'image-hash:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def build_renditions(name, storage=default_storage):
+    """
+    Write every configured rendition of the stored image ``name``.
+
+    Renditions are keyed by the source's content hash, so identical uploads
+    share files and an image that was already processed is skipped. The
+    hash is then stored on every row using the image. Returns the hash.
+    """
+    digest = content_hash(storage, name)
+    with _digest_lock(digest):
+        _write_missing(storage, name, digest)
+    record_digest(name, digest)
+    return digest
+
+
+def record_digest(name, digest):
+    """
+    Store ``digest`` on the rows whose image is ``name``, and in the cache for readers without the row.
+    """
+    for model, field in RENDITION_SOURCES:
+        model.objects.filter(**{field: name}).exclude(**{f'{field}_digest': digest}).update(**{f'{field}_digest': digest})
+    cache.set(_hash_key(name), digest, HASH_CACHE_TIMEOUT)
+
+
+def _write_missing(storage, name, digest):
+    missing = {
+        rendition: size for rendition, size in renditions().items()
+        if not storage.exists(rendition_path(digest, rendition))
+    }
+    if missing:
+        with storage.open(name, 'rb') as source, Image.open(source) as img:
+            largest = max(max(size) for size in missing.values())
+            # Let JPEG decode at a reduced scale instead of full resolution.
+            img.draft('RGB', (largest, largest))
+            img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for rendition, size in missing.items():
+                copy = img.copy()
+                copy.thumbnail(size, Image.Resampling.LANCZOS)
+                buffer = BytesIO()
+                copy.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+                path = rendition_path(digest, rendition)
+                saved = storage.save(path, ContentFile(buffer.getvalue()))
+                if saved != path:
+                    # Another process wrote the same rendition first.
+                    storage.delete(saved)
+
+
+# Striped locks so two workers never render the same content at once.
+_digest_locks = [threading.Lock() for _ in range(64)]
+
+
+def _digest_lock(digest):
+    return _digest_locks[int(digest[:8], 16) % len(_digest_locks)]
+
+
+@job('images.renditions', batch_size=10, max_attempts=3)
+def renditions_job(payloads):
+    failed = []
+    for name in {payload['name'] for payload in payloads}:
+        try:
+            build_renditions(name)
+        except FileNotFoundError:
+            logger.warning("Image %s no longer exists; skipping its renditions", name)
+        except Exception:
+            logger.exception("Could not build renditions for %s", name)
+            failed.append(name)
+    if failed:
+        # Renditions that already exist are skipped, so retrying the batch is cheap.
+        raise RuntimeError(f"Could not build renditions for {', '.join(failed)}")
+
+
+def schedule_renditions(field_file):
+    """
+    Queue rendition building for ``field_file``; a worker picks it up after the transaction commits.
+    """
+    if not field_file:
+        return
+    enqueue('images.renditions', [{'name': field_file.name}], [f'images.renditions:{field_file.name}'])
+
+
+def rendition_url(field_file, rendition):
+    """
+    Return the URL of a rendition, or of the original until the rendition exists.
+    """
+    if not field_file:
+        return None
+    digest = getattr(field_file.instance, f'{field_file.field.name}_digest', None)
+    return stored_rendition_url(field_file.name, rendition, field_file.storage, digest=digest)
+
+
+def stored_rendition_url(name, rendition, storage=default_storage, digest=None):
+    """
+    Like rendition_url() for a bare storage name, as returned by values() queries.
+
+    Pass the row's ``<field>_digest`` as ``digest``; without it the cache is
+    tried, and the original is served if the renditions are not known to exist.
+    """
+    if not name:
+        return None
+    if digest is None:
+        digest = cache.get(_hash_key(name))
+    return storage.url(rendition_path(digest, rendition) if digest else name)
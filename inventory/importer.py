@@ -0,0 +1,329 @@
+# inventory/importer.py
+import csv
+import json
+import os
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import catalog_cache
+from .identifiers import reserve_skus, unique_slugs
+from .images import schedule_renditions
+from .ledger import apply_many
+from .models import Category, CategoryNode, PriceHistory, Product, ProductImage, ProductShipping, ProductVariant, Subcategory
+from .pricing import schedule_refresh
+from .repricing import chunked, parse_price
+from .rollups import recompute_product_rollups
+from .search import schedule_index
+from .shipping import invalidate_shipping
+from .taxonomy import file_products
+
+RECORD_TYPES = ('product', 'variant', 'image', 'shipping')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def read_records(path, file_format=None):
+    """
+    Yield one dict per record from a CSV or JSON Lines file, lazily.
+
+    Every record needs a ``type`` of product, variant, image or shipping.
+    Empty CSV cells are dropped so they fall back to defaults.
+    """
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'jsonl':
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(handle):
+                yield {key: value for key, value in row.items() if key and value not in (None, '')}
+
+
+def as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def as_decimal(value, default='0'):
+    return parse_price(default if value in (None, '') else value)
+
+
+class CatalogImporter:
+    """
+    Load catalog records in chunked transactions with bulk upserts.
+
+    Categories and subcategories are resolved by slug from maps loaded once.
+    Each chunk costs a fixed number of queries: products and variants are
+    upserted on ``sku``, images are bulk inserted, shipping rows replace any
+    existing row for the same product and method, and the opening stock of
+    new variants is written through the ledger. Products are filed in the
+    category tree, and follow a category change when they sat under the old
+    category's node. Price changes of existing
+    variants are recorded in PriceHistory, as bulk_reprice() does. A SKU
+    repeated within one chunk takes its last record. Records must come after
+    the product they reference, either in the same chunk or an earlier one.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.categories = dict(Category.objects.values_list('slug', 'pk'))
+        self.subcategories = {
+            slug: (pk, category_id)
+            for slug, pk, category_id in Subcategory.objects.values_list('slug', 'pk', 'category_id')
+        }
+        self.stats = dict.fromkeys(RECORD_TYPES, 0)
+        self.errors = []
+
+    def run(self, records, skip=0, on_batch=None):
+        """
+        Import ``records``, skipping the first ``skip``; ``on_batch(done)`` runs after each commit.
+        """
+        records = iter(records)
+        done = 0
+        for _ in range(skip):
+            if next(records, None) is None:
+                break
+            done += 1
+        for batch in chunked(records, self.batch_size):
+            with transaction.atomic():
+                self.import_batch(batch, first_line=done + 1)
+            done += len(batch)
+            if on_batch:
+                on_batch(done)
+        catalog_cache.invalidate_catalog()
+        return self.stats
+
+    def import_batch(self, batch, first_line=1):
+        grouped = {record_type: [] for record_type in RECORD_TYPES}
+        for offset, record in enumerate(batch):
+            record_type = record.get('type')
+            if record_type not in grouped:
+                self.errors.append((first_line + offset, f"Unknown record type {record_type!r}"))
+                continue
+            grouped[record_type].append((first_line + offset, record))
+
+        product_ids = self.import_products(grouped['product'])
+        needed = {
+            record.get('product_sku')
+            for record_type in ('variant', 'image', 'shipping')
+            for _, record in grouped[record_type]
+        } - product_ids.keys()
+        product_ids.update(Product.objects.filter(sku__in=needed).values_list('sku', 'pk'))
+
+        self.import_variants(grouped['variant'], product_ids)
+        self.import_images(grouped['image'], product_ids)
+        self.import_shipping(grouped['shipping'], product_ids)
+        schedule_index(product_ids.values())
+
+    def resolve_product(self, line, record, product_ids):
+        product_id = product_ids.get(record.get('product_sku'))
+        if product_id is None:
+            self.errors.append((line, f"Unknown product_sku {record.get('product_sku')!r}"))
+        return product_id
+
+    def import_products(self, records):
+        products = []
+        for line, record in records:
+            category_id = self.categories.get(record.get('category'))
+            subcategory = self.subcategories.get(record.get('subcategory')) if record.get('subcategory') else None
+            if category_id is None:
+                self.errors.append((line, f"Unknown category {record.get('category')!r}"))
+                continue
+            if record.get('subcategory') and (subcategory is None or subcategory[1] != category_id):
+                self.errors.append((line, f"Unknown subcategory {record.get('subcategory')!r} for this category"))
+                continue
+            try:
+                products.append(Product(
+                    name=record['name'],
+                    sku=record.get('sku') or None,
+                    slug=record.get('slug') or None,
+                    description=record.get('description'),
+                    category_id=category_id,
+                    subcategory_id=subcategory[0] if subcategory else None,
+                    tax=float(record.get('tax') or 0),
+                    seo_meta_title=record.get('seo_meta_title'),
+                    seo_meta_description=record.get('seo_meta_description'),
+                    seo_meta_keywords=record.get('seo_meta_keywords'),
+                    additional_seo=record.get('additional_seo') or '',
+                ))
+            except (KeyError, ValueError) as exc:
+                self.errors.append((line, f"Invalid product: {exc}"))
+        if not products:
+            return {}
+
+        without_sku = [product for product in products if not product.sku]
+        for product, sku in zip(without_sku, reserve_skus(len(without_sku))):
+            product.sku = sku
+        # An upsert cannot touch the same row twice in one statement.
+        products = list({product.sku: product for product in products}.values())
+        existing = {
+            sku: (slug, category_id, subcategory_id, node_id)
+            for sku, slug, category_id, subcategory_id, node_id in Product.objects.filter(sku__in=[p.sku for p in products])
+            .values_list('sku', 'slug', 'category_id', 'subcategory_id', 'node_id')
+        }
+        # Slugs from the file go through the same collision check as generated ones; existing products keep theirs.
+        new = []
+        for product in products:
+            if product.sku in existing:
+                product.slug = existing[product.sku][0]
+            else:
+                new.append(product)
+        for product, slug in zip(new, unique_slugs([product.slug or product.name for product in new], Product)):
+            product.slug = slug
+
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=[
+                'name', 'description', 'category', 'subcategory', 'tax', 'seo_meta_title',
+                'seo_meta_description', 'seo_meta_keywords', 'additional_seo', 'updated_at',
+            ],
+        )
+        self.stats['product'] += len(products)
+        product_ids = dict(Product.objects.filter(sku__in=[p.sku for p in products]).values_list('sku', 'pk'))
+        file_products(product_ids.values(), refile=[product_ids[sku] for sku in self.recategorized(products, existing)])
+        return product_ids
+
+    def recategorized(self, products, existing):
+        """
+        SKUs of existing products whose category changed while they sat under the old category's node.
+
+        ``existing`` maps SKU to the stored (slug, category_id, subcategory_id, node_id).
+        """
+        moved = [
+            product.sku for product in products
+            if product.sku in existing and existing[product.sku][1:3] != (product.category_id, product.subcategory_id)
+        ]
+        if not moved:
+            return []
+        old = [existing[sku] for sku in moved]
+        nodes = CategoryNode.objects.filter(
+            Q(category_id__in={row[1] for row in old}) | Q(subcategory_id__in={row[2] for row in old if row[2]})
+        ).values_list('pk', 'category_id', 'subcategory_id')
+        category_nodes = {category_id: pk for pk, category_id, _ in nodes if category_id}
+        subcategory_nodes = {subcategory_id: pk for pk, _, subcategory_id in nodes if subcategory_id}
+        return [
+            sku for sku, (_, category_id, subcategory_id, node_id) in zip(moved, old)
+            if node_id is not None and node_id == (subcategory_nodes.get(subcategory_id) or category_nodes.get(category_id))
+        ]
+
+    def import_variants(self, records, product_ids):
+        variants, opening_stock = [], {}
+        for line, record in records:
+            product_id = self.resolve_product(line, record, product_ids)
+            if product_id is None:
+                continue
+            try:
+                variants.append(ProductVariant(
+                    product_id=product_id,
+                    name=record['name'],
+                    sku=record['sku'],
+                    price=as_decimal(record.get('price')),
+                    stock_quantity=0,
+                ))
+                opening_stock[record['sku']] = int(record.get('stock_quantity') or 0)
+            except (KeyError, ValueError) as exc:
+                self.errors.append((line, f"Invalid variant: {exc}"))
+        if not variants:
+            return
+
+        variants = list({variant.sku: variant for variant in variants}.values())
+        stored = {
+            sku: (pk, product_id, price)
+            for pk, sku, product_id, price in ProductVariant.objects.select_for_update()
+            .filter(sku__in=[v.sku for v in variants]).values_list('pk', 'sku', 'product_id', 'price')
+        }
+        previous_products = {sku: product_id for sku, (_, product_id, _) in stored.items()}
+        ProductVariant.objects.bulk_create(
+            variants,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=['product', 'name', 'price', 'updated_at'],
+        )
+        # The upsert sends no signals, so repriced variants get their history rows here.
+        PriceHistory.objects.bulk_create([
+            PriceHistory(product_variant_id=stored[variant.sku][0], old_price=stored[variant.sku][2], new_price=variant.price)
+            for variant in variants
+            if variant.sku in stored and stored[variant.sku][2] != variant.price
+        ])
+        variant_ids = dict(ProductVariant.objects.filter(sku__in=[v.sku for v in variants]).values_list('sku', 'pk'))
+        # Opening stock of new variants goes through the ledger so it stays reconcilable.
+        apply_many([
+            (variant_ids[sku], 'IN', quantity, 'Catalog import')
+            for sku, quantity in opening_stock.items()
+            if sku not in previous_products and quantity > 0
+        ])
+        # Upserts skip model signals and may reprice or move variants, so rebuild the rollups they touch.
+        recompute_product_rollups({variant.product_id for variant in variants} | set(previous_products.values()))
+        schedule_refresh(variant_ids.values())
+        self.stats['variant'] += len(variants)
+
+    def import_images(self, records, product_ids):
+        images = []
+        for line, record in records:
+            product_id = self.resolve_product(line, record, product_ids)
+            if product_id is None:
+                continue
+            if not record.get('image'):
+                self.errors.append((line, "Image record without an 'image' path"))
+                continue
+            images.append(ProductImage(
+                product_id=product_id,
+                image=record['image'],
+                is_main=as_bool(record.get('is_main', False)),
+            ))
+        ProductImage.objects.bulk_create(images)
+        for image in images:
+            schedule_renditions(image.image)
+        self.stats['image'] += len(images)
+
+    def import_shipping(self, records, product_ids):
+        rows = {}
+        for line, record in records:
+            product_id = self.resolve_product(line, record, product_ids)
+            if product_id is None:
+                continue
+            try:
+                rows[product_id, record['shipping_method']] = ProductShipping(
+                    product_id=product_id,
+                    shipping_method=record['shipping_method'],
+                    local_shipping_cost=as_decimal(record.get('local_shipping_cost')),
+                    regional_shipping_cost=as_decimal(record.get('regional_shipping_cost')),
+                    national_shipping_cost=as_decimal(record.get('national_shipping_cost')),
+                    shipping_cost_multiply_quantity=as_bool(record.get('shipping_cost_multiply_quantity', False)),
+                    estimated_delivery_time=record.get('estimated_delivery_time'),
+                    additional_shipping_info=record.get('additional_shipping_info'),
+                )
+            except (KeyError, ValueError) as exc:
+                self.errors.append((line, f"Invalid shipping row: {exc}"))
+        if not rows:
+            return
+        replaced = Q()
+        for product_id, method in rows:
+            replaced |= Q(product_id=product_id, shipping_method=method)
+        ProductShipping.objects.filter(replaced).delete()
+        ProductShipping.objects.bulk_create(rows.values())
+        product_ids = {product_id for product_id, _ in rows}
+        transaction.on_commit(lambda: invalidate_shipping(product_ids))
+        self.stats['shipping'] += len(rows)
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, source, done):
+    """
+    Record progress atomically so an interrupted import can resume after the last commit.
+    """
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as handle:
+        json.dump({'source': os.path.abspath(source), 'records': done}, handle)
+    os.replace(tmp, path)
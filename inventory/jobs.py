@@ -0,0 +1,204 @@
+# inventory/jobs.py
+import logging
+import threading
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# A claimed batch that is not finished by then is handed to another worker.
+LOCK_TIMEOUT = timedelta(minutes=5)
+RETRY_BASE_DELAY = 5
+
+JobType = namedtuple('JobType', ['handler', 'batch_size', 'max_attempts', 'inline'])
+
+_registry = {}
+
+
+def job(name, batch_size=100, max_attempts=5, inline=False):
+    """
+    Register ``handler(payloads)`` as the job type ``name``.
+
+    Handlers receive a batch of payloads and must be safe to re-run: a
+    batch that raises is retried with exponential backoff. ``inline`` job
+    types run in-process right after the enqueuing transaction commits
+    instead of going through the queue.
+    """
+    def decorator(handler):
+        _registry[name] = JobType(handler, batch_size, max_attempts, inline)
+        return handler
+    return decorator
+
+
+def runs_inline(name):
+    run_inline = getattr(settings, 'JOBS_RUN_INLINE', False)
+    return _registry[name].inline or run_inline is True or name in (run_inline or ())
+
+
+_inline = threading.local()
+
+
+def _run_inline(name, payloads, keys):
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        _registry[name].handler(payloads)
+        return
+    callback = getattr(_inline, 'callback', None)
+    if callback is None or not any(entry[1] is callback for entry in conn.run_on_commit):
+        callback = _inline.callback = partial(_flush_inline, {})
+        # Robust, so a failing side effect cannot turn a committed write into an error.
+        transaction.on_commit(callback, robust=True)
+    pending, seen = callback.args[0].setdefault(name, ([], set()))
+    for payload, key in zip(payloads, keys):
+        if key is None or key not in seen:
+            pending.append(payload)
+            seen.add(key)
+
+
+def _flush_inline(batches):
+    for name, (payloads, _) in batches.items():
+        _registry[name].handler(payloads)
+
+
+def enqueue(name, payloads, keys=None):
+    """
+    Record ``payloads`` as ``name`` jobs in the current transaction.
+
+    ``keys`` gives an optional idempotency key per payload; a payload whose
+    key already has a pending job is dropped, since that job will see the
+    same data. Everything is written with one INSERT.
+    """
+    if name not in _registry:
+        raise KeyError(f"Unknown job type {name!r}")
+    payloads = list(payloads)
+    keys = list(keys) if keys is not None else [None] * len(payloads)
+    if not payloads:
+        return
+    if runs_inline(name):
+        _run_inline(name, payloads, keys)
+        return
+    now = timezone.now()
+    Job.objects.bulk_create(
+        [Job(name=name, payload=payload, idempotency_key=key, run_after=now) for payload, key in zip(payloads, keys)],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_ids(name, ids):
+    """
+    Enqueue one ``{'id': pk}`` job per id, keyed so each id is pending at most once.
+    """
+    ids = sorted(set(ids))
+    enqueue(name, [{'id': pk} for pk in ids], [f'{name}:{pk}' for pk in ids])
+
+
+def payload_ids(payloads):
+    return {payload['id'] for payload in payloads}
+
+
+def _requeue(jobs, run_after):
+    """
+    Put claimed jobs back in the queue, dropping those whose key got a new pending job meanwhile.
+    """
+    keys = [job.idempotency_key for job in jobs if job.idempotency_key]
+    superseded = set(
+        Job.objects.filter(status=Job.STATUS_PENDING, idempotency_key__in=keys).values_list('idempotency_key', flat=True)
+    )
+    Job.objects.filter(pk__in=[job.pk for job in jobs if job.idempotency_key in superseded]).delete()
+    Job.objects.filter(pk__in=[job.pk for job in jobs if job.idempotency_key not in superseded]).update(
+        status=Job.STATUS_PENDING, run_after=run_after, claimed_by=None, locked_until=None,
+    )
+
+
+def recover_stale_jobs():
+    """
+    Requeue running jobs whose worker stopped before finishing them.
+    """
+    stale = list(Job.objects.filter(status=Job.STATUS_RUNNING, locked_until__lt=timezone.now()))
+    if stale:
+        _requeue(stale, timezone.now())
+    return len(stale)
+
+
+def claim_batch():
+    """
+    Claim the next batch of due jobs, all of the oldest due job's type.
+
+    The claim is a conditional UPDATE stamped with a fresh token, so
+    concurrent workers never get the same job. Returns (name, jobs).
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.STATUS_PENDING, run_after__lte=now)
+    name = due.order_by('id').values_list('name', flat=True).first()
+    if name is None:
+        return None, []
+    job_type = _registry.get(name)
+    if job_type is None:
+        due.filter(name=name).update(status=Job.STATUS_FAILED, last_error=f"Unknown job type {name!r}")
+        return name, []
+    ids = list(due.filter(name=name).order_by('id').values_list('pk', flat=True)[:job_type.batch_size])
+    token = uuid.uuid4().hex
+    Job.objects.filter(pk__in=ids, status=Job.STATUS_PENDING).update(
+        status=Job.STATUS_RUNNING, claimed_by=token, locked_until=now + LOCK_TIMEOUT, attempts=F('attempts') + 1,
+    )
+    return name, list(Job.objects.filter(claimed_by=token))
+
+
+def run_batch():
+    """
+    Claim and run one batch; returns the number of jobs processed.
+    """
+    name, jobs = claim_batch()
+    if not jobs:
+        return 0
+    job_type = _registry[name]
+    try:
+        job_type.handler([job.payload for job in jobs])
+    except Exception as exc:
+        logger.exception("Job batch %s failed (%d jobs)", name, len(jobs))
+        _fail(jobs, job_type, exc)
+    else:
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+    return len(jobs)
+
+
+def _fail(jobs, job_type, exc):
+    error = f"{type(exc).__name__}: {exc}"
+    Job.objects.filter(pk__in=[job.pk for job in jobs]).update(last_error=error)
+    dead = [job.pk for job in jobs if job.attempts >= job_type.max_attempts]
+    Job.objects.filter(pk__in=dead).update(status=Job.STATUS_FAILED, claimed_by=None, locked_until=None)
+    by_attempt = defaultdict(list)
+    for job in jobs:
+        if job.attempts < job_type.max_attempts:
+            by_attempt[job.attempts].append(job)
+    for attempts, retry in by_attempt.items():
+        _requeue(retry, timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (attempts - 1)))
+
+
+def work(stop, idle_sleep=1.0, exit_when_idle=False):
+    """
+    Worker loop: run batches until ``stop`` is set, sleeping while the queue is empty.
+    """
+    try:
+        while not stop.is_set():
+            try:
+                recover_stale_jobs()
+                processed = run_batch()
+            except Exception:
+                logger.exception("Job worker error")
+                processed = 0
+            if not processed:
+                if exit_when_idle:
+                    return
+                stop.wait(idle_sleep)
+    finally:
+        connection.close()
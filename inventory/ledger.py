@@ -0,0 +1,175 @@
+# inventory/ledger.py
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import DailyStockMovement, InventoryTransaction, ProductVariant
+
+OPENING_BALANCE = 'Opening balance'
+OPENING_BALANCE_BATCH_SIZE = 1000
+
+# Sent inside the writing transaction with ``deltas={variant_id: net change}``.
+# Receivers should only record the deltas and defer real work to on_commit.
+stock_changed = Signal()
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when an OUT transaction would take a variant's stock below zero.
+    """
+
+    def __init__(self, variant_ids):
+        self.variant_ids = sorted(variant_ids)
+        super().__init__(f"Insufficient stock for variant(s): {', '.join(map(str, self.variant_ids))}")
+
+
+def signed_quantity(transaction_type, quantity):
+    """
+    Return the stock delta for a transaction type and a positive quantity.
+    """
+    if quantity is None or quantity <= 0:
+        raise ValueError("Transaction quantity must be a positive integer.")
+    if transaction_type == 'IN':
+        return quantity
+    if transaction_type == 'OUT':
+        return -quantity
+    raise ValueError(f"Unknown transaction type: {transaction_type!r}")
+
+
+def adjust_stock(variant_id, delta):
+    """
+    Apply a stock delta to one variant in a single conditional UPDATE.
+
+    Decrements only match while enough stock is left, so concurrent OUT
+    transactions can never oversell or lose each other's updates.
+    """
+    queryset = ProductVariant.objects.filter(pk=variant_id)
+    if delta < 0:
+        queryset = queryset.filter(stock_quantity__gte=-delta)
+    # updated_at moves with the stock so Last-Modified and ETags of catalog pages see the change.
+    if not queryset.update(stock_quantity=F('stock_quantity') + delta, updated_at=timezone.now()):
+        raise InsufficientStock([variant_id])
+    stock_changed.send(sender=ProductVariant, deltas={variant_id: delta})
+
+
+def apply_transaction(variant_id, transaction_type, quantity, description=None):
+    """
+    Record one ledger row and move the variant's stock atomically.
+    """
+    entry = InventoryTransaction(
+        product_variant_id=variant_id,
+        transaction_type=transaction_type,
+        quantity=quantity,
+        description=description,
+    )
+    entry.save()
+    return entry
+
+
+def apply_many(entries):
+    """
+    Record many ledger rows and their stock deltas in a constant number of statements.
+
+    ``entries`` is an iterable of ``(variant_id, transaction_type, quantity)``
+    or ``(variant_id, transaction_type, quantity, description)`` tuples. Deltas
+    are summed per variant, variant rows are locked in primary key order, one
+    guarded UPDATE moves every stock level and one bulk INSERT writes the
+    ledger. If any variant would go negative nothing is written.
+    """
+    rows = []
+    deltas = OrderedDict()
+    for entry in entries:
+        variant_id, transaction_type, quantity = entry[:3]
+        description = entry[3] if len(entry) > 3 else None
+        delta = signed_quantity(transaction_type, quantity)
+        deltas[variant_id] = deltas.get(variant_id, 0) + delta
+        rows.append(InventoryTransaction(
+            product_variant_id=variant_id,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            description=description,
+        ))
+    if not rows:
+        return []
+
+    variant_ids = sorted(deltas)
+    guard = Q()
+    for variant_id in variant_ids:
+        delta = deltas[variant_id]
+        if delta < 0:
+            guard |= Q(pk=variant_id, stock_quantity__gte=-delta)
+        else:
+            guard |= Q(pk=variant_id)
+
+    try:
+        with transaction.atomic():
+            # Lock in a deterministic order so concurrent batches cannot deadlock.
+            list(ProductVariant.objects.select_for_update().filter(pk__in=variant_ids).order_by('pk').values_list('pk', flat=True))
+            updated = ProductVariant.objects.filter(guard).update(
+                stock_quantity=F('stock_quantity') + Case(
+                    *[When(pk=variant_id, then=Value(deltas[variant_id])) for variant_id in variant_ids],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            if updated != len(variant_ids):
+                raise InsufficientStock(variant_ids)
+            created = InventoryTransaction.objects.bulk_create(rows)
+            stock_changed.send(sender=ProductVariant, deltas=dict(deltas))
+            return created
+    except InsufficientStock:
+        # The savepoint is rolled back, so the stock read here is the pre-batch level.
+        raise InsufficientStock(_short_variants(deltas) or variant_ids) from None
+
+
+def _short_variants(deltas):
+    stock = dict(ProductVariant.objects.filter(pk__in=list(deltas)).values_list('pk', 'stock_quantity'))
+    return [
+        variant_id for variant_id, delta in deltas.items()
+        if variant_id not in stock or stock[variant_id] + delta < 0
+    ]
+
+
+def has_ledger_history():
+    """
+    Condition on ProductVariant: the variant has ledger rows, live or archived.
+
+    Archived days always keep a DailyStockMovement rollup, so checking the
+    rollups covers rows compact_history moved out of the table.
+    """
+    return (
+        Exists(InventoryTransaction.objects.filter(product_variant=OuterRef('pk')))
+        | Exists(DailyStockMovement.objects.filter(product_variant=OuterRef('pk')))
+    )
+
+
+def record_opening_balances(variant_ids=None, batch_size=OPENING_BALANCE_BATCH_SIZE):
+    """
+    Write an IN row for the stock of every variant that has stock but no ledger history.
+
+    Such stock was set directly: before the ledger existed, or when the
+    variant was created with a stock_quantity. The row records stock that is
+    already counted, so stock_quantity is not moved and stock_changed is not
+    sent. Variants are locked in pk order and batches, and checked again
+    under the lock, so a concurrent ledger write is never counted twice.
+    Returns the number of rows written.
+    """
+    candidates = ProductVariant.objects.filter(~has_ledger_history(), stock_quantity__gt=0)
+    if variant_ids is not None:
+        candidates = candidates.filter(pk__in=list(variant_ids))
+    last_pk, written = 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(candidates.select_for_update().filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return written
+            rows = InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(product_variant_id=variant_id, transaction_type='IN', quantity=stock, description=OPENING_BALANCE)
+                for variant_id, stock in candidates.filter(pk__in=batch).values_list('pk', 'stock_quantity')
+            ])
+        last_pk = batch[-1]
+        written += len(rows)
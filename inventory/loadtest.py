@@ -0,0 +1,216 @@
+# inventory/loadtest.py
+"""
+Concurrent load against the catalog read endpoints, comparing the sync
+views on a WSGI thread pool with the async views on ASGI.
+
+Targets are 'wsgi' and 'asgi' (the handlers driven in-process) or the URL of
+a running server. A slow client takes ``slow_client`` seconds to send its
+request: a WSGI worker thread is held for that time, an ASGI server just
+awaits it.
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .benchmarks import percentile
+from .models import Category, Product
+
+IN_PROCESS_HOST = 'testserver'
+DEFAULT_REQUESTS = 1000
+DEFAULT_CONCURRENCY = 100
+# Worker threads of the in-process WSGI server, as in a threaded sync server.
+DEFAULT_THREADS = 8
+SAMPLE_PATHS = 50
+
+
+class LoadTestError(Exception):
+    pass
+
+
+def catalog_paths(views='sync', sample=SAMPLE_PATHS, seed=0):
+    """
+    Detail and category listing paths for a random sample of the catalog.
+    """
+    prefix = 'catalog:async-' if views == 'async' else 'catalog:'
+    rng = random.Random(seed)
+    slugs = list(Product.objects.exclude(slug=None).order_by('pk').values_list('slug', flat=True)[:sample * 20])
+    categories = list(Category.objects.filter(products__isnull=False).order_by('pk').values_list('slug', flat=True).distinct())
+    if not slugs:
+        raise LoadTestError("The catalog has no products; run seed_catalog first.")
+    paths = [reverse(f'{prefix}product-detail', args=[slug]) for slug in rng.sample(slugs, min(sample, len(slugs)))]
+    paths += [reverse(f'{prefix}category-products', args=[slug]) for slug in categories[:max(1, sample // 5)]]
+    rng.shuffle(paths)
+    return paths
+
+
+def _wsgi_get(handler, path, slow_client):
+    # A sync server's worker reads the whole request before calling the app.
+    if slow_client:
+        time.sleep(slow_client)
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': IN_PROCESS_HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': IN_PROCESS_HOST, 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+    response = handler(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return status[0]
+
+
+def wsgi_fetcher(threads):
+    handler, executor = WSGIHandler(), ThreadPoolExecutor(max_workers=threads)
+
+    async def fetch(path, slow_client):
+        return await asyncio.get_running_loop().run_in_executor(executor, _wsgi_get, handler, path, slow_client)
+    return fetch, executor.shutdown
+
+
+def asgi_fetcher():
+    handler = ASGIHandler()
+
+    async def fetch(path, slow_client):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', IN_PROCESS_HOST.encode())], 'client': ('127.0.0.1', 0), 'server': (IN_PROCESS_HOST, 80),
+        }
+        received, status = [], []
+
+        async def receive():
+            if received:
+                # Nothing more to send; Django stops listening for a disconnect once it has responded.
+                await asyncio.Future()
+            received.append(True)
+            if slow_client:
+                await asyncio.sleep(slow_client)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await handler(scope, receive, send)
+        return status[0]
+    return fetch, lambda: None
+
+
+def http_fetcher(url):
+    base = urlsplit(url)
+    if base.scheme != 'http' or not base.hostname:
+        raise LoadTestError(f"Expected an http:// URL, got {url!r}.")
+    port, root = base.port or 80, base.path.rstrip('/')
+
+    async def fetch(path, slow_client):
+        reader, writer = await asyncio.open_connection(base.hostname, port)
+        try:
+            writer.write(f'GET {root}{path} HTTP/1.1\r\n'.encode())
+            await writer.drain()
+            if slow_client:
+                # Trickle the headers, as a client on a poor connection does.
+                await asyncio.sleep(slow_client)
+            writer.write(f'Host: {base.netloc}\r\nConnection: close\r\nAccept: application/json\r\n\r\n'.encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+    return fetch, lambda: None
+
+
+@contextmanager
+def per_request_connections():
+    """
+    Run the in-process ASGI target without persistent connections, as core/asgi.py does.
+    """
+    saved = {alias: connections.settings[alias]['CONN_MAX_AGE'] for alias in connections}
+    for alias in saved:
+        connections.settings[alias]['CONN_MAX_AGE'] = 0
+    try:
+        yield
+    finally:
+        for alias, value in saved.items():
+            connections.settings[alias]['CONN_MAX_AGE'] = value
+
+
+async def drive(fetch, paths, requests, concurrency, slow_client):
+    """
+    Issue ``requests`` GETs over ``paths`` from ``concurrency`` clients at once.
+    """
+    timings, statuses, errors = [], Counter(), Counter()
+    issued = iter(range(requests))
+
+    async def client():
+        for number in issued:
+            start = time.perf_counter()
+            try:
+                statuses[await fetch(paths[number % len(paths)], slow_client)] += 1
+            except Exception as error:
+                errors[type(error).__name__] += 1
+            else:
+                timings.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return timings, statuses, errors, time.perf_counter() - started
+
+
+def milliseconds(seconds):
+    return round(1000 * seconds, 2) if seconds is not None else None
+
+
+def summarize(timings, statuses, errors, elapsed):
+    ordered = sorted(timings)
+    return {
+        'completed': len(timings),
+        'errors': dict(errors),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'requests_per_sec': round(len(timings) / elapsed, 1) if elapsed else None,
+        'p50_ms': milliseconds(percentile(ordered, 0.50)),
+        'p90_ms': milliseconds(percentile(ordered, 0.90)),
+        'p99_ms': milliseconds(percentile(ordered, 0.99)),
+        'max_ms': milliseconds(ordered[-1] if ordered else None),
+        'elapsed_sec': round(elapsed, 2),
+    }
+
+
+def run_load_test(target, paths, requests=DEFAULT_REQUESTS, concurrency=DEFAULT_CONCURRENCY,
+                  slow_client=0.0, threads=DEFAULT_THREADS):
+    """
+    Load ``target`` ('wsgi', 'asgi' or a server URL) and return the latency and throughput summary.
+    """
+    if target == 'wsgi':
+        fetch, close = wsgi_fetcher(threads)
+    elif target == 'asgi':
+        fetch, close = asgi_fetcher()
+    else:
+        fetch, close = http_fetcher(target)
+    connection_mode = per_request_connections() if target == 'asgi' else nullcontext()
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, IN_PROCESS_HOST]), connection_mode:
+        try:
+            result = asyncio.run(drive(fetch, paths, requests, concurrency, slow_client))
+        finally:
+            close()
+    return dict(
+        summarize(*result), target=target, requests=requests, concurrency=concurrency,
+        slow_client=slow_client, threads=threads if target == 'wsgi' else None,
+    )
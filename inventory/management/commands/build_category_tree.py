@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from inventory.taxonomy import build_from_categories, recompute_node_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the category tree from the Category and Subcategory tables and file products under it. "
+        "Safe to re-run; existing nodes follow their source rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true', help="Only recount the products under every node.")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            updated = recompute_node_counts()
+            self.stdout.write(self.style.SUCCESS(f"Recounted products for {updated} nodes."))
+            return
+        result = build_from_categories()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['nodes']} nodes and filed {result['products']} products."
+        ))
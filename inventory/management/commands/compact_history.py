@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.archive import ARCHIVE_BATCH_SIZE, compact_history
+
+
+class Command(BaseCommand):
+    help = "Roll up and move old inventory, price and discount history rows into compressed archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, metavar='DAYS', help="Archive whole days that ended at least this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="Rows per archive chunk.")
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError("--older-than must be at least 1 day.")
+        moved = compact_history(options['older_than'], batch_size=options['batch_size'])
+        for table, count in moved.items():
+            self.stdout.write(f"{table}: archived {count} rows")
+        self.stdout.write(self.style.SUCCESS(f"Archived {sum(moved.values())} history rows."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.alerts import DELIVERY_BATCH_SIZE, MAX_DELIVERY_ATTEMPTS, deliver_stock_alerts
+
+
+class Command(BaseCommand):
+    help = "Deliver pending low-stock alerts from the outbox to the configured handler, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DELIVERY_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=MAX_DELIVERY_ATTEMPTS)
+        parser.add_argument('--every', type=int, metavar='SECONDS', help="Keep running, polling every SECONDS.")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = 0
+            while True:
+                batch = deliver_stock_alerts(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+                if not batch:
+                    break
+                delivered += batch
+            if delivered or options['verbosity'] > 1:
+                self.stdout.write(f"Delivered {delivered} stock alerts.")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
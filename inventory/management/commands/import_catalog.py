@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import CatalogImporter, read_checkpoint, read_records, write_checkpoint
+
+
+class Command(BaseCommand):
+    help = "Stream products, variants, images and shipping rows from CSV or JSON Lines into the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or .jsonl file; every record needs a 'type' column.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', help="File to record progress in after every committed batch.")
+        parser.add_argument('--resume', action='store_true', help="Skip the records the checkpoint says are done.")
+
+    def handle(self, *args, **options):
+        path, checkpoint = options['path'], options['checkpoint']
+        skip = 0
+        if options['resume']:
+            if not checkpoint:
+                raise CommandError("--resume needs --checkpoint.")
+            state = read_checkpoint(checkpoint)
+            if state:
+                if state.get('source') != os.path.abspath(path):
+                    raise CommandError(f"{checkpoint} records progress through {state.get('source')}, not {path}.")
+                skip = state['records']
+                self.stdout.write(f"Resuming after record {skip}.")
+
+        def on_batch(done):
+            if checkpoint:
+                write_checkpoint(checkpoint, path, done)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{done} records committed.")
+
+        importer = CatalogImporter(batch_size=options['batch_size'])
+        try:
+            stats = importer.run(read_records(path, options['format']), skip=skip, on_batch=on_batch)
+        except OSError as exc:
+            raise CommandError(exc)
+        except ValueError as exc:
+            raise CommandError(f"Could not parse {path}: {exc}")
+
+        for line, message in importer.errors:
+            self.stderr.write(f"Record {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            "Imported {product} products, {variant} variants, {image} images, {shipping} shipping rows.".format(**stats)
+            + (f" {len(importer.errors)} records skipped." if importer.errors else "")
+        ))
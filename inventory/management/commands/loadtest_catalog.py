@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.loadtest import (
+    DEFAULT_CONCURRENCY, DEFAULT_REQUESTS, DEFAULT_THREADS, SAMPLE_PATHS, LoadTestError, catalog_paths, run_load_test,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent catalog reads to the sync views on WSGI and the async views on ASGI, "
+        "in-process or against running servers, and report throughput and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', dest='targets',
+            help="'wsgi', 'asgi' or a server URL such as http://127.0.0.1:8000; repeatable. Default: wsgi and asgi.",
+        )
+        parser.add_argument('--views', choices=('sync', 'async'), help="Views to call; default async for asgi, sync otherwise.")
+        parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS)
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Clients sending requests at once.")
+        parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help="Worker threads of the in-process WSGI server.")
+        parser.add_argument('--slow-client', type=float, default=0.0, help="Seconds each client takes to send its request.")
+        parser.add_argument('--paths', type=int, default=SAMPLE_PATHS, help="Products sampled for the request mix.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        results = []
+        try:
+            for target in options['targets'] or ['wsgi', 'asgi']:
+                views = options['views'] or ('async' if target == 'asgi' else 'sync')
+                paths = catalog_paths(views, sample=options['paths'], seed=options['seed'])
+                self.stdout.write(f"Loading {target} ({views} views, {len(paths)} paths)...")
+                results.append(dict(run_load_test(
+                    target, paths, requests=options['requests'], concurrency=options['concurrency'],
+                    slow_client=options['slow_client'], threads=options['threads'],
+                ), views=views))
+        except LoadTestError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(f"{'target':<30}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}  statuses")
+        for row in results:
+            self.stdout.write(
+                f"{row['target'] + ' ' + row['views']:<30}{row['requests_per_sec'] or 0:>10.1f}"
+                f"{row['p50_ms'] or 0:>10.2f}{row['p90_ms'] or 0:>10.2f}{row['p99_ms'] or 0:>10.2f}"
+                f"{sum(row['errors'].values()):>8}  {row['statuses']}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.search import INDEX_BATCH_SIZE, create_search_index, rebuild_search_index, search_backend
+
+
+class Command(BaseCommand):
+    help = "Re-index every product in the full-text search table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=INDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if search_backend() is None:
+            raise CommandError("This database has no full-text search support; admin search falls back to icontains.")
+        create_search_index()
+        indexed = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventory.coupons import RECOUNT_BATCH_SIZE, recompute_usage_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild coupon and per-user usage counters from the recorded coupon usages. "
+        "Run once after upgrading so existing usages count towards the limits; safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coupon', type=int, action='append', dest='coupon_ids', help="Only this coupon id; repeatable.")
+        parser.add_argument('--batch-size', type=int, default=RECOUNT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        processed = recompute_usage_counters(options['coupon_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recounted usages of {processed} coupons."))
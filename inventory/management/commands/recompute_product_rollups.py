@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.rollups import RECOMPUTE_BATCH_SIZE, recompute_product_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild product stock and price ranges from their variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='product_ids', help="Only this product id; repeatable.")
+        parser.add_argument('--batch-size', type=int, default=RECOMPUTE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        processed = recompute_product_rollups(options['product_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed rollups for {processed} products."))
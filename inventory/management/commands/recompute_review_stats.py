@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.reviews import recompute_review_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-product review statistics from the reviews table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='product_ids', help="Only this product id; repeatable.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = recompute_review_stats(options['product_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed review stats for {processed} products."))
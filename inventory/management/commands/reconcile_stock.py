@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from inventory.snapshots import SNAPSHOT_BATCH_SIZE, reconcile_stock
+
+
+class Command(BaseCommand):
+    help = "Check every variant's stock_quantity against the inventory ledger and report or fix drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Set drifted stock to the ledger value.")
+        parser.add_argument('--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        drifted, unrecorded = 0, 0
+        for drift in reconcile_stock(batch_size=options['batch_size'], fix=options['fix']):
+            drifted += 1
+            note = ''
+            if not drift.has_history:
+                unrecorded += 1
+                note = ", no ledger history"
+            self.stdout.write(
+                f"{drift.sku} (#{drift.variant_id}): recorded {drift.recorded}, ledger {drift.expected} "
+                f"({drift.recorded - drift.expected:+d}{note})"
+            )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Stock matches the ledger for every variant."))
+            return
+        if options['fix'] and drifted > unrecorded:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {drifted - unrecorded} drifted variants."))
+        elif not options['fix']:
+            self.stdout.write(self.style.WARNING(f"{drifted} variants drifted; run with --fix to correct them."))
+        if unrecorded:
+            self.stdout.write(self.style.WARNING(
+                f"{unrecorded} variants have stock but no ledger history and were left alone; "
+                "run record_opening_balances to record their current stock."
+            ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import OPENING_BALANCE_BATCH_SIZE, record_opening_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Write an opening-balance ledger row for every variant whose stock was set directly and has no "
+        "ledger history, so reconcile_stock can check it. Run once after upgrading; safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variant', type=int, action='append', dest='variant_ids', help="Only this variant id; repeatable.")
+        parser.add_argument('--batch-size', type=int, default=OPENING_BALANCE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = record_opening_balances(options['variant_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recorded opening balances for {written} variants."))
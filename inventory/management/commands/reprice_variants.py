@@ -0,0 +1,39 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.repricing import bulk_reprice, parse_price
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV of sku,price rows and reprice variants in set-based chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with 'sku' and 'price' columns, or '-' for stdin.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--delimiter', default=',')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            stats = bulk_reprice(self.read_rows(sys.stdin, options['delimiter']), options['chunk_size'])
+        else:
+            try:
+                handle = open(options['path'], newline='', encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(exc)
+            with handle:
+                stats = bulk_reprice(self.read_rows(handle, options['delimiter']), options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {stats['updated']}, unchanged {stats['unchanged']}, missing {stats['missing']}."
+        ))
+
+    def read_rows(self, handle, delimiter):
+        reader = csv.DictReader(handle, delimiter=delimiter)
+        if not reader.fieldnames or not {'sku', 'price'} <= set(reader.fieldnames):
+            raise CommandError("The CSV needs a header with 'sku' and 'price' columns.")
+        for row in reader:
+            try:
+                yield row['sku'].strip(), parse_price(row['price'])
+            except (AttributeError, ValueError) as exc:
+                raise CommandError(f"Line {reader.line_num}: {exc}")
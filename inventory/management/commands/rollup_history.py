@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.archive import rollup_history
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily stock movement and price change rollups for recent days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help="How many days back from today to recompute (default: 1).")
+
+    def handle(self, *args, **options):
+        written = rollup_history(timezone.now() - timedelta(days=options['days']))
+        for table, count in written.items():
+            self.stdout.write(f"{table}: {count} daily rows")
+        self.stdout.write(self.style.SUCCESS("Rollups are up to date."))
@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.benchmarks import BenchmarkError, available_benchmarks, compare_results, run_benchmarks
+from inventory.seeding import DEFAULT_PREFIX
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the key catalog, stock and admin operations against the current database "
+        "and write latency percentiles, throughput and query counts as JSON. Writes to the "
+        "database; run it against a seeded benchmark catalog, not production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', choices=sorted(available_benchmarks()), help="Run just this benchmark; repeatable.")
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help="Prefix the catalog was seeded with.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+        parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.1, help="Relative slowdown counted as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--list', action='store_true', help="List the benchmarks and exit.")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, bench in available_benchmarks().items():
+                self.stdout.write(f"{name}: {bench.description}")
+            return
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Could not read {options['compare']}: {exc}")
+        try:
+            results = run_benchmarks(
+                options['only'], iterations=options['iterations'], warmup=options['warmup'],
+                seed=options['seed'], prefix=options['prefix'],
+            )
+        except BenchmarkError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(f"{'benchmark':<28}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'queries':>9}")
+        for name, row in results['results'].items():
+            self.stdout.write(
+                f"{name:<28}{row['p50_ms']:>10.2f}{row['p90_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+                f"{row['ops_per_sec']:>10.1f}{row['queries_mean']:>9.1f}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if baseline is not None:
+            comparisons = compare_results(baseline, results, threshold=options['threshold'])
+            regressions = [item for item in comparisons if item.regression]
+            self.stdout.write(f"Compared with {baseline['meta'].get('revision') or options['compare']}:")
+            for item in comparisons:
+                marker = '  REGRESSION' if item.regression else ''
+                self.stdout.write(f"  {item.benchmark} {item.metric}: {item.before} -> {item.after} ({item.change:+.1%}){marker}")
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} metric(s) regressed.")
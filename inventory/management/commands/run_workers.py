@@ -0,0 +1,53 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Run the job workers that process queued side effects (search indexing, renditions, alerts, ...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+        parser.add_argument('--idle-sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'process':
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            workers = [
+                context.Process(target=_run_process, args=(stop, options['idle_sleep'], options['once']), name=f'jobs-{index}')
+                for index in range(options['workers'])
+            ]
+        else:
+            stop = threading.Event()
+            workers = [
+                threading.Thread(target=work, args=(stop, options['idle_sleep'], options['once']), name=f'jobs-{index}')
+                for index in range(options['workers'])
+            ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} {options['mode']} workers.")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers after their current batch...")
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
+
+
+def _run_process(stop, idle_sleep, once):
+    # The parent handles Ctrl+C and tells the children to stop between batches.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(stop, idle_sleep, once)
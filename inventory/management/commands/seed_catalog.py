@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.seeding import DEFAULT_PREFIX, clear_seed, seed_catalog
+
+
+class Command(BaseCommand):
+    help = "Bulk-create a reproducible synthetic catalog for benchmarks and load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--variants-per', type=int, default=3, help="Variants per product.")
+        parser.add_argument('--reviews', type=int, default=2, help="Reviews per product.")
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--subcategories-per', type=int, default=5, help="Subcategories per category.")
+        parser.add_argument('--discount-ratio', type=float, default=0.2, help="Share of variants with a running discount.")
+        parser.add_argument('--coupons', type=int, default=20)
+        parser.add_argument('--transactions-per', type=int, default=3, help="Ledger rows per variant.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same catalog.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Products per transaction.")
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help="Marks the seeded rows so they can be cleared.")
+        parser.add_argument('--clear', action='store_true', help="Delete a previous seed with the same prefix first.")
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['variants_per'] < 1 or options['categories'] < 1:
+            raise CommandError("--products, --variants-per and --categories must be at least 1.")
+        if options['transactions_per'] < 1:
+            raise CommandError("--transactions-per must be at least 1.")
+        if options['clear']:
+            clear_seed(options['prefix'])
+        try:
+            counts = seed_catalog(
+                products=options['products'],
+                variants_per=options['variants_per'],
+                reviews=options['reviews'],
+                categories=options['categories'],
+                subcategories_per=options['subcategories_per'],
+                discount_ratio=options['discount_ratio'],
+                coupons=options['coupons'],
+                transactions_per=options['transactions_per'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                prefix=options['prefix'],
+            )
+        except ValueError as exc:
+            raise CommandError(f"{exc} (use --clear)")
+        self.stdout.write(self.style.SUCCESS(', '.join(f"{count} {name} rows" for name, count in counts.items()) + " created."))
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the replica file, once or every few seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help="Keep copying every this many seconds; the gap between copies stands in for replication lag.",
+        )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica is configured; set DATABASE_REPLICA_PATH.")
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Only SQLite files can be copied; other databases replicate on the server.")
+        try:
+            while True:
+                self.copy(primary, replica)
+                if options['interval'] is None:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def copy(self, primary, replica):
+        # The backup API copies a consistent snapshot, WAL contents included, while others keep writing.
+        replica.close()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'], timeout=30)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']}."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from inventory.snapshots import SNAPSHOT_BATCH_SIZE, take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Record a stock and price snapshot of every variant, built on the previous snapshot and the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help="ISO timestamp to snapshot (default: a few minutes ago).")
+        parser.add_argument('--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        at = None
+        if options['at']:
+            at = parse_datetime(options['at'])
+            if at is None or at.tzinfo is None:
+                raise CommandError("--at must be an ISO timestamp with a UTC offset.")
+        written = take_snapshots(at, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {written} variants."))
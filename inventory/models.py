@@ -1,13 +1,34 @@
-from django.db import models
-from django.utils.text import slugify
-import uuid
-from .validators import validate_thumbnail_size
+import json
+import zlib
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from .tracking import TrackedFieldsMixin, prime_snapshots
+from .validators import RESERVED_PRODUCT_SLUGS, validate_product_image, validate_product_slug, validate_thumbnail_size
+
+def forget_replaced_renditions(instance, field_name):
+    """
+    Clear the rendition digest of an image field whose file is being replaced.
+
+    The renditions belong to the old file; the rendition job records the new
+    file's digest once it has built them.
+    """
+    if instance._state.adding:
+        return
+    if not instance.has_snapshot():
+        prime_snapshots([instance])
+    if field_name in instance.changed_fields():
+        setattr(instance, f'{field_name}_digest', None)
+
+class Category(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('thumbnail',)
 
-class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     thumbnail = models.ImageField(upload_to='category_thumbnails/', validators=[validate_thumbnail_size])
+    # Content hash naming the thumbnail's renditions; set by the rendition job (inventory.images).
+    thumbnail_digest = models.CharField(max_length=64, blank=True, null=True, editable=False)
     seo_meta_title = models.CharField(max_length=70, blank=True, null=True)
     seo_meta_description = models.CharField(max_length=160, blank=True, null=True)
     seo_meta_keywords = models.CharField(max_length=255, blank=True, null=True)
@@ -24,7 +45,9 @@ class Category(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            from .identifiers import unique_slugs
+            self.slug = unique_slugs([self.name], type(self))[0]
+        forget_replaced_renditions(self, 'thumbnail')
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -52,20 +75,87 @@ class Subcategory(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            from .identifiers import unique_slugs
+            self.slug = unique_slugs([self.name], type(self))[0]
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} (in {self.category.name})"
 
-class Product(models.Model):
+class CategoryNode(TrackedFieldsMixin, models.Model):
+    """
+    A category at any depth of the taxonomy, encoded as a materialized path.
+
+    ``path`` is the chain of fixed-width segments from the root down to the
+    node (see inventory.taxonomy), so a subtree is one range of paths and
+    the ancestors are the prefixes of a path.
+    """
+    tracked_fields = ('parent',)
+    tree_fields = ('path', 'depth', 'product_count')
+
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True, blank=True, null=True)
+    description = models.TextField(blank=True, null=True)
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, related_name='children', blank=True, null=True)
+    # Maintained by inventory.taxonomy.
+    path = models.CharField(max_length=255, unique=True, blank=True, null=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False, help_text="Products in this node and below it.")
+    category = models.OneToOneField(Category, on_delete=models.SET_NULL, related_name='node', blank=True, null=True, help_text="The category this node was built from.")
+    subcategory = models.OneToOneField(Subcategory, on_delete=models.SET_NULL, related_name='node', blank=True, null=True, help_text="The subcategory this node was built from.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Category node'
+        verbose_name_plural = 'Category tree'
+
+    def save(self, *args, **kwargs):
+        from .taxonomy import assign_path, move_node
+
+        if not self.slug:
+            from .identifiers import unique_slugs
+            self.slug = unique_slugs([self.name], CategoryNode)[0]
+        if self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                assign_path(self)
+            return
+        if not self.has_snapshot():
+            prime_snapshots([self])
+        with transaction.atomic():
+            if 'parent' in self.changed_fields():
+                move_node(self, self.parent)
+            if not args and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+                # Paths and counts move with UPDATEs elsewhere; writing back the loaded values would undo them.
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.tree_fields
+                ]
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+class Product(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('slug', 'node', 'node_path')
+    rollup_fields = ('stock_quantity', 'min_price', 'max_price')
+    # Skipped by unique_slugs().
+    reserved_slugs = RESERVED_PRODUCT_SLUGS
+
     name = models.CharField(max_length=255)
-    slug = models.SlugField(max_length=255, unique=True, blank=True, null=True)
+    slug = models.SlugField(max_length=255, unique=True, blank=True, null=True, validators=[validate_product_slug])
     sku = models.CharField(max_length=100, unique=True, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, related_name='products', null=True, blank=True)
-    stock_quantity = models.IntegerField(default=0)
+    node = models.ForeignKey(CategoryNode, on_delete=models.SET_NULL, related_name='products', null=True, blank=True, help_text="Defaults to the node of the subcategory or category.")
+    # Copy of node.path, so products under a node are one range scan of this table.
+    node_path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    # Rollups of the product's variants, kept current by inventory.rollups.
+    stock_quantity = models.IntegerField(default=0, editable=False, help_text="Total stock of all variants.")
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
     tax = models.FloatField(default=0)
     seo_meta_title = models.CharField(max_length=70, blank=True, null=True)
     seo_meta_description = models.CharField(max_length=160, blank=True, null=True)
@@ -82,24 +172,47 @@ class Product(models.Model):
             models.Index(fields=['subcategory']),
             models.Index(fields=['created_at']),
             models.Index(fields=['updated_at']),
+            # Keyset pagination of category/subcategory listings
+            models.Index(fields=['category', '-created_at', '-id']),
+            models.Index(fields=['subcategory', '-created_at', '-id']),
+            # Same listings filtered to products in stock
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(stock_quantity__gt=0), name='product_category_in_stock'),
+            models.Index(fields=['subcategory', '-created_at', '-id'], condition=models.Q(stock_quantity__gt=0), name='product_subcat_in_stock'),
+            # Subtree listings: a range of node paths
+            models.Index(fields=['node_path']),
         ]
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            from .identifiers import unique_slugs
+            self.slug = unique_slugs([self.name], Product)[0]
         if not self.sku:
             self.sku = self.generate_sku()
+        from .taxonomy import place_product
+        placed = place_product(self)
+        if not self._state.adding and not args and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # Rollups and node paths move with UPDATEs elsewhere; writing back the loaded values would undo them.
+            skipped = self.rollup_fields if placed else self.rollup_fields + ('node_path',)
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
         super().save(*args, **kwargs)
 
     def generate_sku(self):
-        return f"SKU-{uuid.uuid4().hex[:8].upper()}"
+        from .identifiers import reserve_skus
+        return reserve_skus(1)[0]
 
     def __str__(self):
         return f"{self.name} (SKU: {self.sku})"
 
-class ProductVariant(models.Model):
+class ProductVariant(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('product', 'price', 'stock_quantity')
+    # Moved only by inventory.ledger, with guarded F() updates.
+    ledger_fields = ('stock_quantity',)
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
     name = models.CharField(max_length=100)
     sku = models.CharField(max_length=100, unique=True)
@@ -116,10 +229,23 @@ class ProductVariant(models.Model):
             models.Index(fields=['updated_at']),
         ]
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and not kwargs.get('force_insert'):
+            # Writing back the loaded stock would undo ledger movements made since the instance was read.
+            update_fields = kwargs.get('update_fields')
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.ledger_fields
+                and (update_fields is None or field.name in update_fields or field.attname in update_fields)
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product.name} - {self.name}"
 
-class ProductReview(models.Model):
+class ProductReview(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('product', 'rating', 'is_verified')
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     rating = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)])
@@ -140,6 +266,28 @@ class ProductReview(models.Model):
     def __str__(self):
         return f"Review for {self.product.name} by {self.user.username}"
 
+class ProductReviewStats(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='review_stats')
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    verified_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Product review stats'
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else None
+
+    def __str__(self):
+        return f"Review stats for {self.product.name}"
+
 class ProductShipping(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='shipping_details')
     shipping_method = models.CharField(max_length=100)
@@ -163,9 +311,13 @@ class ProductShipping(models.Model):
     def __str__(self):
         return f"Shipping details for {self.product.name} - {self.shipping_method}"
 
-class ProductImage(models.Model):
+class ProductImage(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('image',)
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='product_images/')
+    image = models.ImageField(upload_to='product_images/', validators=[validate_product_image])
+    # Content hash naming the image's renditions; set by the rendition job (inventory.images).
+    image_digest = models.CharField(max_length=64, blank=True, null=True, editable=False)
     is_main = models.BooleanField(default=False, help_text="Indicates if this is the main image for the product.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -178,12 +330,20 @@ class ProductImage(models.Model):
             models.Index(fields=['updated_at']),
         ]
 
+    def save(self, *args, **kwargs):
+        forget_replaced_renditions(self, 'image')
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Image for {self.product.name} - {'Main' if self.is_main else 'Secondary'}"
 
-class ReviewImage(models.Model):
+class ReviewImage(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('image',)
+
     review = models.ForeignKey(ProductReview, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='review_photos/', validators=[validate_thumbnail_size])
+    # Content hash naming the image's renditions; set by the rendition job (inventory.images).
+    image_digest = models.CharField(max_length=64, blank=True, null=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -192,14 +352,19 @@ class ReviewImage(models.Model):
             models.Index(fields=['uploaded_at']),
         ]
 
+    def save(self, *args, **kwargs):
+        forget_replaced_renditions(self, 'image')
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Image for review of {self.review.product.name} by {self.review.user.username}"
 
-class Discount(models.Model):
+class Discount(TrackedFieldsMixin, models.Model):
     DISCOUNT_TYPE_CHOICES = [
         ('fixed', 'Fixed'),
         ('percent', 'Percentage'),
     ]
+    tracked_fields = ('discount_type', 'discount_value')
 
     product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='discounts')
     discount_type = models.CharField(max_length=10, choices=DISCOUNT_TYPE_CHOICES)
@@ -226,79 +391,105 @@ class Discount(models.Model):
             return f"{self.discount_value}% off on {self.product_variant.name}"
 
 class DiscountHistory(models.Model):
-    discount = models.ForeignKey(Discount, on_delete=models.CASCADE, related_name='history')
+    # History tables are append-only: one timestamp, and only the indexes lookups and compaction need.
+    discount = models.ForeignKey(Discount, on_delete=models.CASCADE, related_name='history', db_index=False)
     applied_at = models.DateTimeField(auto_now_add=True)
     old_discount_type = models.CharField(max_length=10, choices=Discount.DISCOUNT_TYPE_CHOICES)
     old_discount_value = models.DecimalField(max_digits=10, decimal_places=2)
     new_discount_type = models.CharField(max_length=10, choices=Discount.DISCOUNT_TYPE_CHOICES)
     new_discount_value = models.DecimalField(max_digits=10, decimal_places=2)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=['discount']),
+            models.Index(fields=['discount', 'applied_at']),
             models.Index(fields=['applied_at']),
-            models.Index(fields=['created_at']),
-            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return f"Discount changed for {self.discount.product_variant.name} on {self.applied_at}"
 
 class PriceHistory(models.Model):
-    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='price_history')
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='price_history', db_index=False)
     old_price = models.DecimalField(max_digits=10, decimal_places=2)
     new_price = models.DecimalField(max_digits=10, decimal_places=2)
     changed_at = models.DateTimeField(auto_now_add=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=['product_variant']),
+            models.Index(fields=['product_variant', 'changed_at']),
             models.Index(fields=['changed_at']),
-            models.Index(fields=['created_at']),
-            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return f"Price changed for {self.product_variant.name} on {self.changed_at}"
 
-class InventoryTransaction(models.Model):
+class InventoryTransaction(TrackedFieldsMixin, models.Model):
     TRANSACTION_TYPE_CHOICES = [
         ('IN', 'Stock In'),
         ('OUT', 'Stock Out'),
     ]
-    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='inventory_transactions')
+    # Applied to stock when the row is recorded, so they cannot change afterwards.
+    tracked_fields = ('product_variant', 'transaction_type', 'quantity')
+
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='inventory_transactions', db_index=False)
     transaction_type = models.CharField(max_length=3, choices=TRANSACTION_TYPE_CHOICES)
     quantity = models.IntegerField()
     transaction_date = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=['product_variant']),
-            models.Index(fields=['transaction_type']),
+            models.Index(fields=['product_variant', 'transaction_date']),
             models.Index(fields=['transaction_date']),
-            models.Index(fields=['created_at']),
-            models.Index(fields=['updated_at']),
         ]
 
+    def clean(self):
+        if (self._state.adding and self.transaction_type == 'OUT' and self.product_variant_id
+                and self.quantity and self.product_variant.stock_quantity < self.quantity):
+            raise ValidationError({'quantity': "Not enough stock for this variant."})
+
     def save(self, *args, **kwargs):
-        if self.transaction_type == 'IN':
-            self.product_variant.stock_quantity += self.quantity
-        elif self.transaction_type == 'OUT':
-            self.product_variant.stock_quantity -= self.quantity
-        self.product_variant.save()
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            # Ledger rows are applied to stock once, when they are recorded; corrections are new rows.
+            if not self.has_snapshot():
+                prime_snapshots([self])
+            if self.changed_fields():
+                raise ValidationError("Recorded inventory transactions cannot be changed; record a correcting transaction instead.")
+            super().save(*args, **kwargs)
+            return
+        from .ledger import adjust_stock, signed_quantity
+        with transaction.atomic():
+            adjust_stock(self.product_variant_id, signed_quantity(self.transaction_type, self.quantity))
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.transaction_type} - {self.product_variant.name} ({self.quantity})"
 
-class Coupon(models.Model):
+class SkuSequence(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} SKU sequence at {self.next_value}"
+
+class EffectivePrice(models.Model):
+    product_variant = models.OneToOneField(ProductVariant, on_delete=models.CASCADE, primary_key=True, related_name='effective_price')
+    base_price = models.DecimalField(max_digits=10, decimal_places=2)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    valid_until = models.DateTimeField(blank=True, null=True, help_text="When the next discount or coupon window starts or ends.")
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['valid_until']),
+        ]
+
+    def __str__(self):
+        return f"Effective price for {self.product_variant.name}: {self.price}"
+
+class Coupon(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('code',)
+
     code = models.CharField(max_length=50, unique=True)
     discount_type = models.CharField(max_length=10, choices=[('fixed', 'Fixed'), ('percent', 'Percentage')])
     discount_value = models.DecimalField(max_digits=10, decimal_places=2)
@@ -306,6 +497,9 @@ class Coupon(models.Model):
     valid_to = models.DateTimeField()
     active = models.BooleanField(default=True)
     products = models.ManyToManyField(Product, related_name='coupons', blank=True)
+    max_uses = models.PositiveIntegerField(blank=True, null=True, help_text="Total redemptions allowed; empty for unlimited.")
+    max_uses_per_user = models.PositiveIntegerField(blank=True, null=True, help_text="Redemptions allowed per user; empty for unlimited.")
+    times_used = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -338,3 +532,203 @@ class CouponUsage(models.Model):
 
     def __str__(self):
         return f"Coupon {self.coupon.code} used by {self.user.username} on {self.used_at}"
+
+class CouponUserUsage(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='user_usages')
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    times_used = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'user'], name='unique_coupon_user_usage'),
+        ]
+
+    def __str__(self):
+        return f"Coupon {self.coupon.code} used {self.times_used} times by {self.user.username}"
+
+class VariantSnapshot(models.Model):
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='snapshots', db_index=False)
+    taken_at = models.DateTimeField()
+    stock_quantity = models.IntegerField(help_text="Stock according to the ledger, including rows up to taken_at.")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_variant', 'taken_at'], name='unique_variant_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['taken_at']),
+        ]
+
+    def __str__(self):
+        return f"Snapshot of {self.product_variant.name} at {self.taken_at}"
+
+class DailyStockMovement(models.Model):
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='daily_stock_movements', db_index=False)
+    day = models.DateField()
+    quantity_in = models.BigIntegerField(default=0)
+    quantity_out = models.BigIntegerField(default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_variant', 'day'], name='unique_daily_stock_movement'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    @property
+    def net_quantity(self):
+        return self.quantity_in - self.quantity_out
+
+    def __str__(self):
+        return f"Stock movement for {self.product_variant.name} on {self.day}"
+
+class DailyPriceChange(models.Model):
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='daily_price_changes', db_index=False)
+    day = models.DateField()
+    change_count = models.PositiveIntegerField(default=0)
+    opening_price = models.DecimalField(max_digits=10, decimal_places=2)
+    closing_price = models.DecimalField(max_digits=10, decimal_places=2)
+    low_price = models.DecimalField(max_digits=10, decimal_places=2)
+    high_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_variant', 'day'], name='unique_daily_price_change'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"Price changes for {self.product_variant.name} on {self.day}"
+
+class HistoryArchive(models.Model):
+    TABLE_CHOICES = [
+        ('inventorytransaction', 'Inventory transactions'),
+        ('pricehistory', 'Price history'),
+        ('discounthistory', 'Discount history'),
+    ]
+    table = models.CharField(max_length=30, choices=TABLE_CHOICES)
+    day = models.DateField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    row_count = models.PositiveIntegerField()
+    payload = models.BinaryField(help_text="zlib-compressed JSON: {'fields': [...], 'rows': [[...], ...]}.")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'day']),
+        ]
+
+    def source_model(self):
+        return self._meta.apps.get_model('inventory', self.table)
+
+    def rows(self):
+        """
+        Decompress the archived rows as dicts keyed by attname, with their original Python types.
+        """
+        data = json.loads(zlib.decompress(bytes(self.payload)))
+        fields = [self.source_model()._meta.get_field(name) for name in data['fields']]
+        columns = [(field.attname, field.to_python) for field in fields]
+        return [
+            {attname: to_python(value) for (attname, to_python), value in zip(columns, row)}
+            for row in data['rows']
+        ]
+
+    def __str__(self):
+        return f"{self.get_table_display()} archived for {self.day} ({self.row_count} rows)"
+
+class ArchiveWatermark(models.Model):
+    table = models.CharField(max_length=30, primary_key=True, choices=HistoryArchive.TABLE_CHOICES)
+    archived_before = models.DateTimeField(help_text="Rows older than this have been rolled up and moved to HistoryArchive.")
+
+    def __str__(self):
+        return f"{self.get_table_display()} archived before {self.archived_before}"
+
+class ReorderPoint(models.Model):
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='reorder_points', blank=True, null=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='reorder_points', blank=True, null=True, help_text="Applies to every variant in the category without its own reorder point.")
+    threshold = models.PositiveIntegerField(help_text="Alert once stock falls to this level or below.")
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(product_variant__isnull=False, category__isnull=True) | models.Q(product_variant__isnull=True, category__isnull=False),
+                name='reorder_point_variant_or_category',
+            ),
+            models.UniqueConstraint(fields=['product_variant'], condition=models.Q(product_variant__isnull=False), name='unique_variant_reorder_point'),
+            models.UniqueConstraint(fields=['category'], condition=models.Q(category__isnull=False), name='unique_category_reorder_point'),
+        ]
+
+    def clean(self):
+        if bool(self.product_variant_id) == bool(self.category_id):
+            raise ValidationError("Set either a product variant or a category.")
+
+    def __str__(self):
+        target = self.product_variant.name if self.product_variant_id else self.category.name
+        return f"Reorder {target} at {self.threshold}"
+
+class StockAlert(models.Model):
+    product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='stock_alerts')
+    threshold = models.PositiveIntegerField()
+    stock_quantity = models.IntegerField(help_text="Stock when the alert was raised.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+    resolved_at = models.DateTimeField(blank=True, null=True, help_text="When stock rose back above the threshold.")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # At most one open alert per variant, however often it dips.
+            models.UniqueConstraint(fields=['product_variant'], condition=models.Q(resolved_at__isnull=True), name='unique_open_stock_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['delivered_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Low stock for {self.product_variant.name}: {self.stock_quantity} (threshold {self.threshold})"
+
+class Job(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=255, blank=True, null=True, help_text="Only one pending job may exist per key.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()
+    claimed_by = models.CharField(max_length=64, blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['idempotency_key'],
+                condition=models.Q(status='pending', idempotency_key__isnull=False),
+                name='unique_pending_job_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id']),
+            models.Index(fields=['claimed_by']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} job #{self.pk} ({self.status})"
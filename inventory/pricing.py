@@ -0,0 +1,221 @@
+# inventory/pricing.py
+from bisect import bisect_right
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .jobs import enqueue_ids, job, payload_ids
+from .models import Coupon, Discount, EffectivePrice, ProductVariant
+
+PRICE_QUANTUM = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+
+def apply_offer(price, offer_type, value):
+    """
+    Return ``price`` after a fixed or percent offer, never below zero.
+    """
+    if offer_type == 'percent':
+        discounted = price * (HUNDRED - value) / HUNDRED
+    else:
+        discounted = price - value
+    return max(discounted, Decimal('0')).quantize(PRICE_QUANTUM)
+
+
+def offer_window_open(start, end, at):
+    """
+    Whether an offer window covers ``at``: from ``start`` up to, but not including, ``end``.
+
+    Discounts and coupons share the rule, in coupon checks and effective prices alike.
+    """
+    return start <= at < end
+
+
+def coupon_applies(coupon_product_ids, product_id):
+    """
+    Whether a coupon linked to ``coupon_product_ids`` applies to ``product_id``.
+
+    A coupon only applies to the products linked to it. One linked to no
+    products is order-level: it is checked and redeemed without a product and
+    never changes a product's price.
+    """
+    return product_id in coupon_product_ids
+
+
+class DiscountWindowIndex:
+    """
+    Per-variant interval index of offer windows, sorted by start.
+
+    A window is ``(start, end, offer_type, value)`` and is active for
+    ``start <= at < end``. Lookups bisect on the start times, so only windows
+    that have already started are scanned.
+    """
+
+    def __init__(self, windows=()):
+        self._windows = {}
+        for key, start, end, offer_type, value in windows:
+            self._windows.setdefault(key, []).append((start, end, offer_type, value))
+        self._starts = {}
+        for key, items in self._windows.items():
+            items.sort(key=lambda window: window[0])
+            self._starts[key] = [window[0] for window in items]
+
+    def active(self, key, at):
+        items = self._windows.get(key)
+        if not items:
+            return []
+        started = bisect_right(self._starts[key], at)
+        return [window for window in items[:started] if offer_window_open(window[0], window[1], at)]
+
+    def next_boundary(self, key, at):
+        """
+        Return the first time after ``at`` when the active set for ``key`` changes.
+        """
+        items = self._windows.get(key)
+        if not items:
+            return None
+        started = bisect_right(self._starts[key], at)
+        boundaries = [window[1] for window in items[:started] if window[1] > at]
+        if started < len(items):
+            boundaries.append(items[started][0])
+        return min(boundaries) if boundaries else None
+
+
+def load_indexes(variant_products, at):
+    """
+    Build discount and coupon indexes for the given ``{variant_id: product_id}`` map.
+
+    Only windows that have not ended by ``at`` are loaded: one query for
+    discounts and one for coupon/product links. Coupons are keyed by the
+    products linked to them, which is coupon_applies() as a join.
+    """
+    discounts = DiscountWindowIndex(
+        Discount.objects.filter(product_variant_id__in=list(variant_products), end_date__gt=at)
+        .values_list('product_variant_id', 'start_date', 'end_date', 'discount_type', 'discount_value')
+    )
+    coupons = DiscountWindowIndex(
+        Coupon.products.through.objects.filter(
+            product_id__in=set(variant_products.values()),
+            coupon__active=True,
+            coupon__valid_to__gt=at,
+        ).values_list(
+            'product_id', 'coupon__valid_from', 'coupon__valid_to',
+            'coupon__discount_type', 'coupon__discount_value',
+        )
+    )
+    return discounts, coupons
+
+
+def price_details(variant_ids, at=None):
+    """
+    Return ``{variant_id: (base_price, effective_price, valid_until)}``.
+
+    Offers do not stack: the lowest price from any single active Discount on
+    the variant or active Coupon on its product wins. ``valid_until`` is the
+    next time an offer starts or ends, or None. Runs three queries however
+    many variants are asked for.
+    """
+    at = at or timezone.now()
+    variants = {
+        pk: (product_id, price)
+        for pk, product_id, price in ProductVariant.objects.filter(pk__in=list(variant_ids)).values_list('pk', 'product_id', 'price')
+    }
+    discounts, coupons = load_indexes({pk: product_id for pk, (product_id, _) in variants.items()}, at)
+    details = {}
+    for pk, (product_id, base_price) in variants.items():
+        offers = discounts.active(pk, at) + coupons.active(product_id, at)
+        price = min(
+            [apply_offer(base_price, offer_type, value) for _, _, offer_type, value in offers],
+            default=base_price,
+        )
+        boundaries = [
+            boundary for boundary in (discounts.next_boundary(pk, at), coupons.next_boundary(product_id, at))
+            if boundary is not None
+        ]
+        details[pk] = (base_price, price, min(boundaries) if boundaries else None)
+    return details
+
+
+def effective_prices(variant_ids, at=None):
+    """
+    Compute ``{variant_id: effective_price}`` at ``at`` (default now) in one batch.
+    """
+    return {pk: price for pk, (_, price, _) in price_details(variant_ids, at).items()}
+
+
+def refresh_effective_prices(variant_ids):
+    """
+    Recompute the materialized EffectivePrice rows for ``variant_ids``.
+
+    Returns ``{variant_id: effective_price}`` for the variants that still exist.
+    """
+    variant_ids = list(variant_ids)
+    if not variant_ids:
+        return {}
+    now = timezone.now()
+    details = price_details(variant_ids, now)
+    EffectivePrice.objects.bulk_create(
+        [
+            EffectivePrice(
+                product_variant_id=pk, base_price=base_price, price=price,
+                valid_until=valid_until, computed_at=now,
+            )
+            for pk, (base_price, price, valid_until) in details.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['product_variant'],
+        update_fields=['base_price', 'price', 'valid_until', 'computed_at'],
+    )
+    return {pk: price for pk, (_, price, _) in details.items()}
+
+
+def _materialized_prices(variant_ids):
+    return EffectivePrice.objects.filter(product_variant_id__in=variant_ids).values_list(
+        'product_variant_id', 'price', 'valid_until'
+    )
+
+
+def _current(rows, now):
+    return {pk: price for pk, price, valid_until in rows if valid_until is None or valid_until > now}
+
+
+def current_effective_prices(variant_ids):
+    """
+    Read effective prices from the materialized table, refreshing missing or expired rows.
+
+    A warm read for a listing page is a single indexed query.
+    """
+    variant_ids = set(variant_ids)
+    prices = _current(_materialized_prices(variant_ids), timezone.now())
+    stale = variant_ids - prices.keys()
+    if stale:
+        prices.update(refresh_effective_prices(stale))
+    return prices
+
+
+async def acurrent_effective_prices(variant_ids):
+    """
+    Async current_effective_prices().
+    """
+    variant_ids = set(variant_ids)
+    prices = _current([row async for row in _materialized_prices(variant_ids)], timezone.now())
+    stale = variant_ids - prices.keys()
+    if stale:
+        prices.update(await sync_to_async(refresh_effective_prices)(stale))
+    return prices
+
+
+@job('pricing.refresh', batch_size=500, inline=True)
+def refresh_job(payloads):
+    refresh_effective_prices(payload_ids(payloads))
+
+
+def schedule_refresh(variant_ids):
+    """
+    Refresh variants once the current transaction commits.
+
+    Runs inline by default, since listings read the materialized prices;
+    changes made in the same transaction are coalesced into one refresh.
+    """
+    enqueue_ids('pricing.refresh', variant_ids)
@@ -0,0 +1,77 @@
+# inventory/repricing.py
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, Value, When
+from django.utils import timezone
+
+from .models import PriceHistory, ProductVariant
+from .pricing import schedule_refresh
+from .rollups import refresh_price_ranges
+
+PRICE_QUANTUM = Decimal('0.01')
+
+
+def parse_price(value):
+    """
+    Convert a raw price to a two-place Decimal, rejecting negatives and junk.
+    """
+    try:
+        price = Decimal(str(value).strip()).quantize(PRICE_QUANTUM)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid price: {value!r}")
+    if price < 0:
+        raise ValueError(f"Invalid price: {value!r}")
+    return price
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_reprice(rows, chunk_size=1000):
+    """
+    Apply ``(sku, new_price)`` pairs with set-based UPDATEs and bulk PriceHistory inserts.
+
+    ``rows`` may be any iterable, including a generator over a file; it is
+    consumed ``chunk_size`` rows at a time, so memory stays flat. Each chunk
+    runs in its own transaction: one SELECT of the current prices, one CASE
+    UPDATE for the variants whose price changed, one bulk INSERT of their
+    history and a refresh of their products' price ranges. No model signals
+    are sent. Returns counts of updated, unchanged and missing SKUs.
+    """
+    stats = {'updated': 0, 'unchanged': 0, 'missing': 0}
+    for chunk in chunked(rows, chunk_size):
+        # A SKU repeated in one chunk takes its last price.
+        prices = {sku: parse_price(price) for sku, price in chunk}
+        with transaction.atomic():
+            current = ProductVariant.objects.select_for_update().filter(sku__in=list(prices)).values_list('pk', 'sku', 'price')
+            changed = []
+            for pk, sku, old_price in current:
+                if old_price != prices[sku]:
+                    changed.append((pk, old_price, prices[sku]))
+            stats['missing'] += len(prices) - len(current)
+            stats['unchanged'] += len(current) - len(changed)
+            if not changed:
+                continue
+            ProductVariant.objects.filter(pk__in=[pk for pk, _, _ in changed]).update(
+                price=Case(
+                    *[When(pk=pk, then=Value(new_price)) for pk, _, new_price in changed],
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+                updated_at=timezone.now(),
+            )
+            PriceHistory.objects.bulk_create([
+                PriceHistory(product_variant_id=pk, old_price=old_price, new_price=new_price)
+                for pk, old_price, new_price in changed
+            ])
+            refresh_price_ranges(variant_ids=[pk for pk, _, _ in changed])
+            schedule_refresh([pk for pk, _, _ in changed])
+            stats['updated'] += len(changed)
+    return stats
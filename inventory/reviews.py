@@ -0,0 +1,118 @@
+# inventory/reviews.py
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Product, ProductReview, ProductReviewStats
+from .repricing import chunked
+
+RATINGS = range(1, 6)
+COUNTER_FIELDS = ('review_count', 'rating_sum', 'verified_count') + tuple(f'rating_{rating}' for rating in RATINGS)
+
+
+def apply_review_delta(product_id, rating, is_verified, sign):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) one review from a product's stats with one UPDATE.
+
+    The first review of a product has no stats row yet; it is built from the
+    reviews table instead. A removal without a stats row does nothing: the
+    row is either not built yet or being deleted along with its product.
+    """
+    updates = {
+        'review_count': F('review_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        f'rating_{rating}': F(f'rating_{rating}') + sign,
+        'updated_at': timezone.now(),
+    }
+    if is_verified:
+        updates['verified_count'] = F('verified_count') + sign
+    if not ProductReviewStats.objects.filter(product_id=product_id).update(**updates) and sign > 0:
+        recompute_review_stats([product_id])
+
+
+def aggregate_review_stats(product_ids):
+    """
+    Count reviews per product straight from the reviews table.
+    """
+    aggregates = {
+        'review_count': Count('pk'),
+        'rating_sum': Sum('rating'),
+        'verified_count': Count('pk', filter=Q(is_verified=True)),
+    }
+    for rating in RATINGS:
+        aggregates[f'rating_{rating}'] = Count('pk', filter=Q(rating=rating))
+    rows = (
+        ProductReview.objects.filter(product_id__in=product_ids)
+        .values('product_id')
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row.pop('product_id'): row for row in rows}
+
+
+def recompute_review_stats(product_ids=None, batch_size=1000):
+    """
+    Rebuild stats rows from the reviews table, for the given products or all of them.
+
+    Works through products in primary key batches, one aggregate query and
+    one upsert per batch. Returns the number of products processed.
+    """
+    if product_ids is None:
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    processed = 0
+    for batch in chunked(product_ids, batch_size):
+        stats = aggregate_review_stats(batch)
+        now = timezone.now()
+        rows = [
+            ProductReviewStats(
+                product_id=product_id,
+                updated_at=now,
+                **{field: (stats.get(product_id) or {}).get(field) or 0 for field in COUNTER_FIELDS},
+            )
+            for product_id in batch
+        ]
+        with transaction.atomic():
+            existing = set(Product.objects.filter(pk__in=batch).values_list('pk', flat=True))
+            ProductReviewStats.objects.bulk_create(
+                [row for row in rows if row.product_id in existing],
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=list(COUNTER_FIELDS) + ['updated_at'],
+            )
+        processed += len(batch)
+    return processed
+
+
+def _stats_by_product(product_ids, rows):
+    rows = {row['product_id']: row for row in rows}
+    result = {}
+    for product_id in product_ids:
+        row = rows.get(product_id) or dict.fromkeys(COUNTER_FIELDS, 0)
+        result[product_id] = {
+            'count': row['review_count'],
+            'average': round(row['rating_sum'] / row['review_count'], 2) if row['review_count'] else None,
+            'verified': row['verified_count'],
+            'histogram': {rating: row[f'rating_{rating}'] for rating in RATINGS},
+        }
+    return result
+
+
+def review_stats_for(product_ids):
+    """
+    Return ``{product_id: stats}`` for a listing page in one query.
+
+    Each stats dict has ``count``, ``average``, ``verified`` and a 1-5
+    ``histogram``; products without reviews get zeros.
+    """
+    product_ids = list(product_ids)
+    rows = ProductReviewStats.objects.filter(product_id__in=product_ids).values('product_id', *COUNTER_FIELDS)
+    return _stats_by_product(product_ids, rows)
+
+
+async def areview_stats_for(product_ids):
+    """
+    Async review_stats_for().
+    """
+    product_ids = list(product_ids)
+    rows = ProductReviewStats.objects.filter(product_id__in=product_ids).values('product_id', *COUNTER_FIELDS)
+    return _stats_by_product(product_ids, [row async for row in rows])
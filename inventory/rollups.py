@@ -0,0 +1,101 @@
+# inventory/rollups.py
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductVariant
+
+RECOMPUTE_BATCH_SIZE = 1000
+
+
+def _per_product(queryset, aggregate):
+    return Subquery(
+        queryset.filter(product=OuterRef('pk')).order_by().values('product').annotate(value=aggregate).values('value')
+    )
+
+
+def apply_stock_deltas(deltas):
+    """
+    Add variant stock deltas (``{variant_id: delta}``) to their products in one UPDATE.
+
+    Called from the stock_changed signal, so it runs in the same transaction
+    as the variant update. Products are moved by their own delta with F(),
+    which keeps concurrent ledger writes from overwriting each other.
+    """
+    deltas = {variant_id: delta for variant_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    moved = ProductVariant.objects.filter(pk__in=list(deltas))
+    delta = Case(
+        *[When(pk=variant_id, then=Value(amount)) for variant_id, amount in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    Product.objects.filter(pk__in=moved.values('product_id')).update(
+        stock_quantity=F('stock_quantity') + _per_product(moved, Sum(delta))
+    )
+
+
+def add_product_stock(deltas):
+    """
+    Add ``{product_id: delta}`` to product stock in one UPDATE.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Product.objects.filter(pk__in=list(deltas)).update(
+        stock_quantity=F('stock_quantity') + Case(
+            *[When(pk=product_id, then=Value(amount)) for product_id, amount in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def price_range_expressions():
+    variants = ProductVariant.objects.all()
+    return {'min_price': _per_product(variants, Min('price')), 'max_price': _per_product(variants, Max('price'))}
+
+
+def refresh_price_ranges(product_ids=None, variant_ids=None):
+    """
+    Recompute min_price and max_price of the given products, or of the products owning ``variant_ids``.
+
+    The product rows are locked first so the aggregate sees every price
+    change committed before it.
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    if variant_ids is not None:
+        products = products.filter(pk__in=ProductVariant.objects.filter(pk__in=list(variant_ids)).values('product_id'))
+    with transaction.atomic():
+        locked = list(products.select_for_update().order_by('pk').values_list('pk', flat=True))
+        if locked:
+            Product.objects.filter(pk__in=locked).update(**price_range_expressions())
+
+
+def recompute_product_rollups(product_ids=None, batch_size=RECOMPUTE_BATCH_SIZE):
+    """
+    Rebuild stock_quantity, min_price and max_price from the variants table.
+
+    For repairs and backfills. Works through products in primary key batches,
+    each batch locked and set with one UPDATE. Returns the number of
+    products processed.
+    """
+    products = Product.objects.order_by('pk')
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    variants = ProductVariant.objects.all()
+    last_pk, processed = 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(products.select_for_update().filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return processed
+            Product.objects.filter(pk__in=batch).update(
+                stock_quantity=Coalesce(_per_product(variants, Sum('stock_quantity')), 0),
+                **price_range_expressions(),
+            )
+        last_pk = batch[-1]
+        processed += len(batch)
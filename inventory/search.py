@@ -0,0 +1,298 @@
+# inventory/search.py
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import connection, connections, router
+from django.db.models.expressions import RawSQL
+
+from .jobs import enqueue_ids, job, payload_ids
+from .models import Product, ProductVariant
+from .repricing import chunked
+
+SEARCH_TABLE = 'inventory_product_search'
+INDEX_BATCH_SIZE = 500
+# Upper bounds of the price facet buckets; the last bucket is open-ended.
+PRICE_BUCKETS = (25, 50, 100, 250, 500, 1000)
+# Column weights: name, sku, variant names, description.
+SQLITE_WEIGHTS = (10.0, 8.0, 4.0, 1.0)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Set once the index is known to hold rows; an index is never emptied again
+# outside rebuild_search_index(), so the probe runs until the first hit only.
+_index_built = False
+
+SearchResults = namedtuple('SearchResults', ['hits', 'total', 'facets'])
+SearchHit = namedtuple('SearchHit', ['product_id', 'score', 'min_price'])
+
+
+def search_backend():
+    """
+    Return 'sqlite' or 'postgresql' when the database has a full-text index, else None.
+    """
+    if connection.vendor in ('sqlite', 'postgresql'):
+        return connection.vendor
+    return None
+
+
+def read_connection():
+    """
+    The connection catalog reads are routed to; the replica when there is one.
+    """
+    return connections[router.db_for_read(Product)]
+
+
+def create_search_index(using='default', **kwargs):
+    """
+    Create the search table if it does not exist; connected to post_migrate.
+    """
+    conn = connections[using]
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                "name, sku, variants, description, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                "product_id bigint PRIMARY KEY REFERENCES inventory_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)")
+
+
+def index_products(product_ids):
+    """
+    Rebuild the index entries of ``product_ids``; products that no longer exist are removed.
+    """
+    global _index_built
+    backend = search_backend()
+    if backend is None:
+        return
+    for batch in chunked(set(product_ids), INDEX_BATCH_SIZE):
+        products = {
+            row[0]: row
+            for row in Product.objects.filter(pk__in=batch).values_list('pk', 'name', 'sku', 'description')
+        }
+        variants = {}
+        for product_id, name, sku in ProductVariant.objects.filter(product_id__in=batch).values_list('product_id', 'name', 'sku'):
+            variants.setdefault(product_id, []).extend((name, sku))
+        rows = [
+            (pk, name or '', sku or '', ' '.join(variants.get(pk, ())), description or '')
+            for pk, name, sku, description in products.values()
+        ]
+        with connection.cursor() as cursor:
+            if backend == 'sqlite':
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch)
+                cursor.executemany(
+                    f"INSERT INTO {SEARCH_TABLE} (rowid, name, sku, variants, description) VALUES (%s, %s, %s, %s, %s)",
+                    rows,
+                )
+            else:
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [list(batch)])
+                cursor.executemany(
+                    f"INSERT INTO {SEARCH_TABLE} (product_id, document) VALUES (%s, "
+                    "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                    "setweight(to_tsvector('simple', %s), 'C') || setweight(to_tsvector('simple', %s), 'D'))",
+                    rows,
+                )
+        if rows:
+            _index_built = True
+
+
+def rebuild_search_index(batch_size=INDEX_BATCH_SIZE):
+    """
+    Drop every index entry and re-index all products; returns the number indexed.
+    """
+    global _index_built
+    if search_backend() is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    _index_built = False
+    indexed = 0
+    for batch in chunked(Product.objects.order_by('pk').values_list('pk', flat=True).iterator(), batch_size):
+        index_products(batch)
+        indexed += len(batch)
+    return indexed
+
+
+@job('search.index', batch_size=INDEX_BATCH_SIZE)
+def index_job(payloads):
+    index_products(payload_ids(payloads))
+
+
+def schedule_index(product_ids):
+    """
+    Queue products for re-indexing; each product is pending at most once.
+    """
+    enqueue_ids('search.index', product_ids)
+
+
+def query_tokens(text):
+    return TOKEN_PATTERN.findall(text or '')
+
+
+def match_expression(text, prefix=True, column=None):
+    """
+    Turn user input into a backend query: every word must match, the last one as a prefix.
+
+    Returns None if the input has no searchable words.
+    """
+    tokens = query_tokens(text)
+    if not tokens:
+        return None
+    if search_backend() == 'sqlite':
+        terms = [f'"{token}"' for token in tokens]
+        if prefix:
+            terms[-1] += '*'
+        expression = ' '.join(terms)
+        return f'{column} : ({expression})' if column else expression
+    # Product names carry weight A in the tsvector.
+    weight = 'A' if column == 'name' else ''
+    terms = [f'{token.lower()}:{weight}' if weight else token.lower() for token in tokens]
+    if prefix:
+        terms[-1] = f'{tokens[-1].lower()}:*{weight}'
+    return ' & '.join(terms)
+
+
+def _match_clause():
+    """
+    Return (FROM/WHERE fragment, score expression) for the current backend.
+    """
+    if search_backend() == 'sqlite':
+        weights = ', '.join(map(str, SQLITE_WEIGHTS))
+        return (
+            f"{SEARCH_TABLE} s JOIN inventory_product p ON p.id = s.rowid WHERE {SEARCH_TABLE} MATCH %s",
+            f"-bm25({SEARCH_TABLE}, {weights})",
+        )
+    return (
+        f"{SEARCH_TABLE} s JOIN inventory_product p ON p.id = s.product_id "
+        "WHERE s.document @@ to_tsquery('simple', %s)",
+        "ts_rank_cd(s.document, to_tsquery('simple', %s))",
+    )
+
+
+def index_is_empty():
+    """
+    True until rebuild_search_index() or the first index job has written a row.
+
+    Probes the connection searches are read from; once a row has been seen
+    the answer is cached for the life of the process.
+    """
+    global _index_built
+    if not _index_built:
+        with read_connection().cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM {SEARCH_TABLE} LIMIT 1")
+            _index_built = cursor.fetchone() is not None
+    return not _index_built
+
+
+def matching_products(text):
+    """
+    Return a subquery of product ids matching ``text``, for ``pk__in`` filters.
+
+    None if unusable: no full-text backend, no search terms, or an index that
+    has not been built yet, which would match nothing.
+    """
+    expression = match_expression(text)
+    if search_backend() is None or expression is None or index_is_empty():
+        return None
+    column = 'rowid' if search_backend() == 'sqlite' else 'product_id'
+    where = f"{SEARCH_TABLE} MATCH %s" if search_backend() == 'sqlite' else "document @@ to_tsquery('simple', %s)"
+    return RawSQL(f"SELECT {column} FROM {SEARCH_TABLE} WHERE {where}", [expression])
+
+
+def price_bucket_expression():
+    cases = ' '.join(
+        f"WHEN min_price < {upper} THEN {index}" for index, upper in enumerate(PRICE_BUCKETS)
+    )
+    return f"CASE WHEN min_price IS NULL THEN NULL {cases} ELSE {len(PRICE_BUCKETS)} END"
+
+
+def price_bucket_label(index):
+    lower = PRICE_BUCKETS[index - 1] if index else 0
+    upper = PRICE_BUCKETS[index] if index < len(PRICE_BUCKETS) else None
+    return {'min': lower, 'max': upper}
+
+
+def search_products(text, category_id=None, subcategory_id=None, min_price=None, max_price=None, limit=20, offset=0):
+    """
+    Ranked full-text search with category, subcategory and price-range facets.
+
+    Hits, the total and all facet counts come back from one query. Facets
+    count the filtered match set; prices are each product's cheapest variant.
+    """
+    expression = match_expression(text)
+    if search_backend() is None or expression is None:
+        return SearchResults([], 0, {'category': {}, 'subcategory': {}, 'price': []})
+
+    source, score = _match_clause()
+    params = [expression] if search_backend() == 'sqlite' else [expression, expression]
+    filters, filter_params = [], []
+    for condition, value in (
+        ('category_id = %s', category_id),
+        ('subcategory_id = %s', subcategory_id),
+        ('min_price >= %s', min_price),
+        ('min_price <= %s', max_price),
+    ):
+        if value is not None:
+            filters.append(condition)
+            filter_params.append(value)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ''
+
+    sql = f"""
+        WITH hits AS (
+            SELECT p.id, p.category_id, p.subcategory_id, {score} AS score, p.min_price
+            FROM {source}
+        ),
+        filtered AS (SELECT * FROM hits {where})
+        SELECT * FROM (
+            SELECT 'hit' AS kind, id AS value, score, min_price FROM filtered
+            ORDER BY score DESC, id LIMIT %s OFFSET %s
+        ) page
+        UNION ALL SELECT 'category', category_id, COUNT(*), NULL FROM filtered GROUP BY category_id
+        UNION ALL SELECT 'subcategory', subcategory_id, COUNT(*), NULL FROM filtered WHERE subcategory_id IS NOT NULL GROUP BY subcategory_id
+        UNION ALL SELECT 'price', bucket, COUNT(*), NULL FROM (
+            SELECT {price_bucket_expression()} AS bucket FROM filtered
+        ) buckets WHERE bucket IS NOT NULL GROUP BY bucket
+        UNION ALL SELECT 'total', NULL, COUNT(*), NULL FROM filtered
+    """
+    with read_connection().cursor() as cursor:
+        cursor.execute(sql, params + filter_params + [limit, offset])
+        rows = cursor.fetchall()
+
+    hits, total = [], 0
+    facets = {'category': {}, 'subcategory': {}, 'price': []}
+    for kind, value, amount, min_price in rows:
+        if kind == 'hit':
+            hits.append(SearchHit(value, float(amount), Decimal(str(min_price)) if min_price is not None else None))
+        elif kind == 'total':
+            total = int(amount)
+        elif kind == 'price':
+            facets['price'].append(dict(price_bucket_label(int(value)), count=int(amount)))
+        else:
+            facets[kind][value] = int(amount)
+    facets['price'].sort(key=lambda bucket: bucket['min'])
+    return SearchResults(hits, total, facets)
+
+
+def suggest(text, limit=10):
+    """
+    Typeahead: product names whose name matches every word, the last one as a prefix.
+    """
+    expression = match_expression(text, column='name')
+    if expression is None or search_backend() is None:
+        return []
+    source, score = _match_clause()
+    params = [expression] if search_backend() == 'sqlite' else [expression, expression]
+    with read_connection().cursor() as cursor:
+        cursor.execute(
+            f"SELECT p.name, p.slug FROM {source} ORDER BY {score} DESC, p.id LIMIT %s",
+            params + [limit],
+        )
+        return [{'name': name, 'slug': slug} for name, slug in cursor.fetchall()]
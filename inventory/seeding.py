@@ -0,0 +1,196 @@
+# inventory/seeding.py
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog_cache
+from .ledger import apply_many
+from .models import Category, CategoryNode, Coupon, Discount, Product, ProductReview, ProductVariant, Subcategory
+from .pricing import refresh_effective_prices
+from .repricing import PRICE_QUANTUM, chunked
+from .reviews import recompute_review_stats
+from .rollups import recompute_product_rollups
+from .search import index_products
+from .taxonomy import create_missing_nodes, file_products
+
+DEFAULT_PREFIX = 'bench'
+# Variants per apply_many call; keeps the guarded UPDATE within SQLite's expression depth limit.
+LEDGER_CHUNK_SIZE = 200
+
+ADJECTIVES = ('Classic', 'Eco', 'Pro', 'Ultra', 'Compact', 'Deluxe', 'Smart', 'Travel', 'Vintage', 'Sport', 'Urban', 'Organic')
+NOUNS = ('Backpack', 'Lamp', 'Kettle', 'Jacket', 'Speaker', 'Mug', 'Chair', 'Watch', 'Blender', 'Notebook', 'Headphones', 'Sneakers')
+COLOURS = ('Red', 'Blue', 'Black', 'White', 'Green', 'Grey', 'Navy', 'Sand')
+SIZES = ('XS', 'S', 'M', 'L', 'XL', 'XXL')
+# Ratings skew positive, as they do on real storefronts.
+RATING_WEIGHTS = (1, 1, 3, 8, 12)
+
+
+def seed_prefix_filters(prefix):
+    return {
+        'categories': Category.objects.filter(slug__startswith=f'{prefix}-'),
+        'coupons': Coupon.objects.filter(code__startswith=f'{prefix.upper()}-'),
+        'users': get_user_model().objects.filter(username__startswith=f'{prefix}-'),
+    }
+
+
+def clear_seed(prefix=DEFAULT_PREFIX):
+    """
+    Delete everything a previous seed_catalog run with ``prefix`` created.
+    """
+    with transaction.atomic():
+        # Subcategory nodes first: a node cannot be deleted while it has children.
+        CategoryNode.objects.filter(subcategory__category__slug__startswith=f'{prefix}-').delete()
+        CategoryNode.objects.filter(category__slug__startswith=f'{prefix}-').delete()
+        for queryset in seed_prefix_filters(prefix).values():
+            queryset.delete()
+    catalog_cache.invalidate_catalog()
+
+
+def random_price(rng, low=5, high=500):
+    return Decimal(str(rng.uniform(low, high))).quantize(PRICE_QUANTUM)
+
+
+def seed_catalog(products=1000, variants_per=3, reviews=2, categories=10, subcategories_per=5,
+                 discount_ratio=0.2, coupons=20, transactions_per=3, seed=0, batch_size=1000, prefix=DEFAULT_PREFIX):
+    """
+    Bulk-create a synthetic catalog; the same arguments always produce the same data.
+
+    Rows are named after ``prefix`` so runs can be told apart and cleared.
+    Stock goes through the ledger, so variant and product stock reconcile;
+    categories get their tree nodes and products are filed under them;
+    review stats, price ranges, effective prices and the search index are
+    built at the end. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    counts = dict.fromkeys(
+        ('category', 'subcategory', 'product', 'variant', 'discount', 'coupon', 'transaction', 'review'), 0
+    )
+    if Category.objects.filter(slug__startswith=f'{prefix}-').exists():
+        raise ValueError(f"The catalog already has {prefix!r} data; clear it first.")
+
+    with transaction.atomic():
+        category_rows = Category.objects.bulk_create([
+            Category(
+                name=f"{NOUNS[index % len(NOUNS)]}s {index}",
+                slug=f'{prefix}-category-{index}',
+                thumbnail=f'category_thumbnails/{prefix}-{index}.png',
+            )
+            for index in range(categories)
+        ])
+        subcategory_rows = Subcategory.objects.bulk_create([
+            Subcategory(
+                category=category,
+                name=f"{ADJECTIVES[index % len(ADJECTIVES)]} {category.name}",
+                slug=f'{prefix}-subcategory-{category.pk}-{index}',
+            )
+            for category in category_rows
+            for index in range(subcategories_per)
+        ])
+        create_missing_nodes()
+        reviewers = get_user_model().objects.bulk_create([
+            get_user_model()(username=f'{prefix}-reviewer-{index}', password=make_password(None))
+            for index in range(reviews)
+        ])
+    counts['category'], counts['subcategory'] = len(category_rows), len(subcategory_rows)
+
+    product_ids, variant_ids = [], []
+    for offset in range(0, products, batch_size):
+        with transaction.atomic():
+            batch = []
+            for number in range(offset, min(offset + batch_size, products)):
+                subcategory = rng.choice(subcategory_rows) if subcategory_rows else None
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {number}"
+                batch.append(Product(
+                    name=name,
+                    slug=f'{prefix}-product-{number}',
+                    sku=f'{prefix.upper()}-P{number:08d}',
+                    description=f"{name} in {', '.join(rng.sample(COLOURS, 3))}. Seeded for benchmarks.",
+                    category=subcategory.category if subcategory else rng.choice(category_rows),
+                    subcategory=subcategory,
+                    tax=rng.choice((0, 5, 12, 18)),
+                ))
+            Product.objects.bulk_create(batch)
+            file_products([product.pk for product in batch])
+
+            variants = ProductVariant.objects.bulk_create([
+                ProductVariant(
+                    product=product,
+                    name=f"{rng.choice(COLOURS)} / {SIZES[index % len(SIZES)]}",
+                    sku=f'{product.sku}-V{index:02d}',
+                    price=random_price(rng),
+                )
+                for product in batch
+                for index in range(variants_per)
+            ])
+
+            for chunk in chunked(variants, LEDGER_CHUNK_SIZE):
+                entries = []
+                for variant in chunk:
+                    # Enough opening stock that the OUT movements can never fail.
+                    entries.append((variant.pk, 'IN', rng.randint(50, 200) + 5 * transactions_per, 'Seed stock'))
+                    entries.extend((variant.pk, 'OUT', rng.randint(1, 5), 'Seed sale') for _ in range(transactions_per - 1))
+                apply_many(entries)
+                counts['transaction'] += len(entries)
+
+            discounts = Discount.objects.bulk_create([
+                Discount(
+                    product_variant=variant,
+                    discount_type=rng.choice(('fixed', 'percent')),
+                    discount_value=Decimal(rng.randint(5, 30)),
+                    start_date=now - timedelta(days=rng.randint(0, 30)),
+                    end_date=now + timedelta(days=rng.randint(1, 60)),
+                )
+                for variant in variants
+                if rng.random() < discount_ratio
+            ])
+
+            review_rows = ProductReview.objects.bulk_create([
+                ProductReview(
+                    product=product,
+                    user=reviewer,
+                    rating=rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0],
+                    is_verified=rng.random() < 0.6,
+                    comment=f"{rng.choice(ADJECTIVES)} {product.name.split()[1].lower()}, would buy again.",
+                )
+                for product in batch
+                for reviewer in reviewers
+            ])
+
+        product_ids.extend(product.pk for product in batch)
+        variant_ids.extend(variant.pk for variant in variants)
+        counts['product'] += len(batch)
+        counts['variant'] += len(variants)
+        counts['discount'] += len(discounts)
+        counts['review'] += len(review_rows)
+
+    with transaction.atomic():
+        coupon_rows = Coupon.objects.bulk_create([
+            Coupon(
+                code=f'{prefix.upper()}-{index:04d}',
+                discount_type=rng.choice(('fixed', 'percent')),
+                discount_value=Decimal(rng.randint(5, 25)),
+                valid_from=now - timedelta(days=7),
+                valid_to=now + timedelta(days=rng.randint(7, 90)),
+            )
+            for index in range(coupons)
+        ])
+        Coupon.products.through.objects.bulk_create([
+            Coupon.products.through(coupon_id=coupon.pk, product_id=product_id)
+            for coupon in coupon_rows
+            for product_id in rng.sample(product_ids, min(len(product_ids), rng.randint(1, 20)))
+        ])
+    counts['coupon'] = len(coupon_rows)
+
+    recompute_review_stats(product_ids, batch_size=batch_size)
+    recompute_product_rollups(product_ids, batch_size=batch_size)
+    for chunk in chunked(variant_ids, batch_size):
+        refresh_effective_prices(chunk)
+    index_products(product_ids)
+    catalog_cache.invalidate_catalog()
+    return counts
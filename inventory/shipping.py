@@ -0,0 +1,137 @@
+# inventory/shipping.py
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+
+from .models import ProductShipping
+
+ZONES = ('local', 'regional', 'national')
+CACHE_SIZE = 4096
+# Bounds how long another process's edit can go unseen; local edits invalidate at once.
+CACHE_TTL = 300
+
+DAYS_PATTERN = re.compile(r'(\d+)\s*(?:-|to)?\s*(\d+)?\s*(?:business\s+)?(day|week|hour)?', re.IGNORECASE)
+UNIT_DAYS = {'day': 1, 'week': 7, 'hour': 1 / 24}
+
+ShippingRate = namedtuple('ShippingRate', ['local', 'regional', 'national', 'per_unit', 'days'])
+ShippingOption = namedtuple('ShippingOption', ['method', 'cost', 'days'])
+
+
+def parse_delivery_days(text):
+    """
+    Return the upper bound in days of an estimate like "3-5 business days", or None.
+    """
+    match = DAYS_PATTERN.search(text or '')
+    if match is None:
+        return None
+    upper = int(match.group(2) or match.group(1))
+    return upper * UNIT_DAYS[(match.group(3) or 'day').lower()]
+
+
+class ShippingTableCache:
+    """
+    Thread-safe LRU of per-product shipping tables: {product_id: {method: ShippingRate}}.
+    """
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables = OrderedDict()
+
+    def get_many(self, product_ids):
+        """
+        Return tables for ``product_ids``, loading every miss in a single query.
+        """
+        now = time.monotonic()
+        tables, missing = {}, []
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._tables.get(product_id)
+                if entry is None or entry[0] < now:
+                    missing.append(product_id)
+                else:
+                    self._tables.move_to_end(product_id)
+                    tables[product_id] = entry[1]
+        if missing:
+            loaded = load_tables(missing)
+            with self._lock:
+                for product_id, table in loaded.items():
+                    self._tables[product_id] = (now + self.ttl, table)
+                    self._tables.move_to_end(product_id)
+                while len(self._tables) > self.size:
+                    self._tables.popitem(last=False)
+            tables.update(loaded)
+        return tables
+
+    def invalidate(self, product_ids=None):
+        with self._lock:
+            if product_ids is None:
+                self._tables.clear()
+            for product_id in product_ids or ():
+                self._tables.pop(product_id, None)
+
+
+def load_tables(product_ids):
+    tables = {product_id: {} for product_id in product_ids}
+    rows = ProductShipping.objects.filter(product_id__in=product_ids).values_list(
+        'product_id', 'shipping_method', 'local_shipping_cost', 'regional_shipping_cost',
+        'national_shipping_cost', 'shipping_cost_multiply_quantity', 'estimated_delivery_time',
+    )
+    for product_id, method, local, regional, national, per_unit, estimate in rows:
+        tables[product_id][method] = ShippingRate(local, regional, national, per_unit, parse_delivery_days(estimate))
+    return tables
+
+
+_tables = ShippingTableCache()
+
+
+def invalidate_shipping(product_ids=None):
+    """
+    Drop cached shipping tables for ``product_ids``, or all of them.
+    """
+    _tables.invalidate(product_ids)
+
+
+def quote_shipping(cart, zone):
+    """
+    Quote every shipping method that can deliver the whole cart to ``zone``.
+
+    ``cart`` is an iterable of (product_id, quantity). A method is offered
+    only if every product supports it; per-unit rates are multiplied by the
+    quantity. Returns a dict with all ``options`` sorted by cost, plus the
+    ``cheapest`` and ``fastest`` of them (None when nothing fits).
+    """
+    if zone not in ZONES:
+        raise ValueError(f"Unknown shipping zone {zone!r}; expected one of {', '.join(ZONES)}.")
+    quantities = {}
+    for product_id, quantity in cart:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        return {'options': [], 'cheapest': None, 'fastest': None}
+
+    tables = _tables.get_many(quantities)
+    methods = None
+    for table in tables.values():
+        methods = set(table) if methods is None else methods & table.keys()
+    field = ShippingRate._fields.index(zone)
+
+    options = []
+    for method in methods:
+        cost, days = Decimal('0'), None
+        for product_id, quantity in quantities.items():
+            rate = tables[product_id][method]
+            cost += rate[field] * quantity if rate.per_unit else rate[field]
+            if rate.days is not None:
+                days = rate.days if days is None else max(days, rate.days)
+        options.append(ShippingOption(method, cost, days))
+
+    options.sort(key=lambda option: (option.cost, option.method))
+    timed = [option for option in options if option.days is not None]
+    return {
+        'options': options,
+        'cheapest': options[0] if options else None,
+        'fastest': min(timed, key=lambda option: (option.days, option.cost)) if timed else None,
+    }
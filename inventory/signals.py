@@ -1,73 +1,423 @@
 # inventory/signals.py
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from .models import Discount, DiscountHistory, PriceHistory, InventoryTransaction, ProductVariant
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
+from django.utils import timezone
+
+from core.instrumentation import receiver
+from . import catalog_cache
+from .alerts import schedule_alert_check
+from .coupons import adjust_usage_counters, invalidate_coupons
+from .images import schedule_renditions
+from .ledger import record_opening_balances, stock_changed
+from .models import (
+    Category, CategoryNode, Coupon, CouponUsage, Discount, DiscountHistory, PriceHistory, Product, ProductImage, ProductReview,
+    ProductShipping, ProductVariant, ReviewImage, Subcategory
+)
+from .pricing import schedule_refresh
+from .reviews import apply_review_delta
+from .rollups import add_product_stock, apply_stock_deltas, recompute_product_rollups, refresh_price_ranges
+from .search import schedule_index
+from .shipping import invalidate_shipping
+from .taxonomy import adjust_counts, ancestor_paths, sync_category_node, sync_subcategory_node
+from .tracking import prime_snapshots
+
+@receiver(pre_save, sender=CategoryNode)
+@receiver(pre_save, sender=Coupon)
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductReview)
+@receiver(pre_save, sender=ProductVariant)
+@receiver(pre_save, sender=Discount)
+def load_tracked_values(sender, instance, **kwargs):
+    """
+    Signal to fetch the stored values of an instance that was not loaded from the database.
+    Instances loaded through the ORM already carry them, so this costs no query.
+    """
+    if instance.pk is not None and not instance.has_snapshot():
+        prime_snapshots([instance])
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=CategoryNode)
+@receiver(post_save, sender=Coupon)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_save, sender=ReviewImage)
+@receiver(post_save, sender=Discount)
+def store_saved_changes(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to move the pending tracked changes into instance.saved_changes.
+    Registered before the other post_save receivers, which read saved_changes.
+    """
+    instance.pop_changes(update_fields)
 
 @receiver(post_save, sender=Discount)
 def create_discount_history(sender, instance, created, **kwargs):
     """
     Signal to create a DiscountHistory entry whenever a Discount is created or updated.
     """
-    if not created:
+    changes = instance.saved_changes
+    if created:
         # Only log changes for updates
-        old_instance = Discount.objects.get(pk=instance.pk)
-        if (instance.discount_type != old_instance.discount_type or
-            instance.discount_value != old_instance.discount_value):
-            DiscountHistory.objects.create(
-                discount=instance,
-                old_discount_type=old_instance.discount_type,
-                old_discount_value=old_instance.discount_value,
-                new_discount_type=instance.discount_type,
-                new_discount_value=instance.discount_value
-            )
+        return
+    if changes:
+        old_type, new_type = changes.get('discount_type', (instance.discount_type, instance.discount_type))
+        old_value, new_value = changes.get('discount_value', (instance.discount_value, instance.discount_value))
+        DiscountHistory.objects.create(
+            discount=instance,
+            old_discount_type=old_type,
+            old_discount_value=old_value,
+            new_discount_type=new_type,
+            new_discount_value=new_value
+        )
 
 @receiver(post_save, sender=PriceHistory)
-def update_product_variant_price(sender, instance, **kwargs):
+def update_product_variant_price(sender, instance, created, **kwargs):
     """
     Signal to update the ProductVariant's price when a PriceHistory entry is created.
+    Uses a queryset update so the variant's post_save chain does not fire again.
     """
-    product_variant = instance.product_variant
-    # Update the product variant price to the new price
-    product_variant.price = instance.new_price
-    product_variant.save()
+    if not created:
+        return
+    if PriceHistory.product_variant.is_cached(instance):
+        product_variant = instance.product_variant
+        if product_variant.price == instance.new_price:
+            # Already applied, e.g. the entry was written by create_price_history
+            return
+        product_variant.price = instance.new_price
+        product_variant.take_snapshot(['price'])
+    updated = ProductVariant.objects.filter(pk=instance.product_variant_id).exclude(price=instance.new_price).update(
+        price=instance.new_price,
+        updated_at=timezone.now()
+    )
+    if updated:
+        refresh_price_ranges(variant_ids=[instance.product_variant_id])
+        schedule_refresh([instance.product_variant_id])
 
-@receiver(post_save, sender=InventoryTransaction)
-def update_inventory_on_transaction(sender, instance, **kwargs):
+@receiver(post_save, sender=ProductVariant)
+def create_price_history(sender, instance, created, **kwargs):
     """
-    Signal to update ProductVariant stock quantity based on InventoryTransaction.
+    Signal to create a PriceHistory entry whenever a ProductVariant's price is updated.
     """
-    product_variant = instance.product_variant
-    if instance.transaction_type == 'IN':
-        product_variant.stock_quantity += instance.quantity
-    elif instance.transaction_type == 'OUT':
-        product_variant.stock_quantity -= instance.quantity
-    product_variant.save()
+    changes = instance.saved_changes
+    if created:
+        # Do not create PriceHistory for newly created ProductVariants
+        return
 
-# Optional: Clean up associated objects if necessary (e.g., on delete of the parent object)
+    # Compare against the price the instance was loaded with
+    if 'price' in changes:
+        old_price, new_price = changes['price']
+        PriceHistory.objects.create(
+            product_variant=instance,
+            old_price=old_price,
+            new_price=new_price
+        )
+
+
+@receiver(post_save, sender=ProductVariant)
+def refresh_variant_effective_price(sender, instance, created, **kwargs):
+    """
+    Signal to refresh the materialized effective price when a variant is added or repriced.
+    """
+    if created or 'price' in instance.saved_changes:
+        schedule_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Discount)
 @receiver(post_delete, sender=Discount)
-def delete_discount_history(sender, instance, **kwargs):
+def refresh_discount_effective_price(sender, instance, **kwargs):
     """
-    Signal to delete related DiscountHistory entries when a Discount is deleted.
+    Signal to refresh the effective price of the variant a Discount belongs to.
     """
-    DiscountHistory.objects.filter(discount=instance).delete()
+    schedule_refresh([instance.product_variant_id])
+
+
+def coupon_variant_ids(coupon_id=None, product_ids=None):
+    queryset = ProductVariant.objects.all()
+    if coupon_id is not None:
+        queryset = queryset.filter(product__coupons=coupon_id)
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=product_ids)
+    return list(queryset.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Coupon)
+def refresh_coupon_effective_prices(sender, instance, created, **kwargs):
+    """
+    Signal to refresh the effective prices of every variant a Coupon applies to.
+    """
+    if not created:
+        schedule_refresh(coupon_variant_ids(coupon_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Coupon)
+def refresh_deleted_coupon_effective_prices(sender, instance, **kwargs):
+    """
+    Signal to refresh effective prices for a Coupon's variants before its product links go away.
+    """
+    schedule_refresh(coupon_variant_ids(coupon_id=instance.pk))
+
+
+@receiver(m2m_changed, sender=Coupon.products.through)
+def refresh_coupon_product_effective_prices(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal to refresh effective prices when products are linked to or unlinked from a Coupon.
+    """
+    if action in ('post_add', 'post_remove'):
+        if reverse:
+            # instance is a Product and pk_set holds coupons
+            schedule_refresh(coupon_variant_ids(product_ids=[instance.pk]))
+        else:
+            schedule_refresh(coupon_variant_ids(product_ids=pk_set))
+    elif action == 'pre_clear':
+        if reverse:
+            schedule_refresh(coupon_variant_ids(product_ids=[instance.pk]))
+        else:
+            schedule_refresh(coupon_variant_ids(coupon_id=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+def invalidate_catalog_taxonomy(sender, instance, **kwargs):
+    """
+    Signal to drop the cached tree and product lookups, which embed category names and slugs.
+    Runs after commit, so a concurrent reader cannot re-cache the old rows for the full timeout.
+    """
+    transaction.on_commit(catalog_cache.invalidate_catalog)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_product(sender, instance, **kwargs):
+    """
+    Signal to drop the cached tree and the lookups for this product's current and previous slug, after commit.
+    """
+    slugs = {instance.slug}
+    if 'slug' in getattr(instance, 'saved_changes', {}):
+        slugs.add(instance.saved_changes['slug'][0])
+
+    def invalidate():
+        catalog_cache.invalidate_tree()
+        catalog_cache.invalidate_products(slugs)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Category)
+def build_category_thumbnail_renditions(sender, instance, created, **kwargs):
+    """
+    Signal to queue resized renditions of a new or replaced Category thumbnail.
+    """
+    if created or 'thumbnail' in instance.saved_changes:
+        schedule_renditions(instance.thumbnail)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=ReviewImage)
+def build_image_renditions(sender, instance, created, **kwargs):
+    """
+    Signal to queue resized renditions of a new or replaced product or review image.
+    """
+    if created or 'image' in instance.saved_changes:
+        schedule_renditions(instance.image)
+
+
+@receiver(post_save, sender=ProductReview)
+def update_review_stats(sender, instance, created, **kwargs):
+    """
+    Signal to keep ProductReviewStats in step with a created or edited review.
+    """
+    if created:
+        apply_review_delta(instance.product_id, instance.rating, instance.is_verified, 1)
+        return
+    changes = instance.saved_changes
+    if changes:
+        old_product = changes.get('product', (instance.product_id,))[0]
+        old_rating = changes.get('rating', (instance.rating,))[0]
+        old_verified = changes.get('is_verified', (instance.is_verified,))[0]
+        apply_review_delta(old_product, old_rating, old_verified, -1)
+        apply_review_delta(instance.product_id, instance.rating, instance.is_verified, 1)
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_review_stats(sender, instance, **kwargs):
+    """
+    Signal to take a deleted review out of its product's ProductReviewStats.
+    """
+    apply_review_delta(instance.product_id, instance.rating, instance.is_verified, -1)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupon_descriptor(sender, instance, **kwargs):
+    """
+    Signal to drop the cached descriptor for a Coupon's current and previous code, after commit.
+    """
+    codes = {instance.code}
+    if 'code' in getattr(instance, 'saved_changes', {}):
+        codes.add(instance.saved_changes['code'][0])
+    transaction.on_commit(lambda: invalidate_coupons(codes))
+
+
+@receiver(m2m_changed, sender=Coupon.products.through)
+def invalidate_coupon_products(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal to drop cached descriptors whose product set changed, after commit.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        codes = [instance.code]
+    elif pk_set:
+        codes = list(Coupon.objects.filter(pk__in=pk_set).values_list('code', flat=True))
+    else:
+        # Product.coupons.clear(): the links are gone, so drop every descriptor.
+        codes = list(Coupon.objects.values_list('code', flat=True))
+    transaction.on_commit(lambda: invalidate_coupons(codes))
+
+
+@receiver(post_save, sender=CouponUsage)
+def count_coupon_usage(sender, instance, created, **kwargs):
+    """
+    Signal to count a CouponUsage that was not written by coupons.redeem().
+    """
+    if created and not getattr(instance, 'counted', False):
+        adjust_usage_counters(instance.coupon_id, instance.user_id, 1)
+
+
+@receiver(post_delete, sender=CouponUsage)
+def uncount_coupon_usage(sender, instance, **kwargs):
+    """
+    Signal to take a deleted CouponUsage out of the usage counters.
+    """
+    adjust_usage_counters(instance.coupon_id, instance.user_id, -1)
+
+
+@receiver(post_save, sender=ProductShipping)
+@receiver(post_delete, sender=ProductShipping)
+def invalidate_shipping_table(sender, instance, **kwargs):
+    """
+    Signal to drop the cached shipping table of the product a ProductShipping belongs to, after commit.
+    """
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_shipping([product_id]))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """
+    Signal to refresh a Product's search index entry after it is saved or deleted.
+    """
+    schedule_index([instance.pk])
 
 
 @receiver(post_save, sender=ProductVariant)
-def create_price_history(sender, instance, **kwargs):
+@receiver(post_delete, sender=ProductVariant)
+def index_variant_product(sender, instance, **kwargs):
     """
-    Signal to create a PriceHistory entry whenever a ProductVariant's price is updated.
+    Signal to refresh the search index entry of a ProductVariant's product.
     """
-    if kwargs.get('created', False):
-        # Do not create PriceHistory for newly created ProductVariants
+    schedule_index([instance.product_id])
+
+
+@receiver(stock_changed)
+def check_reorder_points(sender, deltas, **kwargs):
+    """
+    Signal to check reorder points for variants whose stock moved, after the transaction commits.
+    """
+    schedule_alert_check(deltas)
+
+
+@receiver(stock_changed)
+def roll_up_stock(sender, deltas, **kwargs):
+    """
+    Signal to move product stock by the ledger deltas of its variants, in the same transaction.
+    """
+    apply_stock_deltas(deltas)
+
+
+@receiver(post_save, sender=ProductVariant)
+def roll_up_variant(sender, instance, created, **kwargs):
+    """
+    Signal to keep product stock and price range in step with a created or edited variant.
+    Ledger movements use queryset updates and are rolled up by roll_up_stock instead.
+    """
+    changes = instance.saved_changes
+    if created:
+        add_product_stock({instance.product_id: instance.stock_quantity})
+        refresh_price_ranges([instance.product_id])
         return
+    old_product = changes.get('product', (instance.product_id,))[0]
+    if old_product != instance.product_id:
+        # save() never writes stock, so the instance's copy may be stale; move the stored amount.
+        stock = ProductVariant.objects.values_list('stock_quantity', flat=True).get(pk=instance.pk)
+        add_product_stock({old_product: -stock, instance.product_id: stock})
+    if 'product' in changes or 'price' in changes:
+        refresh_price_ranges({old_product, instance.product_id})
 
-    # Fetch the old price from the database
-    old_instance = ProductVariant.objects.get(pk=instance.pk)
 
-    # Check if the price has changed
-    if old_instance.price != instance.price:
-        PriceHistory.objects.create(
-            product_variant=instance,
-            old_price=old_instance.price,
-            new_price=instance.price
-        )
\ No newline at end of file
+@receiver(post_save, sender=ProductVariant)
+def record_opening_stock(sender, instance, created, **kwargs):
+    """
+    Signal to record the stock a variant was created with as its opening ledger row.
+    """
+    if created and instance.stock_quantity > 0:
+        record_opening_balances([instance.pk])
+
+
+@receiver(post_delete, sender=ProductVariant)
+def remove_variant_rollup(sender, instance, **kwargs):
+    """
+    Signal to rebuild the rollups of a deleted variant's product from the variants left.
+    """
+    recompute_product_rollups([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+def count_node_product(sender, instance, created, **kwargs):
+    """
+    Signal to move a created or re-filed product into its node's product counts.
+    """
+    if created:
+        adjust_counts(ancestor_paths(instance.node_path), 1)
+    elif 'node_path' in instance.saved_changes:
+        old_path, new_path = instance.saved_changes['node_path']
+        adjust_counts(ancestor_paths(old_path), -1)
+        adjust_counts(ancestor_paths(new_path), 1)
+
+
+@receiver(post_save, sender=Category)
+def sync_category_tree_node(sender, instance, **kwargs):
+    """
+    Signal to give a category its top-level node, so new products can be filed under it straight away.
+    """
+    sync_category_node(instance)
+
+
+@receiver(post_save, sender=Subcategory)
+def sync_subcategory_tree_node(sender, instance, **kwargs):
+    """
+    Signal to give a subcategory its node, and to move the node when the subcategory changes category.
+    """
+    sync_subcategory_node(instance)
+
+
+@receiver(post_delete, sender=Product)
+def uncount_node_product(sender, instance, **kwargs):
+    """
+    Signal to take a deleted product out of its node's product counts.
+    """
+    adjust_counts(ancestor_paths(instance.node_path), -1)
+
+
+@receiver(pre_delete, sender=CategoryNode)
+def release_node_products(sender, instance, **kwargs):
+    """
+    Signal to unfile the products of a deleted node and take them out of its ancestors' counts.
+    Nodes with children cannot be deleted, so the node's own products are all there is.
+    """
+    path, count = CategoryNode.objects.values_list('path', 'product_count').get(pk=instance.pk)
+    Product.objects.filter(node_id=instance.pk).update(node_path='')
+    adjust_counts(ancestor_paths(path or '', include_self=False), -count)
@@ -0,0 +1,267 @@
+# inventory/snapshots.py
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.utils import timezone
+
+from .archive import archived_before, archived_rows, start_of_day
+from .ledger import has_ledger_history, stock_changed
+from .models import DailyPriceChange, DailyStockMovement, InventoryTransaction, PriceHistory, ProductVariant, VariantSnapshot
+from .repricing import chunked
+
+# Snapshots stop short of "now" so ledger rows still being committed are not missed.
+SNAPSHOT_LAG = timedelta(minutes=5)
+SNAPSHOT_BATCH_SIZE = 1000
+
+VariantState = namedtuple('VariantState', ['stock_quantity', 'price'])
+# has_history is False for stock set directly that has no opening balance yet; --fix leaves those alone.
+Drift = namedtuple('Drift', ['variant_id', 'sku', 'recorded', 'expected', 'has_history'])
+
+
+def signed_quantity_expression():
+    return Case(When(transaction_type='OUT', then=-F('quantity')), default=F('quantity'))
+
+
+def latest_snapshots(variant_ids, ts):
+    """
+    Return {variant_id: VariantSnapshot} for the newest snapshot taken at or before ``ts``.
+    """
+    newest = (
+        VariantSnapshot.objects.filter(product_variant=OuterRef('pk'), taken_at__lte=ts)
+        .order_by('-taken_at').values('pk')[:1]
+    )
+    snapshot_ids = ProductVariant.objects.filter(pk__in=variant_ids).annotate(snapshot_id=Subquery(newest)).values('snapshot_id')
+    return {snapshot.product_variant_id: snapshot for snapshot in VariantSnapshot.objects.filter(pk__in=snapshot_ids)}
+
+
+def _archived_edge_rows(table, variant_ids, days):
+    """
+    Yield archived rows of ``table`` for ``variant_ids`` from the given local days.
+    """
+    variant_ids = set(variant_ids)
+    for day in sorted(set(days)):
+        for row in archived_rows(table, start_of_day(day), start_of_day(day + timedelta(days=1))):
+            if row['product_variant_id'] in variant_ids:
+                yield row
+
+
+def archived_stock_movements(variant_ids, after, until):
+    """
+    Net archived ledger movement per variant for rows in (after, until].
+
+    Whole days come from the DailyStockMovement rollups; only the partial
+    days at either end are read back from the archive.
+    """
+    totals = defaultdict(int)
+    first_day = timezone.localtime(after).date() if after else None
+    last_day = timezone.localtime(until).date()
+    rollups = DailyStockMovement.objects.filter(product_variant_id__in=variant_ids, day__lt=last_day)
+    if first_day:
+        rollups = rollups.filter(day__gt=first_day)
+    for variant_id, delta in (
+        rollups.values('product_variant_id').annotate(delta=Sum(F('quantity_in') - F('quantity_out')))
+        .values_list('product_variant_id', 'delta')
+    ):
+        totals[variant_id] += delta
+    for row in _archived_edge_rows('inventorytransaction', variant_ids, filter(None, (first_day, last_day))):
+        if (after is None or row['transaction_date'] > after) and row['transaction_date'] <= until:
+            totals[row['product_variant_id']] += row['quantity'] if row['transaction_type'] == 'IN' else -row['quantity']
+    return totals
+
+
+def stock_movements(variant_ids, after, until):
+    """
+    Net ledger movement per variant for rows in (after, until]; ``after=None`` means from the start.
+
+    Rows moved to the archive by compact_history are included.
+    """
+    totals = dict.fromkeys(variant_ids, 0)
+    live = InventoryTransaction.objects.filter(product_variant_id__in=variant_ids, transaction_date__lte=until)
+    watermark = archived_before('inventorytransaction')
+    if watermark and (after is None or after < watermark):
+        # Archived rows are all older than the watermark and live rows never are.
+        for variant_id, delta in archived_stock_movements(variant_ids, after, min(until, watermark)).items():
+            totals[variant_id] += delta
+        live = live.filter(transaction_date__gte=watermark)
+    elif after is not None:
+        live = live.filter(transaction_date__gt=after)
+    for variant_id, delta in (
+        live.values('product_variant_id').annotate(delta=Sum(signed_quantity_expression()))
+        .values_list('product_variant_id', 'delta')
+    ):
+        totals[variant_id] += delta
+    return totals
+
+
+def archived_prices_at(variant_ids, ts):
+    """
+    Price at ``ts`` for variants whose deciding change was archived, or nothing if unknown.
+    """
+    day = timezone.localtime(ts).date()
+    before, after = {}, {}
+    for row in _archived_edge_rows('pricehistory', variant_ids, [day]):
+        if row['changed_at'] <= ts:
+            before[row['product_variant_id']] = row['new_price']
+        else:
+            after.setdefault(row['product_variant_id'], row['old_price'])
+    remaining = [variant_id for variant_id in variant_ids if variant_id not in before]
+    closing = (
+        DailyPriceChange.objects.filter(product_variant=OuterRef('pk'), day__lt=day)
+        .order_by('-day').values('closing_price')[:1]
+    )
+    opening = (
+        DailyPriceChange.objects.filter(product_variant=OuterRef('pk'), day__gt=day)
+        .order_by('day').values('opening_price')[:1]
+    )
+    rows = (
+        ProductVariant.objects.filter(pk__in=remaining)
+        .annotate(closing=Subquery(closing), opening=Subquery(opening))
+        .values_list('pk', 'closing', 'opening')
+    )
+    for variant_id, closing_price, opening_price in rows:
+        if closing_price is not None:
+            before[variant_id] = closing_price
+        elif variant_id in after:
+            before[variant_id] = after[variant_id]
+        elif opening_price is not None:
+            before[variant_id] = opening_price
+    return before
+
+
+def prices_at(variant_ids, ts):
+    """
+    Return {variant_id: price in effect at ``ts``} from the price history.
+
+    The last change at or before ``ts`` gives the price; with none, the old
+    price of the first later change does; with no changes at all, the
+    current price. Each variant costs two index seeks in a single query.
+    """
+    last = (
+        PriceHistory.objects.filter(product_variant=OuterRef('pk'), changed_at__lte=ts)
+        .order_by('-changed_at', '-pk').values('new_price')[:1]
+    )
+    following = (
+        PriceHistory.objects.filter(product_variant=OuterRef('pk'), changed_at__gt=ts)
+        .order_by('changed_at', 'pk').values('old_price')[:1]
+    )
+    rows = list(
+        ProductVariant.objects.filter(pk__in=variant_ids)
+        .annotate(last=Subquery(last), following=Subquery(following))
+        .values_list('pk', 'price', 'last', 'following')
+    )
+    watermark = archived_before('pricehistory')
+    prices, undecided = {}, []
+    for variant_id, current, last_price, following_price in rows:
+        if last_price is not None:
+            prices[variant_id] = last_price
+        elif watermark and ts < watermark:
+            # Changes between ts and the first live row may have been archived.
+            undecided.append(variant_id)
+        else:
+            prices[variant_id] = following_price if following_price is not None else current
+    if undecided:
+        archived = archived_prices_at(undecided, ts)
+        for variant_id, current, _, following_price in rows:
+            if variant_id in undecided:
+                prices[variant_id] = archived.get(variant_id, following_price if following_price is not None else current)
+    return prices
+
+
+def stock_as_of(variant_ids, ts):
+    """
+    Return {variant_id: ledger stock as of ``ts``}.
+
+    Stock starts from each variant's nearest snapshot at or before ``ts`` and
+    replays only the ledger rows after it; variants without one replay
+    their whole history, using the daily rollups for archived days.
+    """
+    snapshots = latest_snapshots(variant_ids, ts)
+    groups = defaultdict(list)
+    for variant_id in variant_ids:
+        snapshot = snapshots.get(variant_id)
+        groups[snapshot.taken_at if snapshot else None].append(variant_id)
+    stock = {}
+    # Snapshots are taken in batches with one timestamp, so there are few groups.
+    for since, members in groups.items():
+        for variant_id, delta in stock_movements(members, since, ts).items():
+            snapshot = snapshots.get(variant_id)
+            stock[variant_id] = (snapshot.stock_quantity if snapshot else 0) + delta
+    return stock
+
+
+def as_of(variant_ids, ts):
+    """
+    Return {variant_id: VariantState(stock_quantity, price)} as of ``ts``.
+    """
+    variant_ids = list(variant_ids)
+    stock = stock_as_of(variant_ids, ts)
+    prices = prices_at(variant_ids, ts)
+    return {
+        variant_id: VariantState(stock[variant_id], prices[variant_id])
+        for variant_id in variant_ids if variant_id in prices
+    }
+
+
+def take_snapshots(at=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Snapshot the ledger stock and price of every variant that existed at ``at``.
+
+    Each snapshot builds on the previous one, so a run only replays the
+    ledger rows written since the last run. Returns the number written.
+    """
+    at = at or timezone.now() - SNAPSHOT_LAG
+    variants = ProductVariant.objects.filter(created_at__lte=at).order_by('pk').values_list('pk', flat=True)
+    written = 0
+    for batch in chunked(variants.iterator(), batch_size):
+        states = as_of(batch, at)
+        VariantSnapshot.objects.bulk_create(
+            [
+                VariantSnapshot(product_variant_id=variant_id, taken_at=at, stock_quantity=state.stock_quantity, price=state.price)
+                for variant_id, state in states.items()
+            ],
+            ignore_conflicts=True,
+        )
+        written += len(states)
+    return written
+
+
+def reconcile_stock(batch_size=SNAPSHOT_BATCH_SIZE, fix=False):
+    """
+    Compare every variant's stock_quantity with the ledger, in pk order and batches.
+
+    Yields a Drift for each mismatch. Each batch is locked while it is
+    checked so in-flight ledger writes cannot show up as drift; with
+    ``fix`` the recorded stock is set to the ledger value. Variants with no
+    ledger history are reported but never fixed: their stock was set
+    directly, and the ledger only knows it once record_opening_balances()
+    has written their opening row.
+    """
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                ProductVariant.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                .annotate(has_history=has_ledger_history())
+                .values_list('pk', 'sku', 'stock_quantity', 'has_history')[:batch_size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            expected = stock_as_of([row[0] for row in rows], timezone.now())
+            drift = [
+                Drift(pk, sku, recorded, expected[pk], has_history)
+                for pk, sku, recorded, has_history in rows if recorded != expected[pk]
+            ]
+            fixable = [item for item in drift if item.has_history]
+            if fix and fixable:
+                ProductVariant.objects.filter(pk__in=[item.variant_id for item in fixable]).update(
+                    stock_quantity=Case(
+                        *[When(pk=item.variant_id, then=Value(item.expected)) for item in fixable],
+                        default=F('stock_quantity'),
+                    ),
+                    updated_at=timezone.now(),
+                )
+                stock_changed.send(sender=ProductVariant, deltas={item.variant_id: item.expected - item.recorded for item in fixable})
+        yield from drift
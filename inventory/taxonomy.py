@@ -0,0 +1,312 @@
+# inventory/taxonomy.py
+"""
+Materialized-path category tree.
+
+Each node's path is its parent's path plus one fixed-width base-36 segment
+made from its primary key, so:
+
+- a subtree is the range [path, path + PATH_END) of one indexed column;
+- the ancestors of a node are the prefixes of its path, read with one query;
+- moving a subtree rewrites the prefix of every path in that range with one
+  UPDATE per table.
+
+Products carry a copy of their node's path, so products under a node are a
+range scan of the product table, with no join and no recursion.
+"""
+from collections import Counter, defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import CharField, F, Func, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
+
+from .identifiers import unique_slugs
+from .models import Category, CategoryNode, Product, Subcategory
+
+PATH_STEP = 6
+# Sorts after every segment character, closing the range of a subtree.
+PATH_END = '~'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+MAX_DEPTH = CategoryNode._meta.get_field('path').max_length // PATH_STEP
+
+
+def segment(pk):
+    digits, rest = '', pk
+    while rest:
+        rest, remainder = divmod(rest, len(DIGITS))
+        digits = DIGITS[remainder] + digits
+    if len(digits) > PATH_STEP:
+        raise ValueError(f"Node id {pk} does not fit in a path segment.")
+    return digits.rjust(PATH_STEP, '0')
+
+
+def depth_of(path):
+    return len(path) // PATH_STEP - 1
+
+
+def ancestor_paths(path, include_self=True):
+    """
+    The paths from the root down to ``path``: its prefixes at every segment boundary.
+    """
+    end = len(path) + 1 if include_self else len(path)
+    return [path[:length] for length in range(PATH_STEP, end, PATH_STEP)]
+
+
+def in_subtree(path, field='path'):
+    """
+    Q for rows whose ``field`` lies in the subtree at ``path``, the node itself included.
+    """
+    return Q(**{f'{field}__gte': path, f'{field}__lt': path + PATH_END})
+
+
+def ancestors(path, include_self=True):
+    """
+    The nodes from the root down to the node at ``path``, in one query.
+    """
+    return CategoryNode.objects.filter(path__in=ancestor_paths(path, include_self)).order_by('depth')
+
+
+def descendants(path, include_self=True):
+    """
+    The subtree at ``path`` in depth-first order.
+    """
+    nodes = CategoryNode.objects.filter(in_subtree(path)).order_by('path')
+    return nodes if include_self else nodes.exclude(path=path)
+
+
+def subtree_products(path):
+    """
+    Products filed under the node at ``path`` or any node below it.
+    """
+    return Product.objects.filter(in_subtree(path, 'node_path'))
+
+
+def adjust_counts(paths, delta):
+    """
+    Add ``delta`` to the product count of the nodes at ``paths`` in one UPDATE.
+    """
+    if paths and delta:
+        CategoryNode.objects.filter(path__in=paths).update(product_count=F('product_count') + delta)
+
+
+def _rebased(field, old_path, new_path):
+    return Concat(Value(new_path), Substr(field, len(old_path) + 1), output_field=CharField())
+
+
+def assign_path(node):
+    """
+    Give a newly inserted node its path under its parent.
+    """
+    prefix = ''
+    if node.parent_id:
+        prefix = CategoryNode.objects.select_for_update().values_list('path', flat=True).get(pk=node.parent_id)
+    node.path = prefix + segment(node.pk)
+    node.depth = depth_of(node.path)
+    if node.depth >= MAX_DEPTH:
+        raise ValidationError(f"The category tree is limited to {MAX_DEPTH} levels.")
+    CategoryNode.objects.filter(pk=node.pk).update(path=node.path, depth=node.depth)
+
+
+def move_node(node, parent):
+    """
+    Move ``node`` and everything below it under ``parent`` (None for the top level).
+
+    Node paths and depths, product paths and the product counts of the old
+    and new ancestors are each rewritten with one UPDATE.
+    """
+    with transaction.atomic():
+        old_path, total = CategoryNode.objects.select_for_update().values_list('path', 'product_count').get(pk=node.pk)
+        prefix = ''
+        if parent is not None:
+            prefix = CategoryNode.objects.select_for_update().values_list('path', flat=True).get(pk=parent.pk)
+            if prefix.startswith(old_path):
+                raise ValidationError("A category cannot be moved below itself.")
+        new_path = prefix + segment(node.pk)
+        if new_path != old_path:
+            deepest = CategoryNode.objects.filter(in_subtree(old_path)).order_by('-depth').values_list('depth', flat=True).first()
+            if deepest + depth_of(new_path) - depth_of(old_path) >= MAX_DEPTH:
+                raise ValidationError(f"The category tree is limited to {MAX_DEPTH} levels.")
+            CategoryNode.objects.filter(in_subtree(old_path)).update(
+                path=_rebased('path', old_path, new_path),
+                depth=F('depth') + (depth_of(new_path) - depth_of(old_path)),
+            )
+            subtree_products(old_path).update(node_path=_rebased('node_path', old_path, new_path))
+            adjust_counts(ancestor_paths(old_path, include_self=False), -total)
+            adjust_counts(ancestor_paths(new_path, include_self=False), total)
+        node.parent = parent
+        node.path, node.depth = new_path, depth_of(new_path)
+
+
+def place_product(product):
+    """
+    Default a product's node to its subcategory's or category's, and copy the node's path.
+
+    Returns True when node_path was (re)set and has to be saved.
+    """
+    if product.node_id is None and product.category_id:
+        legacy = Q(subcategory_id=product.subcategory_id) if product.subcategory_id else Q(category_id=product.category_id)
+        product.node_id = CategoryNode.objects.filter(legacy).values_list('pk', flat=True).first()
+    if product.has_snapshot() and not product._state.adding and 'node' not in product.changed_fields():
+        return False
+    path = ''
+    if product.node_id is not None:
+        path = CategoryNode.objects.values_list('path', flat=True).get(pk=product.node_id) or ''
+    product.node_path = path
+    return True
+
+
+def legacy_node():
+    """
+    The node of a product's subcategory, or of its category when the subcategory has none.
+    """
+    return Coalesce(
+        Subquery(CategoryNode.objects.filter(subcategory_id=OuterRef('subcategory_id')).values('pk')),
+        Subquery(CategoryNode.objects.filter(category_id=OuterRef('category_id')).values('pk')),
+    )
+
+
+def file_products(product_ids, refile=()):
+    """
+    File products written without save() in bulk, for the importer and the seeder.
+
+    Products without a node, and those in ``refile``, go under their
+    subcategory's or category's node; every product's node_path is copied
+    from its node and the node counts move with the paths, all in a fixed
+    number of queries. Returns the number of products whose path changed.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    with transaction.atomic():
+        products = Product.objects.filter(pk__in=product_ids)
+        before = dict(products.select_for_update().values_list('pk', 'node_path'))
+        products.filter(Q(node__isnull=True) | Q(pk__in=list(refile))).update(node=legacy_node())
+        products.update(node_path=Coalesce(
+            Subquery(CategoryNode.objects.filter(pk=OuterRef('node_id')).values('path')), Value(''),
+        ))
+        deltas = Counter()
+        moved = 0
+        for pk, path in products.values_list('pk', 'node_path'):
+            if path != before[pk]:
+                moved += 1
+                deltas.subtract(ancestor_paths(before[pk]))
+                deltas.update(ancestor_paths(path))
+        paths_by_delta = defaultdict(list)
+        for path, delta in deltas.items():
+            paths_by_delta[delta].append(path)
+        for delta, paths in paths_by_delta.items():
+            adjust_counts(paths, delta)
+    return moved
+
+
+def sync_category_node(category):
+    """
+    Create the top-level node of a category that has none, or keep its node's name in step.
+    """
+    node = CategoryNode.objects.filter(category=category).first()
+    if node is None:
+        node = CategoryNode(
+            name=category.name, slug=unique_slugs([category.slug or category.name], CategoryNode)[0],
+            description=category.description, category=category,
+        )
+        node.save()
+    elif node.name != category.name:
+        node.name = category.name
+        node.save(update_fields=['name', 'updated_at'])
+    return node
+
+
+def sync_subcategory_node(subcategory):
+    """
+    Create the node of a subcategory that has none, or move and rename its node to follow it.
+
+    Moving the node carries its products and their counts along (see move_node()).
+    """
+    parent = sync_category_node(subcategory.category)
+    node = CategoryNode.objects.filter(subcategory=subcategory).first()
+    if node is None:
+        node = CategoryNode(
+            name=subcategory.name, slug=unique_slugs([subcategory.slug or subcategory.name], CategoryNode)[0],
+            description=subcategory.description, parent=parent, subcategory=subcategory,
+        )
+        node.save()
+    elif node.parent_id != parent.pk or node.name != subcategory.name:
+        node.name, node.parent = subcategory.name, parent
+        node.save()
+    return node
+
+
+def recompute_node_counts():
+    """
+    Recount every node's products from the product paths, one range count per node.
+    """
+    products = Product.objects.filter(node_path__gte=OuterRef('path'), node_path__lt=Concat(OuterRef('path'), Value(PATH_END)))
+    return CategoryNode.objects.update(
+        product_count=Subquery(products.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'))
+    )
+
+
+def create_missing_nodes():
+    """
+    Bulk-create the nodes of categories and subcategories that have none; returns how many.
+
+    For rows written without save(), whose post_save receivers never ran.
+    """
+    with transaction.atomic():
+        categories = list(Category.objects.filter(node__isnull=True).order_by('pk'))
+        roots = CategoryNode.objects.bulk_create([
+            CategoryNode(name=category.name, slug=slug, description=category.description, category=category)
+            for category, slug in zip(categories, unique_slugs([c.slug or c.name for c in categories], CategoryNode))
+        ])
+        for root in roots:
+            root.path, root.depth = segment(root.pk), 0
+        CategoryNode.objects.bulk_update(roots, ['path', 'depth'])
+
+        parents = dict(CategoryNode.objects.filter(category__isnull=False).values_list('category_id', 'pk'))
+        parent_paths = dict(CategoryNode.objects.filter(category__isnull=False).values_list('pk', 'path'))
+        subcategories = list(Subcategory.objects.filter(node__isnull=True, category_id__in=parents).order_by('pk'))
+        children = CategoryNode.objects.bulk_create([
+            CategoryNode(
+                name=subcategory.name, slug=slug, description=subcategory.description,
+                parent_id=parents[subcategory.category_id], subcategory=subcategory,
+            )
+            for subcategory, slug in zip(subcategories, unique_slugs([s.slug or s.name for s in subcategories], CategoryNode))
+        ])
+        for child in children:
+            child.path = parent_paths[child.parent_id] + segment(child.pk)
+            child.depth = depth_of(child.path)
+        CategoryNode.objects.bulk_update(children, ['path', 'depth'])
+    return len(roots) + len(children)
+
+
+def build_from_categories():
+    """
+    Build or refresh the tree from the Category -> Subcategory taxonomy.
+
+    Every category becomes a top-level node and every subcategory a node
+    below it; products without a node are filed under their subcategory's or
+    category's node. Safe to re-run: existing nodes are renamed and moved to
+    follow their source rows. Returns the number of nodes created and
+    products filed.
+    """
+    with transaction.atomic():
+        created = create_missing_nodes()
+        CategoryNode.objects.filter(category__isnull=False).update(
+            name=Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name'))
+        )
+        CategoryNode.objects.filter(subcategory__isnull=False).update(
+            name=Subquery(Subcategory.objects.filter(pk=OuterRef('subcategory_id')).values('name'))
+        )
+        # Subcategories that changed category since the last run.
+        for node in CategoryNode.objects.filter(subcategory__isnull=False).exclude(
+            parent_id=Subquery(CategoryNode.objects.filter(category_id=OuterRef('subcategory__category_id')).values('pk'))
+        ).select_related('subcategory__category__node'):
+            node.parent = node.subcategory.category.node
+            node.save(update_fields=['parent'])
+
+        filed = Product.objects.filter(node__isnull=True).update(node=legacy_node())
+        Product.objects.filter(node__isnull=False).update(
+            node_path=Subquery(CategoryNode.objects.filter(pk=OuterRef('node_id')).values('path'))
+        )
+        recompute_node_counts()
+    return {'nodes': created, 'products': filed}
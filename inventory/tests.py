@@ -1,3 +1,1279 @@
-from django.test import TestCase
+# inventory/tests.py
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from json import dumps, loads
+from os import path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import jobs, search
+from .admin import EstimatedCountPaginator
+from .alerts import deliver_stock_alerts, evaluate_stock_alerts
+from .archive import archived_before, archived_rows, compact_history, rollup_history, start_of_day
+from .benchmarks import BenchmarkError, compare_results, run_benchmarks
+from .catalog_cache import get_catalog_tree, get_product_by_slug
+from .coupons import CouponError, check_coupon, recompute_usage_counters, redeem
+from .identifiers import SkuAllocator, unique_slugs
+from .images import build_renditions, rendition_path, rendition_url
+from .importer import CatalogImporter
+from .ledger import (
+    InsufficientStock, OPENING_BALANCE, adjust_stock, apply_many, apply_transaction, record_opening_balances
+)
+from .loadtest import catalog_paths
+from .models import (
+    Category, CategoryNode, Coupon, CouponUsage, CouponUserUsage, DailyPriceChange, DailyStockMovement, Discount,
+    DiscountHistory, EffectivePrice, InventoryTransaction, Job, PriceHistory, Product, ProductImage, ProductReview,
+    ProductReviewStats, ProductShipping, ProductVariant, ReorderPoint, StockAlert, Subcategory, VariantSnapshot
+)
+from .pricing import current_effective_prices, effective_prices, price_details, refresh_effective_prices
+from .repricing import bulk_reprice
+from .reviews import recompute_review_stats, review_stats_for
+from .rollups import recompute_product_rollups
+from .search import SEARCH_TABLE, matching_products, rebuild_search_index, search_products, suggest
+from .seeding import clear_seed, seed_catalog
+from .shipping import invalidate_shipping, parse_delivery_days, quote_shipping
+from .snapshots import as_of, reconcile_stock, take_snapshots
+from .taxonomy import PATH_STEP, build_from_categories, segment, subtree_products
+from .tracking import prime_snapshots
+from .validators import validate_image, validate_product_slug
+
+
+def make_category(name='Lamps', slug='lamps'):
+    return Category.objects.create(name=name, slug=slug, thumbnail='category_thumbnails/test.png')
+
+
+def make_variant(product, sku, price='10.00', stock=0):
+    return ProductVariant.objects.create(product=product, name=sku, sku=sku, price=Decimal(price), stock_quantity=stock)
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        # Cached catalog entries outlive the rollback between tests.
+        cache.clear()
+        self.category = make_category()
+        self.product = Product.objects.create(name='Desk lamp', category=self.category)
+
+    def stock(self, variant):
+        return ProductVariant.objects.values_list('stock_quantity', flat=True).get(pk=variant.pk)
+
+
+class LedgerTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = make_variant(self.product, 'LAMP-1')
+        self.second = make_variant(self.product, 'LAMP-2')
+        apply_many([(self.first.pk, 'IN', 5), (self.second.pk, 'IN', 2)])
+
+    def test_batch_that_would_oversell_writes_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            apply_many([(self.first.pk, 'OUT', 3), (self.second.pk, 'OUT', 3)])
+        self.assertEqual(raised.exception.variant_ids, [self.second.pk])
+        self.assertEqual(self.stock(self.first), 5)
+        self.assertEqual(self.stock(self.second), 2)
+        self.assertEqual(InventoryTransaction.objects.count(), 2)
+
+    def test_deltas_are_summed_per_variant(self):
+        apply_many([(self.first.pk, 'OUT', 4), (self.first.pk, 'IN', 1), (self.first.pk, 'OUT', 2)])
+        self.assertEqual(self.stock(self.first), 0)
+        self.assertEqual(InventoryTransaction.objects.filter(product_variant=self.first).count(), 4)
+
+    def test_single_decrement_is_guarded(self):
+        with self.assertRaises(InsufficientStock):
+            adjust_stock(self.second.pk, -3)
+        adjust_stock(self.second.pk, -2)
+        self.assertEqual(self.stock(self.second), 0)
+
+    def test_recording_a_transaction_moves_stock(self):
+        apply_transaction(self.first.pk, 'OUT', 2)
+        with self.assertRaises(InsufficientStock):
+            apply_transaction(self.first.pk, 'OUT', 4)
+        self.assertEqual(self.stock(self.first), 3)
+        self.assertEqual(InventoryTransaction.objects.filter(product_variant=self.first).count(), 2)
+
+    def test_stale_variant_save_keeps_ledger_stock(self):
+        stale = ProductVariant.objects.get(pk=self.first.pk)
+        apply_transaction(self.first.pk, 'OUT', 4)
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertEqual(self.stock(self.first), 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 3)
+
+    def test_moving_a_stale_variant_moves_its_stored_stock(self):
+        other = Product.objects.create(name='Floor lamp', category=self.category)
+        stale = ProductVariant.objects.get(pk=self.first.pk)
+        apply_transaction(self.first.pk, 'OUT', 4)
+        stale.product = other
+        stale.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 2)
+        self.assertEqual(Product.objects.get(pk=other.pk).stock_quantity, 1)
+
+    def test_recorded_transactions_cannot_change(self):
+        row = InventoryTransaction.objects.get(product_variant=self.first)
+        row.quantity = 50
+        with self.assertRaises(ValidationError):
+            row.save()
+        row = InventoryTransaction.objects.get(pk=row.pk)
+        row.description = 'Counted twice'
+        row.save()
+        self.assertEqual(InventoryTransaction.objects.get(pk=row.pk).description, 'Counted twice')
+        self.assertEqual(self.stock(self.first), 5)
+
+
+class TrackedFieldsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.variant = make_variant(self.product, 'LAMP-1')
+
+    def test_price_change_is_recorded_against_the_loaded_price(self):
+        variant = ProductVariant.objects.get(pk=self.variant.pk)
+        variant.price = Decimal('12.50')
+        self.assertEqual(variant.changed_fields(), {'price': (Decimal('10.00'), Decimal('12.50'))})
+        variant.save()
+        self.assertEqual(variant.changed_fields(), {})
+        variant.name = 'Renamed'
+        variant.save()
+        self.assertEqual(
+            list(PriceHistory.objects.values_list('old_price', 'new_price')), [(Decimal('10.00'), Decimal('12.50'))]
+        )
+
+    def test_hand_built_instances_are_primed_from_the_database(self):
+        variant = ProductVariant(pk=self.variant.pk, price=Decimal('8.00'))
+        self.assertFalse(variant.has_snapshot())
+        variant.save(update_fields=['price'])
+        self.assertEqual(PriceHistory.objects.get().old_price, Decimal('10.00'))
+
+    def test_prime_snapshots_loads_a_batch_in_one_query(self):
+        other = make_variant(self.product, 'LAMP-2', price='4.00')
+        built = [ProductVariant(pk=pk) for pk in (self.variant.pk, other.pk)]
+        with self.assertNumQueries(1):
+            prime_snapshots(built)
+        self.assertEqual([variant.get_loaded_value('price') for variant in built], [Decimal('10.00'), Decimal('4.00')])
+
+    def test_discount_changes_are_recorded(self):
+        now = timezone.now()
+        discount = Discount.objects.create(
+            product_variant=self.variant, discount_type='fixed', discount_value=Decimal('1.00'),
+            start_date=now, end_date=now + timedelta(days=1),
+        )
+        discount.discount_type = 'percent'
+        discount.save()
+        discount.end_date = now + timedelta(days=2)
+        discount.save()
+        self.assertEqual(
+            list(DiscountHistory.objects.values_list('old_discount_type', 'new_discount_type', 'new_discount_value')),
+            [('fixed', 'percent', Decimal('1.00'))],
+        )
+
+
+class RepricingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = make_variant(self.product, 'LAMP-1')
+        self.second = make_variant(self.product, 'LAMP-2', price='5.00')
+
+    def prices(self):
+        return dict(ProductVariant.objects.values_list('sku', 'price'))
+
+    def test_bulk_reprice_writes_history_for_changed_prices_only(self):
+        stats = bulk_reprice([('LAMP-1', '11'), ('LAMP-2', '5.00'), ('LAMP-9', '1'), ('LAMP-1', '12.5')], chunk_size=3)
+        self.assertEqual(stats, {'updated': 2, 'unchanged': 1, 'missing': 1})
+        self.assertEqual(self.prices(), {'LAMP-1': Decimal('12.50'), 'LAMP-2': Decimal('5.00')})
+        self.assertEqual(
+            list(PriceHistory.objects.order_by('pk').values_list('old_price', 'new_price')),
+            [(Decimal('10.00'), Decimal('11.00')), (Decimal('11.00'), Decimal('12.50'))],
+        )
+
+    def test_bad_prices_are_rejected(self):
+        with self.assertRaises(ValueError):
+            bulk_reprice([('LAMP-1', '-1')])
+        with self.assertRaises(ValueError):
+            bulk_reprice([('LAMP-1', 'ten')])
+
+    def test_manual_history_row_applies_the_price_once(self):
+        PriceHistory.objects.create(product_variant=self.first, old_price=self.first.price, new_price=Decimal('9.00'))
+        self.assertEqual(self.prices()['LAMP-1'], Decimal('9.00'))
+        self.assertEqual(PriceHistory.objects.count(), 1)
+
+    def test_command_streams_a_csv(self):
+        with NamedTemporaryFile('w', suffix='.csv') as handle:
+            handle.write('sku,price\nLAMP-2,6.25\n')
+            handle.flush()
+            out = StringIO()
+            call_command('reprice_variants', handle.name, stdout=out)
+        self.assertIn('Updated 1', out.getvalue())
+        self.assertEqual(self.prices()['LAMP-2'], Decimal('6.25'))
+
+
+class EffectivePriceTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.variant = make_variant(self.product, 'LAMP-1', price='100.00')
+
+    def discount(self, discount_type, value, start, end):
+        return Discount.objects.create(
+            product_variant=self.variant, discount_type=discount_type, discount_value=Decimal(value),
+            start_date=start, end_date=end,
+        )
+
+    def test_lowest_single_offer_wins_until_the_next_boundary(self):
+        self.discount('fixed', '10', self.now - timedelta(hours=1), self.now + timedelta(days=1))
+        self.discount('percent', '50', self.now + timedelta(hours=3), self.now + timedelta(hours=4))
+        coupon = Coupon.objects.create(
+            code='LAMPS20', discount_type='percent', discount_value=Decimal('20'),
+            valid_from=self.now - timedelta(hours=1), valid_to=self.now + timedelta(hours=2),
+        )
+        coupon.products.add(self.product)
+        self.assertEqual(
+            price_details([self.variant.pk], self.now)[self.variant.pk],
+            (Decimal('100.00'), Decimal('80.00'), self.now + timedelta(hours=2)),
+        )
+        self.assertEqual(
+            price_details([self.variant.pk], self.now + timedelta(hours=2))[self.variant.pk],
+            (Decimal('100.00'), Decimal('90.00'), self.now + timedelta(hours=3)),
+        )
+
+    def test_expired_rows_are_recomputed_on_read(self):
+        self.assertEqual(refresh_effective_prices([self.variant.pk]), {self.variant.pk: Decimal('100.00')})
+        EffectivePrice.objects.update(price=Decimal('1.00'), valid_until=self.now - timedelta(seconds=1))
+        self.assertEqual(current_effective_prices([self.variant.pk]), {self.variant.pk: Decimal('100.00')})
+        self.assertEqual(EffectivePrice.objects.get().price, Decimal('100.00'))
+
+
+class EffectivePriceRefreshTests(TransactionTestCase):
+    def test_saves_outside_a_transaction_refresh_the_row(self):
+        product = Product.objects.create(name='Desk lamp', category=make_category())
+        variant = make_variant(product, 'LAMP-1', price='100.00')
+        now = timezone.now()
+        Discount.objects.create(
+            product_variant=variant, discount_type='fixed', discount_value=Decimal('25'),
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1),
+        )
+        self.assertEqual(EffectivePrice.objects.get().price, Decimal('75.00'))
+        variant.price = Decimal('50.00')
+        variant.save()
+        self.assertEqual(EffectivePrice.objects.get().price, Decimal('25.00'))
+
+
+class CatalogCacheTests(CatalogTestCase):
+    def test_warm_tree_reads_run_no_queries(self):
+        get_catalog_tree()
+        with self.assertNumQueries(0):
+            tree = get_catalog_tree()
+        self.assertEqual([row['slug'] for row in tree], ['lamps'])
+        self.assertEqual([row['name'] for row in tree[0]['products']], ['Desk lamp'])
+
+    def test_saves_invalidate_the_tree(self):
+        get_catalog_tree()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Lighting'
+            self.category.save()
+            Product.objects.create(name='Floor lamp', category=self.category)
+        tree = get_catalog_tree()
+        self.assertEqual(tree[0]['name'], 'Lighting')
+        self.assertEqual(len(tree[0]['products']), 2)
+
+    def test_slug_changes_drop_the_old_lookup(self):
+        old_slug = self.product.slug
+        self.assertEqual(get_product_by_slug(old_slug)['id'], self.product.pk)
+        self.product.slug = 'desk-lamp-black'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertIsNone(get_product_by_slug(old_slug))
+        self.assertEqual(get_product_by_slug('desk-lamp-black')['id'], self.product.pk)
+
+    def test_invalidation_waits_for_the_commit(self):
+        get_catalog_tree()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.category.name = 'Lighting'
+            self.category.save()
+            self.assertEqual(get_catalog_tree()[0]['name'], 'Lamps')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_catalog_tree()[0]['name'], 'Lighting')
+
+    def test_unknown_slugs_are_cached_as_missing(self):
+        self.assertIsNone(get_product_by_slug('nothing-here'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_product_by_slug('nothing-here'))
+
+
+class AdminChangelistTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.url = '/admin/inventory/productvariant/'
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        make_variant(self.product, 'LAMP-1')
+        # The first request also loads the session and content types.
+        self.changelist_queries()
+        _, few = self.changelist_queries()
+        for index in range(5):
+            product = Product.objects.create(name=f'Lamp {index}', category=self.category)
+            make_variant(product, f'LAMP-{index + 2}')
+        _, many = self.changelist_queries()
+        self.assertEqual(few, many)
+
+    def test_related_search_filter_matches_name_or_pk(self):
+        make_variant(self.product, 'LAMP-1')
+        chair = Product.objects.create(name='Office chair', category=self.category)
+        make_variant(chair, 'CHAIR-1')
+        response, _ = self.changelist_queries(product_search='chair')
+        self.assertEqual([variant.sku for variant in response.context['cl'].result_list], ['CHAIR-1'])
+        response, _ = self.changelist_queries(product_search=str(self.product.pk))
+        self.assertEqual([variant.sku for variant in response.context['cl'].result_list], ['LAMP-1'])
+
+    def test_large_unfiltered_tables_use_the_estimate(self):
+        variant = make_variant(self.product, 'LAMP-1')
+        for price in ('11.00', '12.00', '13.00'):
+            PriceHistory.objects.create(product_variant=variant, old_price=variant.price, new_price=Decimal(price))
+        last = PriceHistory.objects.latest('pk')
+        PriceHistory.objects.exclude(pk=last.pk).delete()
+        with mock.patch('inventory.admin.ESTIMATED_COUNT_THRESHOLD', 0):
+            self.assertEqual(EstimatedCountPaginator(PriceHistory.objects.order_by('pk'), 10).count, last.pk)
+            filtered = PriceHistory.objects.filter(new_price__gt=0).order_by('pk')
+            self.assertEqual(EstimatedCountPaginator(filtered, 10).count, 1)
+
+
+def image_file(name='photo.png', size=(64, 48), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImageTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, IMAGE_RENDITIONS={'thumbnail': (16, 16)})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_validation_reads_only_the_header(self):
+        validate_image(image_file(), max_size=1024 * 1024)
+        with self.assertRaisesMessage(ValidationError, 'Unsupported image format'):
+            validate_image(image_file('photo.bmp', image_format='BMP'), max_size=1024 * 1024)
+        with self.assertRaisesMessage(ValidationError, 'too large'):
+            validate_image(image_file(), max_size=1024 * 1024, max_pixels=100)
+        with self.assertRaisesMessage(ValidationError, 'valid image'):
+            validate_image(SimpleUploadedFile('photo.png', b'not an image'), max_size=1024 * 1024)
+
+    def test_renditions_are_keyed_by_content(self):
+        first = ProductImage.objects.create(product=self.product, image=image_file())
+        second = ProductImage.objects.create(product=self.product, image=image_file())
+        self.assertEqual(rendition_url(first.image, 'thumbnail'), first.image.url)
+        digest = build_renditions(first.image.name)
+        self.assertEqual(build_renditions(second.image.name), digest)
+        path = rendition_path(digest, 'thumbnail')
+        with first.image.storage.open(path) as rendition, Image.open(rendition) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (16, 12)))
+        self.assertEqual(rendition_url(second.image, 'thumbnail'), first.image.storage.url(path))
+
+    def test_saving_an_image_queues_renditions(self):
+        image = ProductImage.objects.create(product=self.product, image=image_file())
+        image.save()
+        queued = Job.objects.filter(name='images.renditions', payload__name=image.image.name)
+        self.assertEqual(queued.count(), 1)
+
+    def test_only_new_files_queue_renditions(self):
+        image = ProductImage.objects.create(product=self.product, image=image_file())
+        Job.objects.filter(name='images.renditions').delete()
+        image.is_main = True
+        image.save()
+        self.assertFalse(Job.objects.filter(name='images.renditions').exists())
+        image.image = image_file('other.png')
+        image.save()
+        self.assertEqual(
+            list(Job.objects.filter(name='images.renditions').values_list('payload__name', flat=True)), [image.image.name]
+        )
+
+    def test_digests_are_stored_on_the_rows(self):
+        image = ProductImage.objects.create(product=self.product, image=image_file())
+        digest = build_renditions(image.image.name)
+        cache.clear()
+        image = ProductImage.objects.get(pk=image.pk)
+        self.assertEqual(image.image_digest, digest)
+        self.assertEqual(rendition_url(image.image, 'thumbnail'), image.image.storage.url(rendition_path(digest, 'thumbnail')))
+        image.image = image_file('other.png', size=(40, 20))
+        image.save()
+        self.assertIsNone(ProductImage.objects.get(pk=image.pk).image_digest)
+
+
+class ImporterTests(CatalogTestCase):
+    def import_records(self, records, **kwargs):
+        importer = CatalogImporter(**kwargs)
+        importer.run(records)
+        return importer
+
+    def test_records_are_upserted_by_sku(self):
+        records = [
+            {'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'category': 'lamps'},
+            {
+                'type': 'variant', 'product_sku': 'P-1', 'sku': 'V-1', 'name': 'Brass', 'price': '40',
+                'stock_quantity': '3',
+            },
+            {'type': 'shipping', 'product_sku': 'P-1', 'shipping_method': 'post', 'national_shipping_cost': '4.5'},
+        ]
+        self.import_records(records, batch_size=2)
+        records[0]['name'] = 'Arc floor lamp'
+        records[1]['price'] = '45'
+        records[2]['national_shipping_cost'] = '5'
+        importer = self.import_records(records)
+        self.assertEqual(importer.stats, {'product': 1, 'variant': 1, 'image': 0, 'shipping': 1})
+        self.assertEqual(Product.objects.get(sku='P-1').name, 'Arc floor lamp')
+        variant = ProductVariant.objects.get(sku='V-1')
+        self.assertEqual((variant.price, variant.stock_quantity), (Decimal('45.00'), 3))
+        self.assertEqual(InventoryTransaction.objects.get().quantity, 3)
+        self.assertEqual(ProductShipping.objects.get().national_shipping_cost, Decimal('5.00'))
+
+    def test_import_repricing_is_recorded(self):
+        records = [
+            {'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'category': 'lamps'},
+            {'type': 'variant', 'product_sku': 'P-1', 'sku': 'V-1', 'name': 'Brass', 'price': '40'},
+        ]
+        self.import_records(records)
+        self.assertFalse(PriceHistory.objects.exists())
+        records[1]['price'] = '45'
+        self.import_records(records)
+        self.assertEqual(
+            list(PriceHistory.objects.values_list('old_price', 'new_price')), [(Decimal('40.00'), Decimal('45.00'))]
+        )
+
+    def test_repeated_skus_take_the_last_record(self):
+        importer = self.import_records([
+            {'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'category': 'lamps'},
+            {'type': 'product', 'sku': 'P-1', 'name': 'Arc floor lamp', 'category': 'lamps'},
+            {'type': 'variant', 'product_sku': 'P-1', 'sku': 'V-1', 'name': 'Brass', 'price': '40'},
+            {'type': 'variant', 'product_sku': 'P-1', 'sku': 'V-1', 'name': 'Brass', 'price': '42'},
+        ])
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(Product.objects.get(sku='P-1').name, 'Arc floor lamp')
+        self.assertEqual(ProductVariant.objects.get(sku='V-1').price, Decimal('42.00'))
+
+    def test_file_slugs_are_checked_and_existing_slugs_kept(self):
+        self.import_records([{'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'slug': 'desk-lamp', 'category': 'lamps'}])
+        self.assertEqual(Product.objects.get(sku='P-1').slug, 'desk-lamp-2')
+        self.import_records([{'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'slug': 'arc', 'category': 'lamps'}])
+        self.assertEqual(Product.objects.get(sku='P-1').slug, 'desk-lamp-2')
+
+    def test_new_products_get_free_slugs(self):
+        self.import_records([
+            {'type': 'product', 'sku': 'P-1', 'name': 'Desk lamp', 'category': 'lamps'},
+            {'type': 'product', 'sku': 'P-2', 'name': 'Desk lamp', 'category': 'lamps'},
+        ])
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)), ['desk-lamp', 'desk-lamp-2', 'desk-lamp-3']
+        )
+
+    def test_bad_records_are_reported_and_skipped(self):
+        importer = self.import_records([
+            {'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'category': 'nowhere'},
+            {'type': 'variant', 'product_sku': 'P-9', 'sku': 'V-1', 'name': 'Brass'},
+            {'type': 'widget'},
+        ])
+        self.assertEqual(sorted(line for line, _ in importer.errors), [1, 2, 3])
+        self.assertFalse(ProductVariant.objects.exists())
+
+    def test_command_resumes_after_the_checkpoint(self):
+        with TemporaryDirectory() as directory:
+            source = path.join(directory, 'catalog.jsonl')
+            checkpoint = path.join(directory, 'checkpoint.json')
+            with open(source, 'w') as handle:
+                for index in range(3):
+                    record = {'type': 'product', 'sku': f'P-{index}', 'name': f'Lamp {index}', 'category': 'lamps'}
+                    handle.write(dumps(record) + '\n')
+            with open(checkpoint, 'w') as handle:
+                handle.write(dumps({'source': source, 'records': 2}))
+            call_command('import_catalog', source, checkpoint=checkpoint, resume=True, stdout=StringIO())
+            with open(checkpoint) as handle:
+                self.assertEqual(loads(handle.read())['records'], 3)
+        self.assertEqual(list(Product.objects.filter(sku__startswith='P-').values_list('sku', flat=True)), ['P-2'])
+        with self.assertRaises(CommandError):
+            call_command('import_catalog', 'catalog.jsonl', resume=True)
+
+    def test_resume_refuses_another_files_checkpoint(self):
+        with TemporaryDirectory() as directory:
+            checkpoint = path.join(directory, 'checkpoint.json')
+            with open(checkpoint, 'w') as handle:
+                handle.write(dumps({'source': path.join(directory, 'old.jsonl'), 'records': 2}))
+            with self.assertRaisesMessage(CommandError, 'old.jsonl'):
+                call_command('import_catalog', path.join(directory, 'new.jsonl'), checkpoint=checkpoint, resume=True)
+
+
+class IdentifierTests(CatalogTestCase):
+    def test_skus_come_from_the_sequence(self):
+        allocator = SkuAllocator(name='test')
+        self.assertEqual(allocator.reserve(2), ['SKU-0000000001', 'SKU-0000000002'])
+        self.assertEqual(allocator.reserve(1), ['SKU-0000000003'])
+        first = Product.objects.create(name='Arc lamp', category=self.category)
+        second = Product.objects.create(name='Arc lamp', category=self.category)
+        self.assertNotEqual(first.sku, second.sku)
+        self.assertRegex(first.sku, r'^SKU-\d{10}$')
+
+    def test_slugs_are_unique_against_the_table_and_each_other(self):
+        Product.objects.create(name='Desk lamp', slug='desk-lamp-2', category=self.category)
+        Product.objects.create(name='Desk lamp shade', category=self.category)
+        self.assertEqual(
+            unique_slugs(['Desk lamp', 'Desk Lamp!', 'Floor lamp', '', 'Floor lamp'], Product),
+            ['desk-lamp-3', 'desk-lamp-4', 'floor-lamp', 'product', 'floor-lamp-2'],
+        )
+
+    def test_taken_slugs_are_read_with_range_predicates(self):
+        Product.objects.create(name='Desk lampshade', category=self.category)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(unique_slugs(['Desk lamp', 'Desk lampshade'], Product), ['desk-lamp-2', 'desk-lampshade-2'])
+        [query] = queries.captured_queries
+        self.assertNotIn('LIKE', query['sql'])
+
+    def test_long_names_leave_room_for_a_suffix(self):
+        name = 'lamp ' * 60
+        first, second = unique_slugs([name, name], Product)
+        self.assertLessEqual(len(second), Product._meta.get_field('slug').max_length)
+        self.assertEqual(second, f'{first}-2')
+
+    def test_reserved_slugs_are_never_handed_out(self):
+        self.assertEqual(unique_slugs(['Search', 'Suggest'], Product), ['search-2', 'suggest-2'])
+        with self.assertRaises(ValidationError):
+            validate_product_slug('search')
+
+
+class ReviewStatsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user('reviewer')
+        self.other = Product.objects.create(name='Floor lamp', category=self.category)
+
+    def review(self, rating, **kwargs):
+        return ProductReview.objects.create(product=self.product, user=self.user, rating=rating, comment='', **kwargs)
+
+    def test_stats_follow_review_edits_and_deletes(self):
+        self.review(5, is_verified=True)
+        moved = self.review(2)
+        self.review(4).delete()
+        moved.rating = 3
+        moved.product = self.other
+        moved.save()
+        stats = review_stats_for([self.product.pk, self.other.pk])
+        self.assertEqual(stats[self.product.pk]['count'], 1)
+        self.assertEqual(stats[self.product.pk]['verified'], 1)
+        self.assertEqual(stats[self.product.pk]['histogram'], {1: 0, 2: 0, 3: 0, 4: 0, 5: 1})
+        self.assertEqual(stats[self.other.pk]['average'], 3)
+
+    def test_products_without_reviews_get_zeros(self):
+        stats = review_stats_for([self.other.pk])[self.other.pk]
+        self.assertEqual((stats['count'], stats['average']), (0, None))
+
+    def test_recompute_repairs_drifted_counters(self):
+        self.review(4)
+        self.review(5)
+        ProductReviewStats.objects.update(review_count=9, rating_sum=1)
+        self.assertEqual(recompute_review_stats(batch_size=1), 2)
+        self.assertEqual(review_stats_for([self.product.pk])[self.product.pk]['average'], 4.5)
+
+
+class KeysetPaginationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        created = timezone.now() - timedelta(days=1)
+        for index in range(6):
+            product = Product.objects.create(name=f'Lamp {index}', category=self.category)
+            # Two products share a timestamp, so the id has to break the tie.
+            Product.objects.filter(pk=product.pk).update(created_at=created + timedelta(minutes=min(index, 4)))
+        self.url = reverse('catalog:category-products', args=[self.category.slug])
+
+    def test_pages_cover_every_product_once_in_order(self):
+        expected = list(Product.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(self.url, {'limit': 2, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen.extend(row['id'] for row in page['results'])
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_listing_rows_carry_the_price_range(self):
+        make_variant(self.product, 'LAMP-1', price='12.00', stock=2)
+        make_variant(self.product, 'LAMP-2', price='30.00')
+        row = next(row for row in self.client.get(self.url).json()['results'] if row['id'] == self.product.pk)
+        self.assertEqual((row['min_price'], row['max_price'], row['in_stock']), ('12.00', '30.00', True))
+
+    def test_detail_answers_conditional_requests(self):
+        url = reverse('catalog:product-detail', args=[self.product.slug])
+        first = self.client.get(url)
+        self.assertEqual(first.json()['id'], self.product.pk)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('catalog:product-detail', args=['no-such-lamp'])).status_code, 404)
+
+    def test_validators_follow_stock(self):
+        variant = make_variant(self.product, 'LAMP-1', price='12.00', stock=2)
+        refresh_effective_prices([variant.pk])
+        url = reverse('catalog:product-detail', args=[self.product.slug])
+        etag = self.client.get(url)['ETag']
+        # One aggregate per table the payload reads; the payload itself is never built.
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        apply_transaction(variant.pk, 'OUT', 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class CouponTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.coupon = Coupon.objects.create(
+            code='SAVE10', discount_type='percent', discount_value=10,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1), max_uses=2, max_uses_per_user=1,
+        )
+        self.alice, self.bob, self.carol = (
+            get_user_model().objects.create_user(username) for username in ('alice', 'bob', 'carol')
+        )
+
+    def test_per_user_limit(self):
+        redeem('SAVE10', self.alice)
+        with self.assertRaisesMessage(CouponError, "already used"):
+            redeem('SAVE10', self.alice)
+        self.assertEqual(CouponUsage.objects.count(), 1)
+
+    def test_global_limit(self):
+        redeem('SAVE10', self.alice)
+        redeem('SAVE10', self.bob)
+        with self.assertRaisesMessage(CouponError, "fully redeemed"):
+            redeem('SAVE10', self.carol)
+        self.assertEqual(Coupon.objects.get().times_used, 2)
+
+    def test_inactive_and_unknown_codes(self):
+        with self.assertRaises(CouponError):
+            redeem('NOPE', self.alice)
+        Coupon.objects.filter(pk=self.coupon.pk).update(valid_to=timezone.now() - timedelta(hours=1))
+        cache.clear()
+        with self.assertRaisesMessage(CouponError, "not active"):
+            redeem('SAVE10', self.alice)
+
+    def test_linked_products_limit_where_it_applies(self):
+        other = Product.objects.create(name='Office chair', category=self.category)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.products.add(self.product)
+        check_coupon('SAVE10', self.product.pk)
+        with self.assertRaisesMessage(CouponError, "does not apply"):
+            check_coupon('SAVE10', other.pk)
+
+    def test_coupons_without_products_are_order_level(self):
+        variant = make_variant(self.product, 'LAMP-1', price='20.00')
+        check_coupon('SAVE10')
+        with self.assertRaisesMessage(CouponError, "does not apply"):
+            check_coupon('SAVE10', self.product.pk)
+        self.assertEqual(effective_prices([variant.pk])[variant.pk], Decimal('20.00'))
+
+    def test_coupons_end_at_valid_to_in_checks_and_prices(self):
+        variant = make_variant(self.product, 'LAMP-1', price='20.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.products.add(self.product)
+        end = self.coupon.valid_to
+        check_coupon('SAVE10', self.product.pk, at=end - timedelta(microseconds=1))
+        self.assertEqual(effective_prices([variant.pk], at=end - timedelta(microseconds=1))[variant.pk], Decimal('18.00'))
+        with self.assertRaisesMessage(CouponError, "not active"):
+            check_coupon('SAVE10', self.product.pk, at=end)
+        self.assertEqual(effective_prices([variant.pk], at=end)[variant.pk], Decimal('20.00'))
+
+    def test_warm_checks_run_no_queries(self):
+        check_coupon('SAVE10')
+        with self.assertNumQueries(0):
+            check_coupon('SAVE10', at=timezone.now())
+
+    def uncounted_usages(self, *users):
+        # Usages recorded before the counters existed.
+        CouponUsage.objects.bulk_create(CouponUsage(coupon=self.coupon, user=user) for user in users)
+
+    def test_deleting_an_uncounted_usage_stops_at_zero(self):
+        self.uncounted_usages(self.alice)
+        CouponUsage.objects.get().delete()
+        self.assertEqual(Coupon.objects.get().times_used, 0)
+
+    def test_recount_restores_the_limits(self):
+        self.uncounted_usages(self.alice, self.bob)
+        self.assertEqual(recompute_usage_counters(batch_size=1), 1)
+        self.assertEqual(Coupon.objects.get().times_used, 2)
+        self.assertEqual(CouponUserUsage.objects.get(user=self.alice).times_used, 1)
+        cache.clear()
+        with self.assertRaisesMessage(CouponError, "fully redeemed"):
+            redeem('SAVE10', self.carol)
+
+
+class ShippingQuoteTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Rate tables are cached per process and ids are reused between tests.
+        invalidate_shipping()
+        self.chair = Product.objects.create(name='Office chair', category=self.category)
+        self.rate(self.product, 'post', '2.00', per_unit=True, days='3-5 business days')
+        self.rate(self.product, 'courier', '9.00', days='1 day')
+        self.rate(self.chair, 'post', '6.00', days='1 week')
+        self.rate(self.chair, 'freight', '20.00')
+
+    def rate(self, product, method, national, per_unit=False, days=None):
+        return ProductShipping.objects.create(
+            product=product, shipping_method=method, national_shipping_cost=Decimal(national),
+            shipping_cost_multiply_quantity=per_unit, estimated_delivery_time=days,
+        )
+
+    def test_only_methods_every_product_supports_are_quoted(self):
+        quote = quote_shipping([(self.product.pk, 2), (self.chair.pk, 1), (self.product.pk, 1)], 'national')
+        self.assertEqual(quote['options'], [('post', Decimal('12.00'), 7)])
+        self.assertEqual(quote['cheapest'], quote['fastest'])
+
+    def test_cheapest_and_fastest_can_differ(self):
+        quote = quote_shipping([(self.product.pk, 1)], 'national')
+        self.assertEqual(quote['cheapest'].method, 'post')
+        self.assertEqual(quote['fastest'].method, 'courier')
+
+    def test_edits_reach_the_cached_tables(self):
+        quote_shipping([(self.chair.pk, 1)], 'national')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductShipping.objects.filter(product=self.chair, shipping_method='freight').get().delete()
+        quote = quote_shipping([(self.chair.pk, 1)], 'national')
+        self.assertEqual([option.method for option in quote['options']], ['post'])
+
+    def test_unknown_zones_and_estimates(self):
+        with self.assertRaises(ValueError):
+            quote_shipping([(self.product.pk, 1)], 'orbital')
+        self.assertEqual(parse_delivery_days('2 to 3 weeks'), 21)
+        self.assertIsNone(parse_delivery_days('ask us'))
+
+
+class HistoryArchiveTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.base = start_of_day((self.now - timedelta(days=5)).date())
+        self.variant = make_variant(self.product, 'LAMP-1')
+
+    def record(self, transaction_type, quantity, at):
+        entry = apply_transaction(self.variant.pk, transaction_type, quantity)
+        InventoryTransaction.objects.filter(pk=entry.pk).update(transaction_date=at)
+
+    def reprice(self, new_price, at):
+        change = PriceHistory.objects.create(
+            product_variant=self.variant, old_price=self.variant.price, new_price=Decimal(new_price)
+        )
+        PriceHistory.objects.filter(pk=change.pk).update(changed_at=at)
+        self.variant.refresh_from_db()
+
+    def test_compaction_rolls_up_then_archives_old_days(self):
+        self.record('IN', 10, self.base + timedelta(hours=10))
+        self.record('OUT', 3, self.base + timedelta(hours=15))
+        self.record('IN', 5, self.base + timedelta(days=1, hours=9))
+        self.record('OUT', 2, self.now - timedelta(hours=1))
+
+        moved = compact_history(older_than_days=1, now=self.now)
+        self.assertEqual(moved['inventorytransaction'], 3)
+        self.assertEqual(InventoryTransaction.objects.count(), 1)
+        days = DailyStockMovement.objects.order_by('day')
+        self.assertEqual(
+            list(days.values_list('quantity_in', 'quantity_out', 'transaction_count')), [(10, 3, 2), (5, 0, 1)]
+        )
+        archived = list(archived_rows('inventorytransaction', product_variant_id=self.variant.pk))
+        self.assertEqual([row['quantity'] for row in archived], [10, 3, 5])
+        self.assertGreater(archived_before('inventorytransaction'), self.base + timedelta(days=1))
+        self.assertEqual(compact_history(older_than_days=1, now=self.now)['inventorytransaction'], 0)
+
+    def test_price_rollups_keep_the_days_open_and_close(self):
+        self.reprice('12.00', self.base + timedelta(hours=9))
+        self.reprice('9.00', self.base + timedelta(hours=17))
+        rollup_history(self.base)
+        day = DailyPriceChange.objects.get()
+        self.assertEqual(
+            (day.change_count, day.opening_price, day.closing_price, day.low_price, day.high_price),
+            (2, Decimal('10.00'), Decimal('9.00'), Decimal('9.00'), Decimal('12.00')),
+        )
+
+
+class PointInTimeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        base = start_of_day((self.now - timedelta(days=5)).date())
+        self.variant = make_variant(self.product, 'LAMP-1')
+        ProductVariant.objects.filter(pk=self.variant.pk).update(created_at=base)
+        ledger = [
+            ('IN', 10, base + timedelta(hours=10)),
+            ('OUT', 3, base + timedelta(hours=15)),
+            ('IN', 5, base + timedelta(days=1, hours=9)),
+            ('OUT', 2, self.now - timedelta(hours=1)),
+        ]
+        for transaction_type, quantity, at in ledger:
+            entry = apply_transaction(self.variant.pk, transaction_type, quantity)
+            InventoryTransaction.objects.filter(pk=entry.pk).update(transaction_date=at)
+        for new_price, at in (('12.00', base + timedelta(hours=12)), ('15.00', base + timedelta(days=2, hours=8))):
+            change = PriceHistory.objects.create(
+                product_variant=self.variant, old_price=self.variant.price, new_price=Decimal(new_price)
+            )
+            PriceHistory.objects.filter(pk=change.pk).update(changed_at=at)
+            self.variant.refresh_from_db()
+        self.points = {
+            base + timedelta(hours=11): (10, Decimal('10')),
+            base + timedelta(hours=13): (10, Decimal('12')),
+            base + timedelta(hours=16): (7, Decimal('12')),
+            base + timedelta(days=1, hours=10): (12, Decimal('12')),
+            base + timedelta(days=3): (12, Decimal('15')),
+            self.now: (10, Decimal('15')),
+        }
+
+    def assertPointsMatch(self):
+        for at, expected in self.points.items():
+            self.assertEqual(tuple(as_of([self.variant.pk], at)[self.variant.pk]), expected, at)
+
+    def test_as_of_replays_from_snapshots(self):
+        self.assertPointsMatch()
+        self.assertEqual(take_snapshots(at=self.now - timedelta(days=2)), 1)
+        self.assertEqual(VariantSnapshot.objects.get().stock_quantity, 12)
+        self.assertPointsMatch()
+
+    def test_as_of_survives_compaction(self):
+        moved = compact_history(older_than_days=1, now=self.now)
+        self.assertEqual((moved['inventorytransaction'], moved['pricehistory']), (3, 2))
+        self.assertPointsMatch()
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        ProductVariant.objects.filter(pk=self.variant.pk).update(stock_quantity=50)
+        drift = list(reconcile_stock(fix=True))
+        self.assertEqual([(item.recorded, item.expected) for item in drift], [(50, 10)])
+        self.assertEqual(self.stock(self.variant), 10)
+
+    def test_created_stock_gets_an_opening_balance(self):
+        variant = ProductVariant.objects.create(product=self.product, name='Shade', sku='SHADE-1', price=5, stock_quantity=7)
+        opening = InventoryTransaction.objects.get(product_variant=variant)
+        self.assertEqual((opening.transaction_type, opening.quantity, opening.description), ('IN', 7, OPENING_BALANCE))
+        self.assertEqual(self.stock(variant), 7)
+        self.assertEqual(list(reconcile_stock()), [])
+
+    def test_stock_without_history_is_reported_but_not_fixed(self):
+        variant = make_variant(self.product, 'SHADE-1')
+        ProductVariant.objects.filter(pk=variant.pk).update(stock_quantity=4)
+        ProductVariant.objects.filter(pk=self.variant.pk).update(stock_quantity=50)
+        drift = list(reconcile_stock(fix=True))
+        self.assertEqual([(item.sku, item.expected, item.has_history) for item in drift], [
+            ('LAMP-1', 10, True), ('SHADE-1', 0, False),
+        ])
+        self.assertEqual((self.stock(self.variant), self.stock(variant)), (10, 4))
+        self.assertEqual(record_opening_balances(), 1)
+        self.assertEqual(record_opening_balances(), 0)
+        self.assertEqual(list(reconcile_stock()), [])
+        self.assertEqual(list(reconcile_stock()), [])
+
+
+class SearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        chairs = make_category('Chairs', 'chairs')
+        self.brass = Product.objects.create(name='Brass floor lamp', category=self.category)
+        self.shade = Product.objects.create(name='Shade', description='Fits any desk lamp', category=self.category)
+        self.chair = Product.objects.create(name='Lamplighter chair', category=chairs)
+        make_variant(self.brass, 'BRASS-1', price='120.00')
+        make_variant(self.shade, 'SHADE-1', price='15.00')
+        # Index updates are queued for after the commit, which never comes in a test.
+        rebuild_search_index()
+
+    def test_admin_search_falls_back_until_the_index_is_built(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        search._index_built = False
+        self.assertIsNone(matching_products('brass'))
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        response = self.client.get('/admin/inventory/product/', {'q': 'brass'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.brass])
+        rebuild_search_index()
+        self.assertEqual(list(Product.objects.filter(pk__in=matching_products('brass'))), [self.brass])
+
+    def test_built_index_is_not_probed_again(self):
+        search._index_built = False
+        self.assertIsNotNone(matching_products('brass'))
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(matching_products('brass'))
+
+    def test_matches_are_ranked_by_field(self):
+        results = search_products('desk lamp')
+        self.assertEqual([hit.product_id for hit in results.hits], [self.product.pk, self.shade.pk])
+        self.assertEqual(results.total, 2)
+
+    def test_last_word_matches_as_a_prefix(self):
+        self.assertEqual(search_products('lam').total, 4)
+        self.assertEqual(search_products('lam', category_id=self.category.pk, min_price=100).total, 1)
+
+    def test_facets_count_the_filtered_matches(self):
+        facets = search_products('lam').facets
+        self.assertEqual(facets['category'], {self.category.pk: 3, self.chair.category_id: 1})
+        self.assertEqual(facets['price'], [{'min': 0, 'max': 25, 'count': 1}, {'min': 100, 'max': 250, 'count': 1}])
+
+    def test_suggestions_and_endpoints(self):
+        self.assertEqual([row['slug'] for row in suggest('lampl')], [self.chair.slug])
+        response = self.client.get(reverse('catalog:product-search'), {'q': 'brass', 'category': 'lamps'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.brass.pk])
+        response = self.client.get(reverse('catalog:product-suggest'), {'q': 'sha'})
+        self.assertEqual(response.json()['results'], [{'name': 'Shade', 'slug': self.shade.slug}])
+
+
+DELIVERED = []
+
+
+def collect_alerts(alerts):
+    DELIVERED.extend(alert.product_variant.sku for alert in alerts)
+
+
+def reject_alerts(alerts):
+    raise RuntimeError("mail server down")
+
+
+class StockAlertTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        DELIVERED.clear()
+        self.lamp = make_variant(self.product, 'LAMP-1', stock=10)
+        self.bulb = make_variant(self.product, 'BULB-1', stock=10)
+        ReorderPoint.objects.create(category=self.category, threshold=5)
+        ReorderPoint.objects.create(product_variant=self.bulb, threshold=2)
+
+    def move(self, variant, transaction_type, quantity):
+        apply_transaction(variant.pk, transaction_type, quantity)
+        # What the queued stock.alerts job does.
+        evaluate_stock_alerts([variant.pk])
+
+    def open_alerts(self):
+        alerts = StockAlert.objects.filter(resolved_at__isnull=True)
+        return list(alerts.values_list('product_variant__sku', 'threshold'))
+
+    def test_dips_open_one_alert_until_stock_recovers(self):
+        self.move(self.lamp, 'OUT', 5)
+        self.move(self.lamp, 'OUT', 1)
+        self.move(self.bulb, 'OUT', 5)
+        self.assertEqual(self.open_alerts(), [('LAMP-1', 5)])
+        self.move(self.lamp, 'IN', 2)
+        self.assertEqual(self.open_alerts(), [])
+        self.assertEqual(StockAlert.objects.count(), 1)
+
+    def test_ledger_writes_only_queue_a_check(self):
+        apply_many([(self.lamp.pk, 'OUT', 8), (self.bulb.pk, 'OUT', 1)])
+        apply_many([(self.lamp.pk, 'IN', 1)])
+        self.assertFalse(StockAlert.objects.exists())
+        queued = Job.objects.filter(name='stock.alerts', status=Job.STATUS_PENDING)
+        checked = sorted(payload['id'] for payload in queued.values_list('payload', flat=True))
+        self.assertEqual(checked, [self.lamp.pk, self.bulb.pk])
+        Job.objects.exclude(name='stock.alerts').delete()
+        self.assertEqual(jobs.run_batch(), 2)
+        self.assertEqual(self.open_alerts(), [('LAMP-1', 5)])
+
+    @override_settings(STOCK_ALERT_HANDLER='inventory.tests.collect_alerts')
+    def test_delivery_hands_each_alert_over_once(self):
+        self.move(self.bulb, 'OUT', 9)
+        self.assertEqual(deliver_stock_alerts(), 1)
+        self.assertEqual(deliver_stock_alerts(), 0)
+        self.assertEqual(DELIVERED, ['BULB-1'])
+
+    @override_settings(STOCK_ALERT_HANDLER='inventory.tests.reject_alerts')
+    def test_failed_deliveries_are_retried_up_to_the_limit(self):
+        self.move(self.bulb, 'OUT', 9)
+        with self.assertLogs('inventory.alerts', 'ERROR'):
+            self.assertEqual(deliver_stock_alerts(max_attempts=2), 0)
+            deliver_stock_alerts(max_attempts=2)
+        self.assertEqual(deliver_stock_alerts(max_attempts=2), 0)
+        alert = StockAlert.objects.get()
+        self.assertEqual((alert.attempts, alert.last_error), (2, 'mail server down'))
+
+
+CALLS = []
+
+
+@jobs.job('test-record', batch_size=2, max_attempts=3)
+def record_payloads(payloads):
+    CALLS.append(payloads)
+
+
+@jobs.job('test-broken', max_attempts=2)
+def broken(payloads):
+    raise RuntimeError("boom")
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_pending_keys_are_enqueued_once(self):
+        jobs.enqueue_ids('test-record', [1, 1, 2])
+        jobs.enqueue_ids('test-record', [2, 3])
+        keys = sorted(Job.objects.values_list('idempotency_key', flat=True))
+        self.assertEqual(keys, ['test-record:1', 'test-record:2', 'test-record:3'])
+
+    def test_claims_never_overlap(self):
+        jobs.enqueue_ids('test-record', [1, 2, 3])
+        name, first = jobs.claim_batch()
+        _, second = jobs.claim_batch()
+        self.assertEqual(name, 'test-record')
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertEqual(jobs.claim_batch(), (None, []))
+
+    def test_finished_batches_are_deleted(self):
+        jobs.enqueue_ids('test-record', [1, 2])
+        self.assertEqual(jobs.run_batch(), 2)
+        self.assertEqual(CALLS, [[{'id': 1}, {'id': 2}]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_back_off_then_fail(self):
+        jobs.enqueue('test-broken', [{'id': 1}])
+        with self.assertLogs('inventory.jobs', 'ERROR'):
+            jobs.run_batch()
+        retried = Job.objects.get()
+        self.assertEqual((retried.status, retried.attempts), (Job.STATUS_PENDING, 1))
+        self.assertGreater(retried.run_after, timezone.now())
+        self.assertIn('boom', retried.last_error)
+        self.assertEqual(jobs.run_batch(), 0)
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('inventory.jobs', 'ERROR'):
+            jobs.run_batch()
+        self.assertEqual(Job.objects.get().status, Job.STATUS_FAILED)
+
+    def test_stale_claims_are_recovered(self):
+        jobs.enqueue_ids('test-record', [1])
+        jobs.claim_batch()
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.recover_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get().status, Job.STATUS_PENDING)
+
+    def test_inline_types_run_after_commit(self):
+        with mock.patch.dict(jobs._registry, {'test-record': jobs._registry['test-record']._replace(inline=True)}):
+            with self.captureOnCommitCallbacks(execute=True):
+                jobs.enqueue_ids('test-record', [1, 1])
+                self.assertEqual(CALLS, [])
+        self.assertEqual(CALLS, [[{'id': 1}]])
+        self.assertFalse(Job.objects.exists())
+
+
+class ProductRollupTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chair = Product.objects.create(name='Office chair', category=self.category)
+        self.first = make_variant(self.product, 'LAMP-1', price='20.00', stock=4)
+        self.second = make_variant(self.product, 'LAMP-2', price='35.00')
+
+    def rollup(self, product):
+        return Product.objects.values_list('stock_quantity', 'min_price', 'max_price').get(pk=product.pk)
+
+    def test_ledger_and_variant_edits_move_the_rollups(self):
+        apply_many([(self.first.pk, 'OUT', 1), (self.second.pk, 'IN', 6)])
+        self.assertEqual(self.rollup(self.product), (9, Decimal('20.00'), Decimal('35.00')))
+        self.second.refresh_from_db()
+        self.second.price = Decimal('12.00')
+        self.second.save()
+        self.assertEqual(self.rollup(self.product), (9, Decimal('12.00'), Decimal('20.00')))
+
+    def test_moving_or_deleting_a_variant_updates_both_products(self):
+        self.first.refresh_from_db()
+        self.first.product = self.chair
+        self.first.save()
+        self.assertEqual(self.rollup(self.chair), (4, Decimal('20.00'), Decimal('20.00')))
+        self.assertEqual(self.rollup(self.product), (0, Decimal('35.00'), Decimal('35.00')))
+        self.second.delete()
+        self.assertEqual(self.rollup(self.product), (0, None, None))
+
+    def test_product_saves_keep_the_rollups(self):
+        product = Product.objects.get(pk=self.product.pk)
+        apply_transaction(self.second.pk, 'IN', 2)
+        product.name = 'Desk lamp, brass'
+        product.save()
+        self.assertEqual(self.rollup(self.product)[0], 6)
+
+    def test_recompute_repairs_drift(self):
+        Product.objects.update(stock_quantity=99, min_price=None)
+        self.assertEqual(recompute_product_rollups(batch_size=1), 2)
+        self.assertEqual(self.rollup(self.product), (4, Decimal('20.00'), Decimal('35.00')))
+        self.assertEqual(self.rollup(self.chair), (0, None, None))
+
+
+class BenchmarkSuiteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, **kwargs):
+        return seed_catalog(products=6, variants_per=2, reviews=1, categories=2, subcategories_per=2, coupons=2, **kwargs)
+
+    def catalog(self):
+        return list(ProductVariant.objects.order_by('sku').values_list('sku', 'price', 'stock_quantity', 'product__name'))
+
+    def test_the_same_seed_builds_the_same_catalog(self):
+        counts = self.seed(seed=7)
+        self.assertEqual((counts['product'], counts['variant']), (6, 12))
+        first = self.catalog()
+        self.assertEqual(list(reconcile_stock()), [])
+        with self.assertRaises(ValueError):
+            self.seed(seed=7)
+        clear_seed()
+        self.assertFalse(Product.objects.exists())
+        self.seed(seed=7)
+        self.assertEqual(self.catalog(), first)
+
+    def test_runner_reports_and_compares_metrics(self):
+        with self.assertRaises(BenchmarkError):
+            run_benchmarks(['stock_transaction'], iterations=1, warmup=0)
+        self.seed()
+        results = run_benchmarks(['stock_transaction', 'category_listing'], iterations=3, warmup=1)
+        self.assertEqual(set(results['results']), {'stock_transaction', 'category_listing'})
+        self.assertEqual(results['results']['category_listing']['iterations'], 3)
+        slower = {'results': {name: dict(row, p50_ms=row['p50_ms'] * 2) for name, row in results['results'].items()}}
+        regressed = {(item.benchmark, item.metric) for item in compare_results(results, slower) if item.regression}
+        self.assertEqual(regressed, {('stock_transaction', 'p50_ms'), ('category_listing', 'p50_ms')})
+
+
+class AsyncCatalogViewTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        variants = [
+            make_variant(self.product, 'LAMP-1', price='12.00', stock=2),
+            make_variant(self.product, 'LAMP-2', price='30.00'),
+        ]
+        Product.objects.create(name='Floor lamp', category=self.category)
+        # The refresh job runs on commit; without it the first read computes the prices and moves the validators.
+        refresh_effective_prices([variant.pk for variant in variants])
+
+    def assertSameResponse(self, name, *args):
+        sync = self.client.get(reverse(f'catalog:{name}', args=args))
+        async_ = self.client.get(reverse(f'catalog:async-{name}', args=args))
+        self.assertEqual(async_.status_code, sync.status_code)
+        self.assertEqual(async_.json(), sync.json())
+        self.assertEqual(async_['ETag'], sync['ETag'])
+        return async_
+
+    def test_async_views_serve_the_sync_payloads(self):
+        self.assertSameResponse('category-list')
+        self.assertEqual(len(self.assertSameResponse('category-products', self.category.slug).json()['results']), 2)
+        self.assertEqual(self.assertSameResponse('product-detail', self.product.slug).json()['name'], 'Desk lamp')
+
+    def test_async_detail_validators_and_missing_products(self):
+        url = reverse('catalog:async-product-detail', args=[self.product.slug])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(reverse('catalog:async-product-detail', args=['missing'])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse('catalog:async-category-products', args=['missing'])).status_code, 404,
+        )
+
+    def test_load_test_paths_target_the_chosen_views(self):
+        paths = catalog_paths('async', sample=2)
+        self.assertEqual(len(paths), 3)
+        self.assertTrue(all('/async/' in path for path in paths))
+        self.assertNotIn('/async/', ''.join(catalog_paths('sync', sample=2)))
+
+
+class TaxonomyTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.home = CategoryNode.objects.create(name='Home')
+        self.lighting = CategoryNode.objects.create(name='Lighting', parent=self.home)
+        self.lamps = CategoryNode.objects.create(name='Lamps', parent=self.lighting)
+        self.garden = CategoryNode.objects.create(name='Garden')
+        Product.objects.create(name='Floor lamp', category=self.category, node=self.lamps)
+        Product.objects.create(name='Pendant', category=self.category, node=self.lighting)
+
+    def counts(self):
+        # Nodes built from categories live alongside the hand-made tree.
+        return dict(CategoryNode.objects.filter(category=None).values_list('name', 'product_count'))
+
+    def test_subtree_listing_carries_breadcrumbs_and_children(self):
+        self.assertEqual(self.counts(), {'Home': 2, 'Lighting': 2, 'Lamps': 1, 'Garden': 0})
+        response = self.client.get(reverse('catalog:node-products', args=[self.lighting.slug]))
+        payload = response.json()
+        self.assertEqual(sorted(row['name'] for row in payload['results']), ['Floor lamp', 'Pendant'])
+        self.assertEqual([crumb['slug'] for crumb in payload['node']['breadcrumbs']], [self.home.slug])
+        self.assertEqual([child['slug'] for child in payload['node']['children']], [self.lamps.slug])
+        self.assertEqual(self.client.get(reverse('catalog:node-products', args=['missing'])).status_code, 404)
+
+    def test_moving_a_subtree_moves_its_products_and_counts(self):
+        self.lighting.parent = self.garden
+        self.lighting.save()
+        self.assertEqual(self.counts(), {'Home': 0, 'Lighting': 2, 'Lamps': 1, 'Garden': 2})
+        lamps = CategoryNode.objects.get(pk=self.lamps.pk)
+        self.assertEqual((lamps.depth, lamps.path[:PATH_STEP]), (2, segment(self.garden.pk)))
+        self.assertEqual(subtree_products(CategoryNode.objects.get(pk=self.garden.pk).path).count(), 2)
+        self.assertFalse(subtree_products(CategoryNode.objects.get(pk=self.home.pk).path).exists())
+
+    def test_a_node_cannot_move_below_itself(self):
+        self.home.parent = self.lamps
+        with self.assertRaises(ValidationError):
+            self.home.save()
+        self.assertIsNone(CategoryNode.objects.get(pk=self.home.pk).parent_id)
+
+    def test_refiling_and_deleting_products_update_counts(self):
+        product = Product.objects.get(name='Floor lamp')
+        product.node = self.garden
+        product.save()
+        self.assertEqual(self.counts(), {'Home': 1, 'Lighting': 1, 'Lamps': 0, 'Garden': 1})
+        product.delete()
+        self.assertEqual(self.counts()['Garden'], 0)
+
+    def test_building_from_categories_covers_legacy_rows(self):
+        # bulk_create sends no signals, like rows written before the tree existed.
+        [rugs] = Category.objects.bulk_create([
+            Category(name='Rugs', slug='rugs', thumbnail='category_thumbnails/test.png'),
+        ])
+        rug = Product.objects.create(name='Wool rug', category=rugs)
+        self.assertIsNone(rug.node_id)
+        self.assertEqual(build_from_categories(), {'nodes': 1, 'products': 1})
+        node = CategoryNode.objects.get(category=rugs)
+        self.assertEqual((Product.objects.get(pk=rug.pk).node_path, node.product_count), (node.path, 1))
+        self.assertEqual(build_from_categories(), {'nodes': 0, 'products': 0})
+
+    def test_subcategory_nodes_follow_their_category(self):
+        subcategory = Subcategory.objects.create(category=self.category, name='Desk', slug='desk')
+        node = CategoryNode.objects.get(subcategory=subcategory)
+        self.assertEqual(node.parent, CategoryNode.objects.get(category=self.category))
+        clip = Product.objects.create(name='Clip lamp', category=self.category, subcategory=subcategory)
+        self.assertEqual(Product.objects.get(pk=clip.pk).node_path, node.path)
+        office = make_category('Office', 'office')
+        subcategory.category = office
+        subcategory.save()
+        office_node = CategoryNode.objects.get(category=office)
+        self.assertEqual(CategoryNode.objects.get(pk=node.pk).parent, office_node)
+        self.assertTrue(Product.objects.get(pk=clip.pk).node_path.startswith(office_node.path))
+        self.assertEqual(office_node.product_count, 1)
+        self.assertEqual(CategoryNode.objects.get(category=self.category).product_count, 1)
+
+    def test_imported_products_are_filed_and_follow_category_changes(self):
+        record = {'type': 'product', 'sku': 'P-1', 'name': 'Arc lamp', 'category': 'lamps'}
+        CatalogImporter().run([record])
+        lamps = CategoryNode.objects.get(category=self.category)
+        self.assertEqual(Product.objects.get(sku='P-1').node_id, lamps.pk)
+        office = make_category('Office', 'office')
+        CatalogImporter().run([dict(record, category='office')])
+        office_node = CategoryNode.objects.get(category=office)
+        self.assertEqual(Product.objects.get(sku='P-1').node_path, office_node.path)
+        counts = dict(CategoryNode.objects.filter(pk__in=[lamps.pk, office_node.pk]).values_list('pk', 'product_count'))
+        self.assertEqual(counts, {lamps.pk: 1, office_node.pk: 1})
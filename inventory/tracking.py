@@ -0,0 +1,103 @@
+# inventory/tracking.py
+from django.db import models
+
+
+class TrackedFieldsMixin(models.Model):
+    """
+    Remember the database values of ``tracked_fields`` for each loaded instance.
+
+    Values are captured in ``from_db`` and refreshed after every save, so
+    signal receivers can tell what changed without re-fetching the row.
+    """
+    tracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls._tracked_attnames()
+        }
+        if len(loaded) == len(cls._tracked_attnames()):
+            instance._loaded_values = loaded
+        return instance
+
+    @classmethod
+    def _tracked_attnames(cls):
+        return tuple(cls._meta.get_field(name).attname for name in cls.tracked_fields)
+
+    def has_snapshot(self):
+        return getattr(self, '_loaded_values', None) is not None
+
+    def get_loaded_value(self, field_name):
+        """
+        Return the value ``field_name`` had when the instance was loaded or last saved.
+        """
+        return self._loaded_values[self._meta.get_field(field_name).attname]
+
+    def changed_fields(self):
+        """
+        Return ``{field_name: (old, new)}`` for tracked fields that differ from the snapshot.
+        """
+        if not self.has_snapshot():
+            return {}
+        changes = {}
+        for name in self.tracked_fields:
+            attname = self._meta.get_field(name).attname
+            old, new = self._loaded_values[attname], getattr(self, attname)
+            if old != new:
+                changes[name] = (old, new)
+        return changes
+
+    def take_snapshot(self, update_fields=None):
+        """
+        Record the current values as stored, limited to ``update_fields`` when given.
+        """
+        current = dict(self._loaded_values) if self.has_snapshot() else {}
+        for name in self.tracked_fields:
+            field = self._meta.get_field(name)
+            if update_fields is None or name in update_fields or field.attname in update_fields:
+                current[field.attname] = getattr(self, field.attname)
+        if len(current) == len(self.tracked_fields):
+            self._loaded_values = current
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # The reloaded values are the stored ones now.
+        self.take_snapshot(fields)
+
+    def pop_changes(self, update_fields=None):
+        """
+        Mark the pending changes as stored and keep them in ``saved_changes``.
+        """
+        changes = self.changed_fields()
+        if update_fields is not None:
+            changes = {name: change for name, change in changes.items() if name in update_fields}
+        self.take_snapshot(update_fields)
+        self.saved_changes = changes
+        return changes
+
+
+def prime_snapshots(instances):
+    """
+    Load snapshots for instances built outside the ORM with one query per model.
+
+    Bulk paths that construct instances by hand call this before saving them
+    so history receivers still see the stored values.
+    """
+    pending = {}
+    for instance in instances:
+        if not instance.has_snapshot() and instance.pk is not None:
+            pending.setdefault(type(instance), []).append(instance)
+    for model, group in pending.items():
+        attnames = model._tracked_attnames()
+        stored = {
+            row[0]: row[1:]
+            for row in model._default_manager.filter(pk__in=[obj.pk for obj in group]).values_list('pk', *attnames)
+        }
+        for instance in group:
+            if instance.pk in stored:
+                instance._loaded_values = dict(zip(attnames, stored[instance.pk]))
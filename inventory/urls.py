@@ -0,0 +1,21 @@
+from django.urls import path
+
+from . import async_views, views
+
+app_name = 'catalog'
+
+urlpatterns = [
+    path('categories/', views.category_list, name='category-list'),
+    path('categories/<slug:slug>/products/', views.category_products, name='category-products'),
+    path('subcategories/<slug:slug>/products/', views.subcategory_products, name='subcategory-products'),
+    path('nodes/<slug:slug>/products/', views.node_products, name='node-products'),
+    # Products never get these slugs (validators.RESERVED_PRODUCT_SLUGS), so the paths below cannot shadow one.
+    path('products/search/', views.product_search, name='product-search'),
+    path('products/suggest/', views.product_suggest, name='product-suggest'),
+    path('products/<slug:slug>/', views.product_detail, name='product-detail'),
+    # The same reads as async views, for ASGI deployments.
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+    path('async/categories/<slug:slug>/products/', async_views.category_products, name='async-category-products'),
+    path('async/subcategories/<slug:slug>/products/', async_views.subcategory_products, name='async-subcategory-products'),
+    path('async/products/<slug:slug>/', async_views.product_detail, name='async-product-detail'),
+]
@@ -1,9 +1,55 @@
+import warnings
+
 from django.core.exceptions import ValidationError
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
+
+ALLOWED_IMAGE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+MAX_IMAGE_PIXELS = 25_000_000  # e.g. 5000 x 5000
+# Fixed paths under products/ in inventory.urls; a product with one of these slugs could not be reached.
+RESERVED_PRODUCT_SLUGS = ('search', 'suggest')
+
+
+def read_image_header(image):
+    """
+    Return ``(format, width, height)`` from the image header without decoding pixels.
+
+    Image.open only parses the header; nothing here calls load(). Images whose
+    declared size trips Pillow's decompression-bomb guard are rejected.
+    """
+    image.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(image) as img:
+                header = img.format, img.width, img.height
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError("The image dimensions are too large.")
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise ValidationError("Upload a valid image. The file you uploaded was either not an image or a corrupted image.")
+    finally:
+        image.seek(0)
+    return header
+
+
+def validate_image(image, max_size, max_pixels=MAX_IMAGE_PIXELS):
+    if image.size > max_size:
+        raise ValidationError(f"The maximum file size allowed is {max_size // (1024 * 1024)} MB.")
+    image_format, width, height = read_image_header(image)
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValidationError(f"Unsupported image format: {image_format}.")
+    if width * height > max_pixels:
+        raise ValidationError("The image dimensions are too large.")
+
 
 def validate_thumbnail_size(image):
-    img = Image.open(image)
     # Example validation: Limit to 2 MB
-    max_size = 2 * 1024 * 1024  # 2 MB
-    if image.size > max_size:
-        raise ValidationError("The maximum file size allowed is 2 MB.")
+    validate_image(image, max_size=2 * 1024 * 1024)
+
+
+def validate_product_image(image):
+    validate_image(image, max_size=10 * 1024 * 1024)
+
+
+def validate_product_slug(slug):
+    if slug in RESERVED_PRODUCT_SLUGS:
+        raise ValidationError(f"The slug {slug!r} is reserved for the catalog API.")
@@ -1,3 +1,443 @@
-from django.shortcuts import render
+import base64
+import hashlib
+import json
+from datetime import datetime
 
-# Create your views here.
+from django.core.exceptions import BadRequest
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+
+from .catalog_cache import catalog_version, get_catalog_tree, get_product_by_slug
+from .images import stored_rendition_url
+from .models import CategoryNode, Product, ProductImage, ProductReviewStats, ProductShipping, ProductVariant
+from .pricing import current_effective_prices
+from .repricing import parse_price
+from .reviews import review_stats_for
+from .search import search_products, suggest
+from .taxonomy import ancestors, subtree_products
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# Listing rows leave out the description and SEO text columns.
+LIST_FIELDS = ('id', 'name', 'slug', 'sku', 'category_id', 'subcategory_id', 'stock_quantity', 'created_at', 'updated_at')
+
+
+def make_etag(*parts):
+    return f'"{hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()}"'
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Return a 304 if the client's copy matches ``etag`` and ``last_modified``, else None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def conditional_json(request, payload, last_modified=None, etag=None):
+    """
+    Return ``payload`` as JSON with an ETag and Last-Modified, or a 304 if the client is current.
+
+    Without ``etag`` the body is hashed, so a 304 still costs the whole
+    payload; views that can derive validators from catalog_validators()
+    check not_modified() before building the payload and pass them in.
+    """
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    etag = etag or make_etag(body)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
+
+
+def validator_aggregates(product_ids, now):
+    """
+    (queryset, aggregates) pairs covering everything catalog pages show for ``product_ids``.
+
+    Stock and price writes bump the variant's updated_at, and an effective
+    price changes when it is recomputed or its window lapses, so these
+    change whenever the payload would.
+    """
+    return [
+        (ProductVariant.objects.filter(product_id__in=product_ids), dict(
+            count=Count('pk'),
+            updated=Max('updated_at'),
+            priced=Max('effective_price__computed_at'),
+            lapsed=Max('effective_price__valid_until', filter=Q(effective_price__valid_until__lte=now)),
+        )),
+        (ProductImage.objects.filter(product_id__in=product_ids), dict(
+            count=Count('pk'), digests=Count('image_digest'), updated=Max('updated_at'),
+        )),
+        (ProductShipping.objects.filter(product_id__in=product_ids), dict(count=Count('pk'), updated=Max('updated_at'))),
+        (ProductReviewStats.objects.filter(product_id__in=product_ids), dict(updated=Max('updated_at'))),
+    ]
+
+
+def combine_validators(rows, aggregates, *parts):
+    """
+    ETag and Last-Modified from product ``rows``, the results of validator_aggregates() and other ``parts`` of the payload.
+    """
+    stamps = [row['updated_at'] for row in rows]
+    etag_parts = [(row['id'], row['updated_at']) for row in rows] + list(parts)
+    for result in aggregates:
+        etag_parts.append(sorted(result.items()))
+        stamps.extend(value for value in result.values() if isinstance(value, datetime))
+    return make_etag(*etag_parts), max(stamps, default=None)
+
+
+def catalog_validators(rows, *parts):
+    """
+    ETag and Last-Modified for a payload built from product ``rows``, without building it.
+
+    Costs a handful of aggregate queries, so a 304 skips loading variants,
+    prices, images and review stats and serializing them.
+    """
+    pairs = validator_aggregates([row['id'] for row in rows], timezone.now())
+    return combine_validators(rows, [queryset.aggregate(**expressions) for queryset, expressions in pairs], catalog_version(), *parts)
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise BadRequest("Invalid cursor.")
+
+
+def query_decimal(request, name):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return parse_price(value)
+    except ValueError:
+        raise BadRequest(f"Invalid {name}.")
+
+
+def page_size(request):
+    try:
+        return max(1, min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+
+
+def keyset_rows(queryset, request):
+    """
+    Return the rows of one page of ``queryset`` newest first, continuing after ``?cursor=``, and the page size.
+
+    Seeks on (created_at, id) instead of using OFFSET, so deep pages cost the
+    same as the first one. One extra row is fetched to tell whether there is
+    a next page; split_page() takes it off.
+    """
+    limit = page_size(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, pk__gte=pk)
+    return queryset.order_by('-created_at', '-pk').values(*LIST_FIELDS)[:limit + 1], limit
+
+
+def split_page(rows, limit):
+    next_cursor = encode_cursor(rows[limit - 1]['created_at'], rows[limit - 1]['id']) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def keyset_page(queryset, request):
+    """
+    Return one page of ``queryset`` and the cursor of the next one.
+    """
+    rows, limit = keyset_rows(queryset, request)
+    return split_page(list(rows), limit)
+
+
+def summary_querysets(product_ids):
+    """
+    The variant and image rows product_summaries() needs for a page.
+    """
+    return (
+        ProductVariant.objects.filter(product_id__in=product_ids).values('id', 'product_id', 'price', 'stock_quantity'),
+        ProductImage.objects.filter(product_id__in=product_ids).order_by('-is_main', 'pk').values('product_id', 'image', 'image_digest'),
+    )
+
+
+def main_images(image_rows):
+    images = {}
+    for image in image_rows:
+        images.setdefault(image['product_id'], image)
+    return images
+
+
+def assemble_summaries(rows, variant_rows, effective, images, stats):
+    variants = {}
+    for variant in variant_rows:
+        variants.setdefault(variant['product_id'], []).append(variant)
+    summaries = []
+    for row in rows:
+        group = variants.get(row['id'], [])
+        prices = [effective.get(variant['id'], variant['price']) for variant in group]
+        image = images.get(row['id']) or {'image': None, 'image_digest': None}
+        summaries.append(dict(
+            row,
+            min_price=min(prices, default=None),
+            max_price=max(prices, default=None),
+            in_stock=row['stock_quantity'] > 0,
+            image=default_storage.url(image['image']) if image['image'] else None,
+            thumbnail=stored_rendition_url(image['image'], 'thumbnail', digest=image['image_digest']),
+            reviews=stats[row['id']],
+        ))
+    return summaries
+
+
+def product_summaries(rows):
+    """
+    Attach price range, effective prices, main image and review stats to listing rows.
+
+    Runs a fixed number of queries for the whole page.
+    """
+    product_ids = [row['id'] for row in rows]
+    variant_queryset, image_queryset = summary_querysets(product_ids)
+    variant_rows = list(variant_queryset)
+    effective = current_effective_prices(variant['id'] for variant in variant_rows)
+    images = main_images(image_queryset)
+    stats = review_stats_for(product_ids)
+    return assemble_summaries(rows, variant_rows, effective, images, stats)
+
+
+def in_stock_only(request):
+    return request.GET.get('in_stock') in ('1', 'true')
+
+
+def listing_queryset(request, queryset):
+    if in_stock_only(request):
+        # Served by the partial in-stock listing indexes.
+        queryset = queryset.filter(stock_quantity__gt=0)
+    return queryset
+
+
+def listing_response(request, summaries, next_cursor, validators, **extra):
+    payload = {'results': summaries, 'next': next_cursor, **extra}
+    etag, last_modified = validators
+    return conditional_json(request, payload, last_modified, etag=etag)
+
+
+def product_list_response(request, queryset):
+    rows, next_cursor = keyset_page(listing_queryset(request, queryset), request)
+    validators = catalog_validators(rows, next_cursor)
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    return listing_response(request, product_summaries(rows), next_cursor, validators)
+
+
+def category_payload(tree):
+    return [
+        {
+            'id': category['id'],
+            'name': category['name'],
+            'slug': category['slug'],
+            'subcategories': [
+                {'id': sub['id'], 'name': sub['name'], 'slug': sub['slug']}
+                for sub in category['subcategories']
+            ],
+        }
+        for category in tree
+    ]
+
+
+@require_GET
+def category_list(request):
+    """
+    Categories with their subcategories, served from the catalog cache.
+    """
+    etag = make_etag('categories', catalog_version())
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return conditional_json(request, category_payload(get_catalog_tree()), etag=etag)
+
+
+def find_taxonomy_id(tree, slug, subcategory=False):
+    for category in tree:
+        if not subcategory and category['slug'] == slug:
+            return category['id']
+        for sub in category['subcategories'] if subcategory else ():
+            if sub['slug'] == slug:
+                return sub['id']
+    raise Http404("No category matches the given query.")
+
+
+def taxonomy_id(slug, subcategory=False):
+    """
+    Resolve a category or subcategory slug from the cached tree, without a query.
+    """
+    return find_taxonomy_id(get_catalog_tree(), slug, subcategory)
+
+
+@require_GET
+def category_products(request, slug):
+    return product_list_response(request, Product.objects.filter(category_id=taxonomy_id(slug)))
+
+
+@require_GET
+def subcategory_products(request, slug):
+    return product_list_response(request, Product.objects.filter(subcategory_id=taxonomy_id(slug, subcategory=True)))
+
+
+def detail_querysets(product_id):
+    """
+    The variant, image and shipping rows of a product detail page.
+    """
+    return (
+        ProductVariant.objects.filter(product_id=product_id).order_by('pk')
+        .values('id', 'name', 'sku', 'price', 'stock_quantity', 'updated_at'),
+        ProductImage.objects.filter(product_id=product_id).order_by('-is_main', 'pk').values('image', 'image_digest', 'is_main'),
+        ProductShipping.objects.filter(product_id=product_id).values(
+            'shipping_method', 'local_shipping_cost', 'regional_shipping_cost', 'national_shipping_cost',
+            'shipping_cost_multiply_quantity', 'estimated_delivery_time',
+        ),
+    )
+
+
+def detail_response(request, product, variants, effective, image_rows, shipping, stats, validators):
+    for variant in variants:
+        variant['effective_price'] = effective.get(variant['id'], variant['price'])
+    images = [
+        {
+            'url': default_storage.url(image['image']),
+            'thumbnail': stored_rendition_url(image['image'], 'thumbnail', digest=image['image_digest']),
+            'medium': stored_rendition_url(image['image'], 'medium', digest=image['image_digest']),
+            'is_main': image['is_main'],
+        }
+        for image in image_rows if image['image']
+    ]
+    payload = dict(
+        product,
+        # The cached product row does not carry stock, which moves with every ledger write.
+        stock_quantity=sum(variant['stock_quantity'] for variant in variants),
+        variants=variants,
+        images=images,
+        shipping=shipping,
+        reviews=stats[product['id']],
+    )
+    etag, last_modified = validators
+    return conditional_json(request, payload, last_modified, etag=etag)
+
+
+@require_GET
+def node_products(request, slug):
+    """
+    Products in a category node and every node below it, with the node's breadcrumbs and children.
+    """
+    node = CategoryNode.objects.filter(slug=slug).values('id', 'name', 'slug', 'path', 'depth', 'product_count').first()
+    if node is None:
+        raise Http404("No category matches the given query.")
+    rows, next_cursor = keyset_page(listing_queryset(request, subtree_products(node['path'])), request)
+    node['breadcrumbs'] = list(ancestors(node['path'], include_self=False).values('name', 'slug'))
+    node['children'] = list(CategoryNode.objects.filter(parent_id=node['id']).order_by('name').values('name', 'slug', 'product_count'))
+    del node['path']
+    validators = catalog_validators(rows, next_cursor, json.dumps(node, sort_keys=True))
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    return listing_response(request, product_summaries(rows), next_cursor, validators, node=node)
+
+
+@require_GET
+def product_detail(request, slug):
+    """
+    A product with its variants, images, shipping options and review stats.
+    """
+    product = get_product_by_slug(slug)
+    if product is None:
+        raise Http404("No product matches the given query.")
+    validators = catalog_validators([product])
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    variant_queryset, image_queryset, shipping_queryset = detail_querysets(product['id'])
+    variants = list(variant_queryset)
+    return detail_response(
+        request, product, variants,
+        current_effective_prices(variant['id'] for variant in variants),
+        list(image_queryset),
+        list(shipping_queryset),
+        review_stats_for([product['id']]),
+        validators,
+    )
+
+
+@require_GET
+def product_search(request):
+    """
+    Ranked full-text product search with category, subcategory and price facets.
+
+    Paged with ``?page=``; filters are ``category`` and ``subcategory`` slugs
+    plus ``min_price`` and ``max_price``.
+    """
+    limit = page_size(request)
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        raise BadRequest("Invalid page.")
+    category = request.GET.get('category')
+    subcategory = request.GET.get('subcategory')
+    results = search_products(
+        request.GET.get('q', ''),
+        category_id=taxonomy_id(category) if category else None,
+        subcategory_id=taxonomy_id(subcategory, subcategory=True) if subcategory else None,
+        min_price=query_decimal(request, 'min_price'),
+        max_price=query_decimal(request, 'max_price'),
+        limit=limit,
+        offset=(page - 1) * limit,
+    )
+    rows = {row['id']: row for row in Product.objects.filter(pk__in=[hit.product_id for hit in results.hits]).values(*LIST_FIELDS)}
+    ordered = [rows[hit.product_id] for hit in results.hits if hit.product_id in rows]
+    names = {}
+    for category_node in get_catalog_tree():
+        names['category', category_node['id']] = {'slug': category_node['slug'], 'name': category_node['name']}
+        for sub in category_node['subcategories']:
+            names['subcategory', sub['id']] = {'slug': sub['slug'], 'name': sub['name']}
+    payload = {
+        'results': product_summaries(ordered),
+        'total': results.total,
+        'page': page,
+        'facets': {
+            'category': [
+                dict(names.get(('category', pk), {'slug': None, 'name': None}), id=pk, count=count)
+                for pk, count in sorted(results.facets['category'].items(), key=lambda item: -item[1])
+            ],
+            'subcategory': [
+                dict(names.get(('subcategory', pk), {'slug': None, 'name': None}), id=pk, count=count)
+                for pk, count in sorted(results.facets['subcategory'].items(), key=lambda item: -item[1])
+            ],
+            'price': results.facets['price'],
+        },
+    }
+    return conditional_json(request, payload)
+
+
+@require_GET
+def product_suggest(request):
+    """
+    Typeahead suggestions: products whose name starts with the typed words.
+    """
+    return conditional_json(request, {'results': suggest(request.GET.get('q', ''), limit=min(page_size(request), 20))})
@@ -1,3 +1,30 @@
 from django.contrib import admin
+from .models import Order, OrderLine
+from .services import release_orders
 
-# Register your models here.
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    readonly_fields = ('product_variant', 'quantity', 'base_price', 'unit_price', 'line_total')
+    can_delete = False
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'subtotal', 'reserved_until', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('id', 'user__username')
+    list_filter = ('status', 'created_at')
+    inlines = [OrderLineInline]
+    actions = ['cancel_orders']
+    # Status only changes through the order services, which move stock with it.
+    readonly_fields = ('user', 'status', 'subtotal', 'reserved_until', 'created_at', 'updated_at')
+    fieldsets = (
+        (None, {'fields': ('user', 'status', 'subtotal', 'reserved_until')}),
+        ('Dates', {'fields': ('created_at', 'updated_at')}),
+    )
+
+    @admin.action(description="Cancel selected pending orders and restock")
+    def cancel_orders(self, request, queryset):
+        released = release_orders(list(queryset.values_list('pk', flat=True)), Order.STATUS_CANCELLED, "Cancelled")
+        self.message_user(request, f"Cancelled {len(released)} pending orders.")
+
+admin.site.register(Order, OrderAdmin)
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.services import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Expire pending orders whose stock reservation has lapsed and return the stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--every', type=int, metavar='SECONDS', help="Keep running, sweeping every SECONDS.")
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations(batch_size=options['batch_size'])
+            if released or options['verbosity'] > 1:
+                self.stdout.write(f"Released {released} expired reservations.")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
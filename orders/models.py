@@ -1,3 +1,49 @@
 from django.db import models
 
-# Create your models here.
+
+class Order(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_CONFIRMED = 'confirmed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_CONFIRMED, 'Confirmed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.SET_NULL, related_name='orders', null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reserved_until = models.DateTimeField(blank=True, null=True, help_text="Stock is released if the order is still pending after this.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user']),
+            models.Index(fields=['status', 'reserved_until']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.pk} ({self.status})"
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    product_variant = models.ForeignKey('inventory.ProductVariant', on_delete=models.PROTECT, related_name='order_lines')
+    quantity = models.PositiveIntegerField()
+    base_price = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Effective price when the order was placed.")
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order']),
+            models.Index(fields=['product_variant']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_variant_id} on order #{self.order_id}"
@@ -0,0 +1,138 @@
+# orders/services.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.ledger import apply_many
+from inventory.pricing import price_details
+
+from .models import Order, OrderLine
+
+
+class OrderError(Exception):
+    pass
+
+
+def normalize_cart(cart):
+    """
+    Merge ``(variant_id, quantity)`` pairs (or a ``{variant_id: quantity}`` dict) per variant.
+    """
+    items = cart.items() if hasattr(cart, 'items') else cart
+    quantities = {}
+    for variant_id, quantity in items:
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise OrderError(f"Quantity for variant {variant_id} must be positive.")
+        quantities[int(variant_id)] = quantities.get(int(variant_id), 0) + quantity
+    if not quantities:
+        raise OrderError("The cart is empty.")
+    return quantities
+
+
+def reservation_window():
+    return timedelta(minutes=getattr(settings, 'ORDER_RESERVATION_MINUTES', 15))
+
+
+def place_order(cart, user=None):
+    """
+    Reserve stock for every line and record a pending order.
+
+    Prices are snapshotted before the transaction opens, so the transaction
+    itself only holds the order INSERT, the ledger's ordered row locks, one
+    guarded stock UPDATE for all lines, and two bulk INSERTs (ledger rows and
+    order lines). Raises InsufficientStock, and writes nothing, if any line
+    cannot be filled.
+    """
+    quantities = normalize_cart(cart)
+    prices = price_details(quantities)
+    missing = quantities.keys() - prices.keys()
+    if missing:
+        raise OrderError(f"Unknown variant(s): {', '.join(map(str, sorted(missing)))}")
+
+    lines = [
+        OrderLine(
+            product_variant_id=variant_id,
+            quantity=quantity,
+            base_price=prices[variant_id][0],
+            unit_price=prices[variant_id][1],
+            line_total=prices[variant_id][1] * quantity,
+        )
+        for variant_id, quantity in sorted(quantities.items())
+    ]
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            subtotal=sum(line.line_total for line in lines),
+            reserved_until=timezone.now() + reservation_window(),
+        )
+        apply_many([
+            (line.product_variant_id, 'OUT', line.quantity, f"Reserved for order #{order.pk}")
+            for line in lines
+        ])
+        for line in lines:
+            line.order = order
+        OrderLine.objects.bulk_create(lines)
+    return order
+
+
+def confirm_order(order):
+    """
+    Turn a pending reservation into a confirmed order; False if it already expired or was cancelled.
+    """
+    confirmed = Order.objects.filter(
+        pk=order.pk, status=Order.STATUS_PENDING, reserved_until__gt=timezone.now()
+    ).update(status=Order.STATUS_CONFIRMED, updated_at=timezone.now())
+    if confirmed:
+        order.status = Order.STATUS_CONFIRMED
+    return bool(confirmed)
+
+
+def release_orders(order_ids, status, reason):
+    """
+    Move pending orders to ``status`` and put their stock back; returns the ids released.
+
+    The orders still pending are locked in primary key order and only those
+    are moved and restocked, so an order confirmed or released concurrently
+    is never restocked twice.
+    """
+    with transaction.atomic():
+        released = list(
+            Order.objects.select_for_update().filter(pk__in=order_ids, status=Order.STATUS_PENDING)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        Order.objects.filter(pk__in=released).update(status=status, updated_at=timezone.now())
+        apply_many([
+            (variant_id, 'IN', quantity, f"{reason} order #{order_id}")
+            for order_id, variant_id, quantity in OrderLine.objects.filter(order_id__in=released)
+            .order_by('order_id', 'product_variant_id')
+            .values_list('order_id', 'product_variant_id', 'quantity')
+        ])
+    return released
+
+
+def cancel_order(order):
+    released = release_orders([order.pk], Order.STATUS_CANCELLED, "Cancelled")
+    if released:
+        order.status = Order.STATUS_CANCELLED
+    return bool(released)
+
+
+def release_expired_reservations(batch_size=200, now=None):
+    """
+    Expire pending orders whose reservation has lapsed and restock them, in batches.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status=Order.STATUS_PENDING, reserved_until__lt=now)
+                .order_by('reserved_until')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                return total
+            total += len(release_orders(order_ids, Order.STATUS_EXPIRED, "Reservation expired for"))
@@ -1,3 +1,92 @@
+# orders/tests.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from inventory.ledger import InsufficientStock, apply_many
+from inventory.models import Category, InventoryTransaction, Product, ProductVariant
+
+from .models import Order, OrderLine
+from .services import (
+    OrderError, cancel_order, confirm_order, place_order, release_expired_reservations, release_orders
+)
+
+
+class OrderServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Lamps', slug='lamps', thumbnail='category_thumbnails/test.png')
+        product = Product.objects.create(name='Desk lamp', category=category)
+        self.lamp = ProductVariant.objects.create(product=product, name='Black', sku='LAMP-1', price=Decimal('20.00'))
+        self.bulb = ProductVariant.objects.create(product=product, name='Bulb', sku='BULB-1', price=Decimal('3.50'))
+        apply_many([(self.lamp.pk, 'IN', 5), (self.bulb.pk, 'IN', 10)])
+
+    def stock(self, variant):
+        return ProductVariant.objects.values_list('stock_quantity', flat=True).get(pk=variant.pk)
+
+    def test_place_order_reserves_stock_and_snapshots_prices(self):
+        order = place_order([(self.lamp.pk, 1), (self.bulb.pk, 2), (self.lamp.pk, 1)])
+        self.assertEqual(order.status, Order.STATUS_PENDING)
+        self.assertEqual(order.subtotal, Decimal('47.00'))
+        self.assertGreater(order.reserved_until, timezone.now())
+        self.assertEqual(
+            sorted(OrderLine.objects.filter(order=order).values_list('product_variant_id', 'quantity', 'line_total')),
+            sorted([(self.lamp.pk, 2, Decimal('40.00')), (self.bulb.pk, 2, Decimal('7.00'))]),
+        )
+        self.assertEqual(self.stock(self.lamp), 3)
+        self.assertEqual(self.stock(self.bulb), 8)
+
+    def test_short_line_writes_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            place_order({self.lamp.pk: 1, self.bulb.pk: 11})
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(InventoryTransaction.objects.count(), 2)
+        self.assertEqual(self.stock(self.lamp), 5)
+
+    def test_invalid_carts(self):
+        with self.assertRaises(OrderError):
+            place_order({})
+        with self.assertRaises(OrderError):
+            place_order({self.lamp.pk: 0})
+        with self.assertRaises(OrderError):
+            place_order({self.lamp.pk + 1000: 1})
+
+    def test_cancelling_restocks_once(self):
+        order = place_order({self.lamp.pk: 2})
+        self.assertTrue(cancel_order(order))
+        self.assertFalse(cancel_order(order))
+        self.assertEqual(Order.objects.get().status, Order.STATUS_CANCELLED)
+        self.assertEqual(self.stock(self.lamp), 5)
+
+    def test_confirmed_orders_are_not_released(self):
+        order = place_order({self.lamp.pk: 2})
+        self.assertTrue(confirm_order(order))
+        self.assertEqual(release_orders([order.pk], Order.STATUS_CANCELLED, "Cancelled"), [])
+        self.assertEqual(self.stock(self.lamp), 3)
+
+    def test_released_orders_cannot_be_confirmed(self):
+        order = place_order({self.lamp.pk: 2})
+        release_orders([order.pk], Order.STATUS_CANCELLED, "Cancelled")
+        self.assertFalse(confirm_order(order))
+
+    def test_only_lapsed_reservations_expire(self):
+        lapsed = place_order({self.lamp.pk: 2})
+        current = place_order({self.lamp.pk: 1, self.bulb.pk: 4})
+        Order.objects.filter(pk=lapsed.pk).update(reserved_until=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired_reservations(batch_size=1), 1)
+        self.assertEqual(Order.objects.get(pk=lapsed.pk).status, Order.STATUS_EXPIRED)
+        self.assertEqual(Order.objects.get(pk=current.pk).status, Order.STATUS_PENDING)
+        self.assertEqual(self.stock(self.lamp), 4)
+        self.assertEqual(self.stock(self.bulb), 6)
 
-# Create your tests here.
+    def test_release_moves_only_pending_orders(self):
+        pending = place_order({self.lamp.pk: 2})
+        confirmed = place_order({self.lamp.pk: 1})
+        confirm_order(confirmed)
+        self.assertEqual(release_orders([confirmed.pk, pending.pk], Order.STATUS_CANCELLED, "Cancelled"), [pending.pk])
+        self.assertEqual(release_orders([pending.pk], Order.STATUS_CANCELLED, "Cancelled"), [])
+        self.assertEqual(self.stock(self.lamp), 4)
+        self.assertEqual(Order.objects.get(pk=confirmed.pk).status, Order.STATUS_CONFIRMED)